@@ -4,22 +4,41 @@
 #
 # Avvio:
 # 1) pip install -r requirements.txt
-# 2) python seed_data.py
+# 2) python manage.py seed      (migrazioni + dati di esempio; opzionale, lo fa anche il primo avvio)
 # 3) streamlit run app.py
 
 import streamlit as st
-from datetime import date, datetime
-import calendar
+from datetime import date, timedelta
+import os
+import shutil
+import tempfile
 from types import SimpleNamespace
 
-from db import Base, engine
-from seed_data import seed
+from db import engine, unit_of_work
 import auth as auth_module
+import backup
+import bootstrap
+import conflicts
+import exporter
+import ics
+import jobs
+import profiling
+from components import calendar_widget
+from components.event_table import render_event_table
+import search as search_module
+import series as series_module
+import spans
+import stats
 import utils
 
-# --- Inizializza DB e seed (idempotente) ---
-Base.metadata.create_all(bind=engine)
-seed()
+# --- Inizializza DB una sola volta per processo (non a ogni rerun) ---
+@st.cache_resource(show_spinner=False)
+def _bootstrap():
+    bootstrap.bootstrap()
+    profiling.install(engine)
+    return True
+
+_bootstrap()
 
 st.set_page_config(page_title="Event Manager", layout="wide")
 
@@ -72,14 +91,76 @@ def left_nav(selected):
     return key
 
 # --- Pagine (skeleton, estendibili) ---
+MONTHS = ["Gen", "Feb", "Mar", "Apr", "Mag", "Giu", "Lug", "Ago", "Set", "Ott", "Nov", "Dic"]
+STATUSES = ["proposta", "confermato", "cancellato"]
+
+def _year_heatmap(year, days):
+    import altair as alt
+    import pandas as pd
+
+    start = date(year, 1, 1)
+    rows = []
+    for offset in range((date(year + 1, 1, 1) - start).days):
+        d = start + timedelta(days=offset)
+        rows.append({"data": d.isoformat(), "settimana": (offset + start.weekday()) // 7 + 1,
+                     "giorno": calendar_widget.WEEKDAYS[d.weekday()], "eventi": days.get(d, 0)})
+    return (
+        alt.Chart(pd.DataFrame(rows))
+        .mark_rect()
+        .encode(
+            x=alt.X("settimana:O", title=None, axis=alt.Axis(labels=False, ticks=False)),
+            y=alt.Y("giorno:O", sort=calendar_widget.WEEKDAYS, title=None),
+            color=alt.Color("eventi:Q", scale=alt.Scale(scheme="greens"), legend=None),
+            tooltip=["data:N", "eventi:Q"],
+        )
+        .properties(height=160)
+    )
+
+def _months_chart(months):
+    import altair as alt
+    import pandas as pd
+
+    rows = [{"mese": MONTHS[m - 1], "stato": status, "eventi": months.get((m, status), 0)}
+            for m in range(1, 13) for status in STATUSES]
+    return (
+        alt.Chart(pd.DataFrame(rows))
+        .mark_bar()
+        .encode(
+            x=alt.X("mese:N", sort=MONTHS, title=None),
+            y=alt.Y("eventi:Q", title=None),
+            color=alt.Color("stato:N", scale=alt.Scale(domain=STATUSES, range=[calendar_widget.STATUS_COLORS[s] for s in STATUSES])),
+            tooltip=["mese:N", "stato:N", "eventi:Q"],
+        )
+        .properties(height=220)
+    )
+
+def _ranking(counter, idx, label, limit=10):
+    return [{label: idx.by_id[i].name if i in idx.by_id else f"#{i}", "eventi": n} for i, n in counter.most_common(limit)]
+
 def page_dashboard(ctx):
     st.header("Dashboard")
+    # contatori pre-aggregati (stats): una query per l'anno intero, indipendente dal numero di eventi
+    year = st.number_input("Anno", min_value=2000, max_value=2100, value=date.today().year, key="dash_year")
+    ys = stats.year_stats(year)
+    tiles = st.columns(4)
+    tiles[0].metric("Eventi", sum(ys.totals.values()))
+    for col, status in zip(tiles[1:], STATUSES):
+        col.metric(status.capitalize(), ys.totals.get(status, 0))
+    st.subheader("Eventi per mese")
+    st.altair_chart(_months_chart(ys.months), use_container_width=True)
+    st.subheader("Heatmap anno")
+    st.altair_chart(_year_heatmap(year, ys.days), use_container_width=True)
+    c1, c2, c3 = st.columns(3)
+    c1.dataframe(_ranking(ys.artists, utils.artist_index(), "artista"))
+    c2.dataframe(_ranking(ys.promoters, utils.promoter_index(), "promoter"))
+    c3.dataframe(_ranking(ys.formats, utils.format_index(), "format"))
+    st.markdown("---")
     st.subheader("Prossimi eventi")
-    events = utils.list_upcoming_events(limit=10)
+    events = utils.list_upcoming_event_rows(limit=10)
     if not events:
         st.info("Nessun evento futuro trovato.")
     for e in events:
-        st.write(f"**{e.date}** — {e.title} • {', '.join([a.name for a in e.artists])} • _{e.status}_")
+        st.write(f"**{spans.label(e)}** — {e.title} • {e.artists or ''} • _{e.status}_")
     st.markdown("---")
     st.subheader("Azioni rapide")
     c1, c2, c3 = st.columns(3)
@@ -98,6 +179,29 @@ def page_dashboard(ctx):
             st.session_state.nav_target = "calendar"
             auth_module.safe_rerun()
 
+def _sidebar_filter(label, idx, key, label_func=lambda x: x.name):
+    options = [None] + [x.id for x in idx.items]
+    if st.session_state.get(key) not in options:
+        st.session_state[key] = None
+    return st.sidebar.selectbox(label, options, format_func=lambda i: "Tutti" if i is None else label_func(idx.by_id[i]), key=key)
+
+def calendar_filters():
+    """Filtri del Calendario nella barra laterale, come kwargs per utils.list_event_rows_by_month."""
+    art_idx = utils.artist_index()
+    # "Apri calendario artista" (pagina Artisti) passa il nome in filter_artist
+    if st.session_state.get("filter_artist"):
+        artist = art_idx.by_name.get(st.session_state.pop("filter_artist"))
+        st.session_state.cal_filter_artist = artist.id if artist else None
+    st.sidebar.markdown("### Filtri calendario")
+    filters = {
+        "artist_id": _sidebar_filter("Artista", art_idx, "cal_filter_artist"),
+        "resource_id": _sidebar_filter("Risorsa", utils.resource_index(), "cal_filter_resource", utils.resource_label),
+        "promoter_id": _sidebar_filter("Promoter", utils.promoter_index(), "cal_filter_promoter"),
+        "status": st.sidebar.selectbox("Stato", [None, "proposta", "confermato", "cancellato"],
+                                       format_func=lambda s: s or "Tutti", key="cal_filter_status"),
+    }
+    return {k: v for k, v in filters.items() if v}
+
 def page_calendar(ctx):
     st.header("Calendario")
     st.write("Vista mese. Filtra da sinistra e clicca un evento per aprire la scheda.")
@@ -107,18 +211,128 @@ def page_calendar(ctx):
     st.session_state.view_year = year
     st.session_state.view_month = month
 
-    events = utils.list_events_by_month(year, month)
+    events = utils.list_event_rows_by_month(year, month, **calendar_filters())
     if not events:
         st.info("Nessun evento per il mese selezionato.")
-    # semplice rendering elenco; sostituibile con calendar_widget o FullCalendar
-    for e in events:
-        cols = st.columns([4,2,2,1])
-        cols[0].write(f"**{e.title}**")
-        cols[1].write(", ".join([a.name for a in e.artists]) or "-")
-        cols[2].write(str(e.date))
-        if cols[3].button("Apri", key=f"cal_open_{e.id}"):
-            st.session_state.open_event_id = e.id
-            auth_module.safe_rerun()
+    view = st.radio("Vista", ["Griglia", "Elenco"], horizontal=True, key="cal_view")
+    if view == "Griglia":
+        # griglia mese in un unico componente: un click apre la scheda evento
+        clicked = calendar_widget.render_month(year, month, events, key=f"cal_grid_{year}_{month}")
+    else:
+        clicked = render_event_table(events, key=f"cal_table_{year}_{month}") if events else None
+    if clicked:
+        st.session_state.open_event_id = clicked
+        st.session_state.nav_target = "events"
+        auth_module.safe_rerun()
+
+    with st.expander("Abbonamento calendario (ICS)"):
+        base_url = os.getenv("EVENT_ICS_BASE_URL", "http://localhost:8502").rstrip("/")
+        token = os.getenv("EVENT_ICS_TOKEN")
+        suffix = f"?token={token}" if token else ""
+        st.caption("Aggiungi l'URL al tuo calendario (Google, Outlook, Apple). Server: python manage.py ics-serve")
+        st.code(base_url + ics.feed_path("global") + suffix, language=None)
+        scope_labels = {"artist": "Artista", "resource": "Risorsa", "promoter": "Promoter"}
+        scope = st.selectbox("Feed per", options=list(scope_labels), format_func=scope_labels.get, key="ics_scope")
+        idx = {"artist": utils.artist_index, "resource": utils.resource_index, "promoter": utils.promoter_index}[scope]()
+        label = utils.resource_label if scope == "resource" else (lambda x: x.name)
+        if idx.items:
+            entity_id = st.selectbox("Scegli", options=[x.id for x in idx.items], format_func=lambda i: label(idx.by_id[i]), key="ics_entity")
+            st.code(base_url + ics.feed_path(scope, entity_id) + suffix, language=None)
+
+# la tabella e' virtualizzata: pagine grandi costano poco al browser, il keyset le tiene leggere sul DB
+EVENTS_PAGE_SIZE = 200
+EVENT_TABLE_HEIGHT = 420
+
+def show_conflicts(found, title):
+    st.warning(title + "\n\n" + "\n".join(f"- {conflicts.describe(c)}" for c in found))
+
+SERIES_WEEKDAYS = dict(zip(series_module.WEEKDAYS, calendar_widget.WEEKDAYS))
+
+def series_create_form():
+    """Nuova serie ricorrente: la regola RRULE si compone dai campi del form."""
+    with st.form("new_series"):
+        title = st.text_input("Titolo")
+        first_date = st.date_input("Prima data", value=date.today())
+        rule_cols = st.columns(3)
+        freq = rule_cols[0].selectbox("Frequenza", list(series_module.FREQUENCIES), format_func=series_module.FREQUENCIES.get)
+        interval = rule_cols[1].number_input("Ogni (settimane/mesi/giorni)", min_value=1, max_value=12, value=1)
+        weekdays = rule_cols[2].multiselect("Giorni", list(series_module.WEEKDAYS), format_func=SERIES_WEEKDAYS.get)
+        until = st.date_input("Fino al (vuoto: senza fine)", value=None)
+        time_cols = st.columns(2)
+        start_time = time_cols[0].time_input("Inizio", value=None)
+        end_time = time_cols[1].time_input("Fine (orario)", value=None)
+        fmt_idx = utils.format_index()
+        format_choice = st.selectbox("Format", options=[None] + [f.id for f in fmt_idx.items], format_func=lambda i: fmt_idx.by_id[i].name if i in fmt_idx.by_id else "-")
+        art_idx = utils.artist_index()
+        artists_choice = st.multiselect("Artisti", options=[a.id for a in art_idx.items], format_func=lambda i: art_idx.by_id[i].name)
+        location = st.text_input("Location")
+        status = st.selectbox("Stato", options=["proposta", "confermato", "cancellato"], index=0)
+        allow_conflicts = st.checkbox("Crea anche se ci sono conflitti", key="new_series_allow_conflicts")
+        if st.form_submit_button("Crea serie"):
+            try:
+                series_module.create_series(
+                    title=title, first_date=first_date,
+                    rrule=series_module.build_rrule(freq, interval, weekdays, until),
+                    format_obj=fmt_idx.by_id.get(format_choice), location=location or None, status=status,
+                    start_time=start_time, end_time=end_time, artist_ids=artists_choice, allow_conflicts=allow_conflicts,
+                )
+                st.success("Serie creata")
+                auth_module.safe_rerun()
+            except conflicts.BookingConflict as e:
+                show_conflicts(e.conflicts, "Serie non creata: doppie prenotazioni")
+            except ValueError as e:
+                st.error(f"Serie non creata: {e}")
+
+def occurrence_card(key):
+    """Scheda di un'occorrenza di serie: staccarla in un evento, saltarla o modificare tutta la serie."""
+    occ = series_module.get_occurrence(key)
+    if occ is None:
+        st.session_state.open_event_id = None
+        st.info("Questa data non fa piu' parte della serie.")
+        return
+    s = series_module.get_series(occ.series_id)
+    st.markdown("---")
+    st.subheader(f"Serie: {occ.title}")
+    until = f" al {s.last_date:%d/%m/%Y}" if s.last_date else ""
+    st.write(f"Data: {spans.label(occ)} - regola `{s.rrule}` dal {s.first_date:%d/%m/%Y}{until}")
+    if occ.artists:
+        st.write(f"Artisti: {', '.join(a.name for a in occ.artists)}")
+    actions = st.columns(4)
+    if actions[0].button("Modifica solo questa data", key=f"detach_{key}"):
+        st.session_state.open_event_id = series_module.detach_occurrence(occ.series_id, occ.date)
+        auth_module.safe_rerun()
+    if actions[1].button("Salta questa data", key=f"skip_{key}"):
+        series_module.skip_occurrence(occ.series_id, occ.date)
+        st.session_state.open_event_id = None
+        auth_module.safe_rerun()
+    if actions[2].button("Elimina serie", key=f"delete_series_{s.id}"):
+        series_module.delete_series(s.id)
+        st.session_state.open_event_id = None
+        auth_module.safe_rerun()
+    if actions[3].button("Chiudi", key=f"close_{key}"):
+        st.session_state.open_event_id = None
+        auth_module.safe_rerun()
+    with st.form(f"edit_series_{s.id}"):
+        st.caption("Modifiche a tutta la serie (le date gia' staccate restano com'erano)")
+        title = st.text_input("Titolo", value=s.title)
+        rrule = st.text_input("Regola (RRULE)", value=s.rrule)
+        location = st.text_input("Location", value=s.location or "")
+        notes = st.text_area("Note", value=s.notes or "")
+        statuses = ["proposta", "confermato", "cancellato"]
+        status = st.selectbox("Stato", options=statuses, index=statuses.index(s.status) if s.status in statuses else 0)
+        allow_conflicts = st.checkbox("Salva anche se ci sono conflitti", key=f"allow_conflicts_series_{s.id}")
+        if st.form_submit_button("Salva serie"):
+            try:
+                series_module.update_series(
+                    s.id, title=title, rrule=rrule, location=location or None, notes=notes or None, status=status,
+                    allow_conflicts=allow_conflicts,
+                )
+                st.success("Serie aggiornata")
+                auth_module.safe_rerun()
+            except conflicts.BookingConflict as e:
+                show_conflicts(e.conflicts, "Serie non salvata: doppie prenotazioni")
+            except ValueError as e:
+                st.error(f"Serie non salvata: {e}")
 
 def page_events(ctx):
     st.header("Eventi")
@@ -128,115 +342,168 @@ def page_events(ctx):
         with st.form("quick_create_event"):
             title = st.text_input("Titolo")
             event_date = st.date_input("Data", value=date.today())
-            formats = utils.list_formats()
-            format_choice = st.selectbox("Format", options=[f.name for f in formats] if formats else ["-"])
-            artists = utils.list_artists()
-            artists_choice = st.multiselect("Artisti", options=[a.name for a in artists])
+            end_date = st.date_input("Fine (vuota: durata del format)", value=None)
+            time_cols = st.columns(2)
+            start_time = time_cols[0].time_input("Inizio", value=None)
+            end_time = time_cols[1].time_input("Fine (orario)", value=None)
+            fmt_idx = utils.format_index()
+            format_choice = st.selectbox("Format", options=list(fmt_idx.by_name) or ["-"])
+            art_idx = utils.artist_index()
+            artists_choice = st.multiselect("Artisti", options=list(art_idx.by_name))
             status = st.selectbox("Stato", options=["proposta", "confermato", "cancellato"], index=0)
+            allow_conflicts = st.checkbox("Crea anche se ci sono conflitti", key="quick_create_allow_conflicts")
             submitted = st.form_submit_button("Crea")
             if submitted:
-                db_fmt = None
-                if format_choice and format_choice != "-":
-                    db_fmt = next((f for f in formats if f.name == format_choice), None)
-                db = utils.SessionLocal() if hasattr(utils, "SessionLocal") else None
+                db_fmt = fmt_idx.by_name.get(format_choice)
                 try:
                     # usa utils.create_event per consistenza
-                    artist_objs = []
-                    for aname in artists_choice:
-                        a = next((x for x in artists if x.name == aname), None)
-                        if a:
-                            artist_objs.append(a)
-                    utils.create_event(title=title, date_=event_date, format_obj=db_fmt, status=status, artist_objs=artist_objs)
+                    artist_objs = [art_idx.by_name[n] for n in artists_choice if n in art_idx.by_name]
+                    utils.create_event(
+                        title=title, date_=event_date, format_obj=db_fmt, status=status, artist_objs=artist_objs,
+                        allow_conflicts=allow_conflicts, end_date=end_date, start_time=start_time, end_time=end_time,
+                    )
                     st.success("Evento creato")
                     st.session_state.show_new_event = False
                     auth_module.safe_rerun()
+                except conflicts.BookingConflict as e:
+                    show_conflicts(e.conflicts, "Evento non creato: doppie prenotazioni")
                 except Exception as e:
                     st.error(f"Errore creazione evento: {e}")
 
+    with st.expander("Nuova serie ricorrente"):
+        series_create_form()
+
     # Lista eventi con ricerca e azioni
     st.subheader("Elenco eventi")
-    events = utils.list_all_events()
-    search = st.text_input("Cerca per titolo o artista")
-    filtered = []
-    for e in events:
-        if not search:
-            filtered.append(e)
-        else:
-            if search.lower() in e.title.lower() or any(search.lower() in a.name.lower() for a in e.artists):
-                filtered.append(e)
-    if not filtered:
+    search = st.text_input("Cerca per titolo, location, note o artista")
+    # nuova ricerca -> si riparte dalla prima pagina
+    if st.session_state.get("events_search") != search:
+        st.session_state.events_search = search
+        st.session_state.events_cursor = None
+        st.session_state.events_backwards = False
+        st.session_state.events_offset = 0
+    if search:
+        # ricerca: indice full-text, risultati per rilevanza paginati per offset
+        offset = st.session_state.get("events_offset", 0)
+        result = search_module.search_events(search, limit=EVENTS_PAGE_SIZE, offset=offset, rows=True)
+        items, total = result.items, result.total
+        has_prev, has_next = offset > 0, offset + EVENTS_PAGE_SIZE < total
+    else:
+        page = utils.list_event_rows_page(
+            cursor=st.session_state.get("events_cursor"),
+            page_size=EVENTS_PAGE_SIZE,
+            backwards=st.session_state.get("events_backwards", False),
+        )
+        items, total = page.items, page.total
+        has_prev, has_next = page.prev_cursor is not None, page.next_cursor is not None
+    if not items:
         st.info("Nessun evento trovato.")
-    for e in filtered:
-        cols = st.columns([4,2,2,1])
-        cols[0].write(f"**{e.title}**")
-        cols[1].write(", ".join([a.name for a in e.artists]) or "-")
-        cols[2].write(str(e.date))
-        if cols[3].button("Apri", key=f"events_open_{e.id}"):
-            st.session_state.open_event_id = e.id
-            auth_module.safe_rerun()
+    else:
+        # una sola tabella per la pagina: selezionare una riga apre la scheda
+        selected = render_event_table(items, key="events_table", height=EVENT_TABLE_HEIGHT)
+        if selected:
+            st.session_state.open_event_id = selected
+    nav = st.columns([1,3,1])
+    if has_prev and nav[0].button("◀ Precedenti"):
+        if search:
+            st.session_state.events_offset = max(0, st.session_state.get("events_offset", 0) - EVENTS_PAGE_SIZE)
+        else:
+            st.session_state.events_cursor = page.prev_cursor
+            st.session_state.events_backwards = True
+        auth_module.safe_rerun()
+    nav[1].caption(f"{total} eventi totali")
+    if has_next and nav[2].button("Successivi ▶"):
+        if search:
+            st.session_state.events_offset = st.session_state.get("events_offset", 0) + EVENTS_PAGE_SIZE
+        else:
+            st.session_state.events_cursor = page.next_cursor
+            st.session_state.events_backwards = False
+        auth_module.safe_rerun()
 
-    # Scheda evento aperta
-    if st.session_state.get("open_event_id"):
+    # Scheda evento aperta (o occorrenza di una serie, dal calendario)
+    if series_module.parse_key(st.session_state.get("open_event_id")):
+        occurrence_card(st.session_state.open_event_id)
+    elif st.session_state.get("open_event_id"):
         ev = utils.get_event(st.session_state.open_event_id)
         if ev:
             st.markdown("---")
             st.subheader(f"Scheda evento: {ev.title}")
+            current_conflicts = conflicts.event_conflicts(ev.id)
+            if current_conflicts:
+                show_conflicts(current_conflicts, "Conflitti attuali di questo evento")
             with st.form(f"edit_event_{ev.id}"):
                 title = st.text_input("Titolo", value=ev.title)
-                event_date = st.date_input("Data", value=ev.date)
-                formats = utils.list_formats()
-                format_names = [f.name for f in formats]
-                format_choice = st.selectbox("Format", options=format_names if format_names else ["-"], index=format_names.index(ev.format.name) if ev.format and ev.format.name in format_names else 0)
-                artists = utils.list_artists()
-                artist_names = [a.name for a in artists]
-                artists_choice = st.multiselect("Artisti", options=artist_names, default=[a.name for a in ev.artists])
-                promoters = utils.list_promoters()
-                promoter_names = [p.name for p in promoters]
-                promoter_choice = st.selectbox("Promoter", options=["-"] + promoter_names, index=(1 + promoter_names.index(ev.promoter.name)) if ev.promoter and ev.promoter.name in promoter_names else 0)
+                date_cols = st.columns(4)
+                event_date = date_cols[0].date_input("Data", value=ev.date)
+                end_date = date_cols[1].date_input("Fine", value=ev.end_date or ev.date)
+                start_time = date_cols[2].time_input("Inizio", value=ev.start_time)
+                end_time = date_cols[3].time_input("Fine (orario)", value=ev.end_time)
+                # tabelle di riferimento dalla cache: nessuna query se gia' calda
+                fmt_idx = utils.format_index()
+                art_idx = utils.artist_index()
+                prom_idx = utils.promoter_index()
+                res_idx = utils.resource_index()
+                format_choice = st.selectbox(
+                    "Format",
+                    options=[f.id for f in fmt_idx.items] or [None],
+                    index=fmt_idx.position.get(ev.format_id, 0),
+                    format_func=lambda i: fmt_idx.by_id[i].name if i in fmt_idx.by_id else "-",
+                )
+                artists_choice = st.multiselect(
+                    "Artisti",
+                    options=[a.id for a in art_idx.items],
+                    default=[a.id for a in ev.artists if a.id in art_idx.by_id],
+                    format_func=lambda i: art_idx.by_id[i].name,
+                )
+                promoter_choice = st.selectbox(
+                    "Promoter",
+                    options=[None] + [p.id for p in prom_idx.items],
+                    index=1 + prom_idx.position[ev.promoter_id] if ev.promoter_id in prom_idx.position else 0,
+                    format_func=lambda i: prom_idx.by_id[i].name if i in prom_idx.by_id else "-",
+                )
                 location = st.text_input("Location", value=ev.location or "")
                 notes = st.text_area("Note", value=ev.notes or "")
-                # risorse
-                all_resources = utils.list_resources()
-                res_options = [f"{r.type}: {r.name}" for r in all_resources]
-                default_res = [f"{r.type}: {r.name}" for r in ev.resources]
-                resources_choice = st.multiselect("Risorse (assegna)", options=res_options, default=default_res)
+                # risorse: solo quelle libere nei giorni dell'evento (piu' quelle gia' assegnate)
+                assigned = [r.id for r in ev.resources if r.id in res_idx.by_id]
+                free = utils.free_resource_ids(ev.date, ev.end_date, exclude_event_id=ev.id) if ev.date else set(res_idx.by_id)
+                resources_choice = st.multiselect(
+                    "Risorse (assegna)",
+                    options=[r.id for r in res_idx.items if r.id in free or r.id in assigned],
+                    default=assigned,
+                    format_func=lambda i: utils.resource_label(res_idx.by_id[i]),
+                    help=f"Risorse libere {spans.label(ev)}" if ev.date else None,
+                )
                 status = st.selectbox("Stato", options=["proposta", "confermato", "cancellato"], index=["proposta","confermato","cancellato"].index(ev.status))
+                allow_conflicts = st.checkbox("Salva anche se ci sono conflitti", key=f"allow_conflicts_{ev.id}")
                 save = st.form_submit_button("Salva")
                 delete = st.form_submit_button("Elimina")
                 if save:
                     try:
-                        fmt_obj = next((f for f in formats if f.name == format_choice), None)
-                        promoter_obj = None
-                        if promoter_choice and promoter_choice != "-":
-                            promoter_obj = next((p for p in promoters if p.name == promoter_choice), None)
-                        # aggiorna campi
-                        ev.title = title
-                        ev.date = event_date
-                        ev.format = fmt_obj
-                        ev.promoter = promoter_obj
-                        ev.location = location
-                        ev.notes = notes
-                        ev.status = status
-                        # artists
-                        ev.artists = []
-                        for aname in artists_choice:
-                            aobj = next((a for a in artists if a.name == aname), None)
-                            if aobj:
-                                ev.artists.append(aobj)
-                        # resources
-                        ev.resources = []
-                        for rsel in resources_choice:
-                            try:
-                                rtype, rname = rsel.split(": ", 1)
-                                res = next((r for r in all_resources if r.type == rtype and r.name == rname), None)
-                                if res:
-                                    ev.resources.append(res)
-                            except Exception:
-                                pass
-                        utils.update_event(ev.id, title=ev.title, date=ev.date, format=ev.format, promoter=ev.promoter, location=ev.location, notes=ev.notes, status=ev.status)
+                        # l'istanza ev appartiene alla sessione della pagina: non la si modifica qui,
+                        # i valori passano a update_event che li applica nella stessa unit of work;
+                        # artisti e risorse come insiemi di id (solo le righe cambiate vengono scritte)
+                        utils.update_event(
+                            ev.id,
+                            title=title,
+                            date=event_date,
+                            # fine non toccata: update_event sposta l'evento mantenendo la durata
+                            **({"end_date": end_date} if end_date != (ev.end_date or ev.date) else {}),
+                            start_time=start_time,
+                            end_time=end_time,
+                            format_id=format_choice if format_choice in fmt_idx.by_id else None,
+                            promoter_id=promoter_choice if promoter_choice in prom_idx.by_id else None,
+                            location=location,
+                            notes=notes,
+                            status=status,
+                            artist_ids=set(artists_choice),
+                            resource_ids=set(resources_choice),
+                            allow_conflicts=allow_conflicts,
+                        )
                         st.success("Evento aggiornato")
                         st.session_state.open_event_id = None
                         auth_module.safe_rerun()
+                    except conflicts.BookingConflict as e:
+                        show_conflicts(e.conflicts, "Non salvato: doppie prenotazioni (spunta \"Salva anche se ci sono conflitti\" per confermare)")
                     except Exception as e:
                         st.error(f"Errore salvataggio: {e}")
                 if delete:
@@ -293,13 +560,40 @@ def page_resources(ctx):
     st.header("Risorse")
     types = ["DJ", "Vocalist", "Ballerina", "Service", "Tour Manager", "Mascotte"]
     sel = st.selectbox("Filtra tipo", ["Tutti"] + types)
-    res = utils.list_resources(None if sel == "Tutti" else sel)
+    resource_type = None if sel == "Tutti" else sel
+    only_free = st.checkbox("Solo libere nel periodo")
+    if only_free:
+        period = st.date_input("Periodo", value=(date.today(), date.today()))
+        start, end = (period[0], period[-1]) if isinstance(period, (list, tuple)) else (period, period)
+        res = utils.list_free_resources(start, end, resource_type)
+    else:
+        res = utils.list_resources(resource_type)
     if not res:
         st.info("Nessuna risorsa trovata.")
+    # periodi gia' conclusi non interessano: una query per tutte le risorse in elenco
+    unavailability = utils.unavailability_by_resource([r.id for r in res], from_date=date.today())
     for r in res:
         cols = st.columns([4,1])
         cols[0].write(f"**{r.name}** • {r.type}")
         cols[1].write(r.contact or "-")
+        with st.expander(f"Non disponibilita' ({len(unavailability[r.id])})"):
+            for u in unavailability[r.id]:
+                ucols = st.columns([4,1])
+                ucols[0].write(f"{u.start_date} → {u.end_date}" + (f" • {u.reason}" if u.reason else ""))
+                if ucols[1].button("Rimuovi", key=f"unav_del_{u.id}"):
+                    utils.delete_resource_unavailability(u.id)
+                    auth_module.safe_rerun()
+            with st.form(f"unav_add_{r.id}"):
+                fcols = st.columns([2,2,3])
+                u_start = fcols[0].date_input("Dal", value=date.today())
+                u_end = fcols[1].date_input("Al (incluso)", value=date.today())
+                reason = fcols[2].text_input("Motivo")
+                if st.form_submit_button("Aggiungi periodo"):
+                    try:
+                        utils.add_resource_unavailability(r.id, u_start, u_end, reason or None)
+                        auth_module.safe_rerun()
+                    except ValueError as e:
+                        st.error(str(e))
 
 def page_promoters(ctx):
     st.header("Promoter")
@@ -309,23 +603,216 @@ def page_promoters(ctx):
     for p in promoters:
         st.write(f"**{p.name}** • {p.contact or '-'}")
 
+JOB_STATUS_LABELS = {"queued": "in coda", "running": "in corso", "done": "completato", "failed": "errore", "cancelled": "annullato"}
+
+def _submit_job(kind, params=None):
+    job_id = jobs.submit(kind, params, user=user["username"] if user else None)
+    st.toast(f"{jobs.job_label(kind)}: job #{job_id} accodato")
+
+def _request_download(where, path, file_name, label):
+    st.session_state.pending_download = (where, path, file_name, label)
+    st.rerun()
+
+def _clear_download():
+    st.session_state.pop("pending_download", None)
+
+def _pending_download(where):
+    # un solo file aperto, scelto con un click, e fuori da jobs_panel (che si riesegue ogni 2s)
+    pending = st.session_state.get("pending_download")
+    if not pending or pending[0] != where:
+        return
+    _, path, file_name, label = pending
+    if not os.path.exists(path):
+        _clear_download()
+        return
+    cols = st.columns([4, 1])
+    with open(path, "rb") as f:
+        cols[0].download_button(label, f, file_name=file_name, key=f"pending_dl_{where}", on_click=_clear_download)
+    if cols[1].button("Chiudi", key=f"pending_dl_close_{where}"):
+        _clear_download()
+        st.rerun()
+
+def _job_result(job):
+    result = jobs.result(job)
+    if job.kind == "import" and result:
+        (st.warning if result["error_count"] else st.success)(
+            f"{result['inserted']} eventi importati su {result['rows_read']} righe, {result['error_count']} errori"
+        )
+        if result["errors"]:
+            st.dataframe([{"riga": line, "errore": msg} for line, msg in result["errors"]])
+    elif job.kind == "export" and result:
+        if not os.path.exists(result["path"]):
+            st.caption(f"{result['count']} eventi · file non piu' disponibile")
+        elif st.button(f"Prepara download ({result['count']} eventi)", key=f"job_dl_{job.id}"):
+            _request_download("job", result["path"], result["filename"], f"Scarica {result['filename']}")
+    elif result and result.get("message"):
+        st.caption(result["message"])
+
+@st.fragment(run_every=2)
+def jobs_panel():
+    # solo questo frammento si riesegue ogni 2s: il resto della pagina non viene ridisegnato
+    recent = jobs.list_jobs(limit=10)
+    if not recent:
+        st.caption("Nessun job.")
+    for job in recent:
+        cols = st.columns([3, 2, 4, 1])
+        cols[0].write(f"**#{job.id} {jobs.job_label(job.kind)}**  \n{job.created_by or '-'} · {jobs.local_time(job.created_at):%d/%m %H:%M}")
+        cols[1].write(JOB_STATUS_LABELS.get(job.status, job.status))
+        if job.status == "running":
+            cols[2].progress(job.progress or 0.0, text=job.message or "")
+        elif job.status == "failed":
+            cols[2].error((job.error or "").split("\n")[0])
+        elif job.status == "done":
+            with cols[2]:
+                _job_result(job)
+        if jobs.can_cancel(job) and cols[3].button("Annulla", key=f"job_cancel_{job.id}"):
+            jobs.cancel(job.id)
+            st.rerun(scope="fragment")
+
 def page_admin(ctx):
     st.header("Admin / Impostazioni")
     st.write("Utenti, backup DB, seed, preferenze.")
-    if st.button("Esegui seed (ricrea dati mancanti)"):
-        seed()
-        st.success("Seed eseguito")
-        auth_module.safe_rerun()
+    st.caption(f"Le operazioni lunghe girano in background (max {jobs.MAX_WORKERS} in parallelo): "
+               "si puo' continuare a usare l'app mentre sono in corso.")
+    c1, c2, c3 = st.columns(3)
+    if c1.button("Esegui seed (ricrea dati mancanti)"):
+        _submit_job("seed")
+    if c2.button("Ricalcola statistiche"):
+        _submit_job("stats_rebuild")
+    if c3.button("Ricostruisci indice ricerca"):
+        _submit_job("search_rebuild")
+    with st.expander("Import eventi (CSV/XLSX)"):
+        st.caption("Colonne: title, date, format, promoter, location, notes, status, artists, resources "
+                   "(artisti e risorse separati da ';', risorse come 'Tipo: Nome').")
+        upload = st.file_uploader("File", type=["csv", "xlsx"], key="import_file")
+        dry_run = st.checkbox("Solo validazione", value=False)
+        allow_conflicts = st.checkbox("Importa anche se ci sono conflitti", key="import_allow_conflicts")
+        if upload is not None and st.button("Importa"):
+            # il job legge da un file temporaneo e lo elimina alla fine
+            suffix = os.path.splitext(upload.name)[1]
+            with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+                shutil.copyfileobj(upload, tmp)
+            _submit_job("import", {"path": tmp.name, "dry_run": dry_run, "allow_conflicts": allow_conflicts})
+    with st.expander("Export eventi"):
+        c1, c2 = st.columns(2)
+        date_from = c1.date_input("Dal", value=date(date.today().year, 1, 1), key="export_from")
+        date_to = c2.date_input("Al", value=date(date.today().year, 12, 31), key="export_to")
+        status = c1.selectbox("Stato", ["Tutti", "proposta", "confermato", "cancellato"], key="export_status")
+        art_idx = utils.artist_index()
+        artist_choice = c2.selectbox("Artista", ["Tutti"] + list(art_idx.by_name), key="export_artist")
+        fmt = st.radio("Formato", exporter.FORMATS, horizontal=True, key="export_format")
+        if st.button("Prepara export"):
+            # il file viene scritto in streaming su disco da un job; il link compare nell'elenco job
+            with tempfile.NamedTemporaryFile(suffix=f".{fmt}", delete=False) as tmp:
+                path = tmp.name
+            _submit_job("export", {
+                "path": path, "fmt": fmt, "filename": f"eventi_{date_from}_{date_to}.{fmt}",
+                "start": date_from.isoformat(), "end": date_to.isoformat(),
+                "status": None if status == "Tutti" else status,
+                "artist_id": art_idx.by_name[artist_choice].id if artist_choice != "Tutti" else None,
+            })
+    with st.expander("Doppie prenotazioni (stagione)"):
+        c1, c2 = st.columns(2)
+        season_from = c1.date_input("Dal", value=date(date.today().year, 1, 1), key="conflicts_from")
+        season_to = c2.date_input("Al", value=date(date.today().year, 12, 31), key="conflicts_to")
+        if st.button("Controlla conflitti"):
+            found = conflicts.season_conflicts(season_from, season_to)
+            if found:
+                st.dataframe([
+                    {"data": c.date, "tipo": c.kind, "dettaglio": conflicts.describe(c), "eventi": ", ".join(str(i) for i, _ in c.events)}
+                    for c in found
+                ])
+            else:
+                st.success("Nessun conflitto nel periodo.")
+    with st.expander("Backup / ripristino"):
+        st.caption(f"Snapshot in {os.path.abspath(backup.BACKUP_DIR)}, conservati gli ultimi {backup.KEEP}. "
+                   "Il backup non blocca l'app; il ripristino salva prima lo stato attuale.")
+        if st.button("Esegui backup"):
+            _submit_job("backup")
+        snapshots = backup.list_backups()
+        if not snapshots:
+            st.caption("Nessuno snapshot.")
+        for name, path, size, modified in snapshots:
+            cols = st.columns([4, 2, 2])
+            cols[0].write(f"**{name}**  \n{modified:%d/%m/%Y %H:%M} · {size / 1e6:.1f} MB")
+            if cols[1].button("Scarica", key=f"backup_dl_{name}"):
+                _request_download("backup", path, name, f"Scarica {name}")
+            if cols[2].button("Ripristina", key=f"backup_restore_{name}"):
+                st.session_state.restore_pending = path
+        _pending_download("backup")
+        pending = st.session_state.get("restore_pending")
+        if pending:
+            st.warning(f"Ripristinare {os.path.basename(pending)}? I dati inseriti dopo lo snapshot andranno persi.")
+            c1, c2 = st.columns(2)
+            if c1.button("Conferma ripristino", type="primary"):
+                _submit_job("restore", {"path": pending})
+                st.session_state.pop("restore_pending")
+            if c2.button("Annulla ripristino"):
+                st.session_state.pop("restore_pending")
+                st.rerun()
+    with st.expander("Cache anagrafiche"):
+        st.json(utils.ref_cache.stats())
+    st.subheader("Job")
+    _pending_download("job")
+    jobs_panel()
 
 # --- Router principale ---
+PERF_HISTORY = 20
+
+def _remember_rerun(perf):
+    history = st.session_state.setdefault("perf_history", [])
+    history.append(perf.summary())
+    del history[:-PERF_HISTORY]
+    if perf.profile_path:
+        st.session_state.perf_profile_path = perf.profile_path
+
+def debug_panel(perf):
+    # solo admin: query e tempi del rerun appena eseguito e dei precedenti di questa sessione
+    with st.sidebar.expander("Debug prestazioni"):
+        st.caption(f"Rerun {perf.page_key}: {perf.total_ms:.0f} ms totali, render {perf.sections.get('render', 0):.0f} ms")
+        st.caption(f"{perf.queries} query, {perf.sql_ms:.0f} ms in SQL, la piu' lenta {perf.slowest_ms:.1f} ms")
+        if perf.slowest_statement:
+            st.code(profiling.compact_statement(perf.slowest_statement), language="sql")
+        st.dataframe(list(reversed(st.session_state.get("perf_history", []))), hide_index=True)
+        if st.button("Profila il prossimo rerun", key="perf_profile"):
+            st.session_state.perf_profile_next = True
+            st.rerun()
+        path = st.session_state.get("perf_profile_path")
+        if path and os.path.exists(path):
+            st.caption(f"Profilo: {path}")
+            st.code(profiling.profile_report(path), language=None)
+            with open(path, "rb") as f:
+                st.download_button("Scarica .prof", f, file_name=os.path.basename(path), key="perf_profile_dl")
+        slow = profiling.read_slow_log(20)
+        st.caption(f"Query oltre {profiling.SLOW_QUERY_MS:.0f} ms ({profiling.SLOW_QUERY_LOG}): {len(slow)} recenti")
+        if slow:
+            st.code("".join(slow), language=None)
+
 def main():
-    topbar()
-    nav_target = st.session_state.get("nav_target", None)
-    selected = nav_target or st.session_state.get("page", "dashboard")
-    page_key = left_nav(selected)
-    st.session_state.page = page_key
-    ctx = SimpleNamespace(user=user)
+    profile = st.session_state.pop("perf_profile_next", False)
+    perf = None
+    try:
+        with profiling.track_rerun(st.session_state.get("page", "dashboard"), profile=profile) as perf:
+            topbar()
+            nav_target = st.session_state.get("nav_target", None)
+            selected = nav_target or st.session_state.get("page", "dashboard")
+            page_key = left_nav(selected)
+            st.session_state.page = page_key
+            perf.page_key = page_key
+            ctx = SimpleNamespace(user=user)
+
+            # una sola sessione DB per tutto il rerun: letture condivise, un commit per le scritture
+            with unit_of_work():
+                with profiling.section("render"):
+                    render_page(page_key, ctx)
+    finally:
+        # anche se la pagina ha chiamato st.rerun()/st.stop()
+        if perf is not None:
+            _remember_rerun(perf)
+    if user["role"] == "admin":
+        debug_panel(perf)
 
+def render_page(page_key, ctx):
     if page_key == "dashboard":
         page_dashboard(ctx)
     elif page_key == "calendar":
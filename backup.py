@@ -0,0 +1,268 @@
+# backup.py
+# Backup e ripristino del database senza fermare l'app.
+#
+# - SQLite: API di backup online (sqlite3.Connection.backup), a blocchi di PAGES_PER_STEP pagine
+#   con una pausa tra un blocco e l'altro. Una scrittura di un'altra connessione fa ripartire la
+#   copia dalla prima pagina: in WAL (default, vedi db.py), dopo MAX_RESTARTS ripartenze si copia
+#   il resto in un solo passo dentro una transazione di lettura, che in WAL non blocca chi scrive
+#   (cresce solo il file -wal fino alla fine della copia). La copia viene poi compressa con gzip
+#   in BACKUP_DIR.
+#   Il ripristino verifica la copia (integrity_check), salva uno snapshot di sicurezza e la
+#   riversa nel DB tenendo un lock esclusivo: se altre connessioni sono aperte (ics_server, un
+#   altro worker Streamlit, una pagina a meta' rerun) o altri job sono attivi viene rifiutato,
+#   cosi' nessuno legge il DB a meta' ripristino.
+# - PostgreSQL (e altri DB server con EVENT_DB_URL): pg_dump --format=custom / pg_restore.
+# Vengono conservati gli ultimi KEEP snapshot. Ogni operazione restituisce un BackupReport
+# con dimensioni e durata (throughput in MB/s).
+import gzip
+import os
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy.engine import make_url
+
+from db import engine
+
+BACKUP_DIR = os.getenv("EVENT_BACKUP_DIR", "./backups")
+KEEP = int(os.getenv("EVENT_BACKUP_KEEP", "10"))
+PAGES_PER_STEP = int(os.getenv("EVENT_BACKUP_PAGES_PER_STEP", "256"))
+# pausa tra i blocchi: lascia passare le transazioni di scrittura degli utenti
+STEP_PAUSE = float(os.getenv("EVENT_BACKUP_STEP_PAUSE", "0.005"))
+# ripartenze della copia a blocchi (scritture concorrenti) prima di passare alla copia in un passo (solo WAL)
+MAX_RESTARTS = int(os.getenv("EVENT_BACKUP_MAX_RESTARTS", "3"))
+# attesa massima del lock esclusivo per il ripristino (secondi)
+RESTORE_LOCK_TIMEOUT = float(os.getenv("EVENT_BACKUP_RESTORE_LOCK_TIMEOUT", "10"))
+SUFFIXES = (".db.gz", ".dump")
+
+BackupReport = namedtuple("BackupReport", ["path", "bytes_db", "bytes_file", "seconds"])
+
+def throughput(report):
+    """MB/s sui byte del database (copiati o ripristinati)."""
+    return report.bytes_db / 1e6 / report.seconds if report.seconds else 0.0
+
+def _is_sqlite(bind=engine):
+    return bind.dialect.name == "sqlite"
+
+def _sqlite_path(bind=engine):
+    path = bind.url.database
+    if not path or path == ":memory:":
+        raise ValueError("backup non disponibile per un database SQLite in memoria")
+    return path
+
+def _stamp():
+    return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+# ---------- elenco e rotazione ----------
+def list_backups(directory=BACKUP_DIR):
+    """Snapshot presenti, dal piu' recente: lista di (nome, percorso, byte, data modifica)."""
+    if not os.path.isdir(directory):
+        return []
+    items = []
+    for name in os.listdir(directory):
+        if name.endswith(SUFFIXES):
+            path = os.path.join(directory, name)
+            st = os.stat(path)
+            items.append((name, path, st.st_size, datetime.fromtimestamp(st.st_mtime)))
+    return sorted(items, key=lambda item: item[3], reverse=True)
+
+def rotate(keep=KEEP, directory=BACKUP_DIR):
+    """Elimina gli snapshot oltre i keep piu' recenti; restituisce i nomi eliminati."""
+    removed = []
+    for name, path, _, _ in list_backups(directory)[keep:]:
+        os.unlink(path)
+        removed.append(name)
+    return removed
+
+# ---------- SQLite ----------
+class _TooManyRestarts(Exception):
+    pass
+
+def _copy_online(src, dst, progress):
+    """Copia src in dst a blocchi; restituisce il numero di ripartenze dovute a scritture concorrenti."""
+    wal = src.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+    state = {"remaining": None, "restarts": 0}
+
+    def step(status, remaining, total):
+        # a ogni passo remaining scende: se non scende la copia e' ripartita dalla prima pagina
+        if state["remaining"] is not None and remaining >= state["remaining"]:
+            state["restarts"] += 1
+            if wal and state["restarts"] > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        state["remaining"] = remaining
+        if progress:
+            progress((total - remaining) / total if total else 1.0)
+        time.sleep(STEP_PAUSE)
+
+    try:
+        src.backup(dst, pages=PAGES_PER_STEP, progress=step)
+    except _TooManyRestarts:
+        # scritture continue: un passo solo, in una transazione di lettura che in WAL non ferma chi scrive
+        src.backup(dst)
+        if progress:
+            progress(1.0)
+    return state["restarts"]
+
+def _try_exclusive(path):
+    # locking_mode=EXCLUSIVE: il lock resta fino alla chiusura; in WAL non si ottiene finche'
+    # un'altra connessione e' aperta, anche inattiva
+    conn = sqlite3.connect(path, timeout=0.1)
+    try:
+        conn.execute("PRAGMA locking_mode=EXCLUSIVE")
+        conn.execute("BEGIN EXCLUSIVE")
+        conn.execute("COMMIT")
+    except sqlite3.OperationalError:
+        conn.close()
+        return None
+    return conn
+
+def _lock_live(path):
+    """Connessione con lock esclusivo sul DB; ValueError se entro RESTORE_LOCK_TIMEOUT restano altre connessioni."""
+    deadline = time.monotonic() + RESTORE_LOCK_TIMEOUT
+    while True:
+        # a ogni tentativo si chiudono le connessioni inattive del pool di questo processo
+        # (una pagina o un job puo' averne appena riaperta una)
+        engine.dispose()
+        conn = _try_exclusive(path)
+        if conn is not None:
+            return conn
+        if time.monotonic() >= deadline:
+            raise ValueError(
+                "ripristino rifiutato: il database e' usato da altre connessioni "
+                "(ics_server, altri processi dell'app); fermale e riprova"
+            )
+        time.sleep(0.1)
+
+def _backup_sqlite(directory, prefix, progress):
+    source = _sqlite_path()
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, f"{prefix}-{_stamp()}.db.gz")
+    fd, tmp = tempfile.mkstemp(suffix=".db", dir=directory)
+    os.close(fd)
+    t0 = time.perf_counter()
+    try:
+        src, dst = sqlite3.connect(source), sqlite3.connect(tmp)
+        try:
+            _copy_online(src, dst, progress)
+        finally:
+            dst.close()
+            src.close()
+        with open(tmp, "rb") as fin, gzip.open(target + ".part", "wb", compresslevel=6) as fout:
+            shutil.copyfileobj(fin, fout, 1024 * 1024)
+        os.replace(target + ".part", target)
+        size_db = os.path.getsize(tmp)
+    finally:
+        for path in (tmp, target + ".part"):
+            if os.path.exists(path):
+                os.unlink(path)
+    return BackupReport(target, size_db, os.path.getsize(target), time.perf_counter() - t0)
+
+def _restore_sqlite(path, progress):
+    live = _sqlite_path()
+    fd, tmp = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    t0 = time.perf_counter()
+    try:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as fin, open(tmp, "wb") as fout:
+            shutil.copyfileobj(fin, fout, 1024 * 1024)
+        src = sqlite3.connect(tmp)
+        try:
+            check = src.execute("PRAGMA integrity_check").fetchone()[0]
+            if check != "ok":
+                raise ValueError(f"backup non valido ({check})")
+            dst = _lock_live(live)
+            try:
+                # con il lock esclusivo nessuno aspetta: un solo passo, senza callback (progress puo' scrivere nel DB)
+                src.backup(dst)
+            finally:
+                dst.close()
+            if progress:
+                progress(1.0)
+        finally:
+            src.close()
+        size_db = os.path.getsize(tmp)
+    finally:
+        os.unlink(tmp)
+    return BackupReport(path, size_db, os.path.getsize(path), time.perf_counter() - t0)
+
+# ---------- PostgreSQL ----------
+def _pg_args(url):
+    """URL libpq senza password (passata in PGPASSWORD, non visibile in ps) e ambiente."""
+    url = make_url(url) if isinstance(url, str) else url
+    env = dict(os.environ)
+    if url.password:
+        env["PGPASSWORD"] = url.password
+    return url.set(drivername="postgresql", password=None).render_as_string(hide_password=False), env
+
+def _backup_server(directory, prefix):
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, f"{prefix}-{_stamp()}.dump")
+    dsn, env = _pg_args(engine.url)
+    t0 = time.perf_counter()
+    # --format=custom: dump compresso, ripristinabile anche per singole tabelle con pg_restore
+    subprocess.run(["pg_dump", "--format=custom", "--no-owner", f"--file={target}", dsn], env=env, check=True)
+    size = os.path.getsize(target)
+    return BackupReport(target, size, size, time.perf_counter() - t0)
+
+def _restore_server(path):
+    dsn, env = _pg_args(engine.url)
+    t0 = time.perf_counter()
+    engine.dispose()
+    subprocess.run(
+        ["pg_restore", "--clean", "--if-exists", "--no-owner", "--single-transaction", f"--dbname={dsn}", path],
+        env=env, check=True,
+    )
+    size = os.path.getsize(path)
+    return BackupReport(path, size, size, time.perf_counter() - t0)
+
+# ---------- API ----------
+def backup(directory=BACKUP_DIR, keep=KEEP, progress=None, prefix="events"):
+    """
+    Crea uno snapshot e, se keep non e' None, applica la rotazione.
+    progress(frazione) durante la copia (solo SQLite).
+    """
+    if _is_sqlite():
+        report = _backup_sqlite(directory, prefix, progress)
+    else:
+        report = _backup_server(directory, prefix)
+    if keep is not None:
+        rotate(keep, directory)
+    return report
+
+def restore(path, directory=BACKUP_DIR, progress=None, job_id=None):
+    """
+    Ripristina lo snapshot path. Prima salva lo stato attuale come snapshot "pre-restore",
+    poi scarta la cache delle anagrafiche e le espansioni delle serie (il contenuto del DB e' cambiato
+    sotto l'app: dopo il ripristino la stessa coppia serie/versione puo' indicare una regola diversa).
+    ValueError se altri job sono attivi (job_id: il job che chiede il ripristino) o, su SQLite,
+    se altre connessioni sono aperte.
+    """
+    import jobs
+
+    if not os.path.exists(path):
+        raise ValueError(f"backup non trovato: {path}")
+    if jobs.active_count(exclude_id=job_id):
+        raise ValueError("ripristino rifiutato: ci sono altri job in coda o in esecuzione")
+    # niente rotazione qui: potrebbe eliminare proprio lo snapshot da ripristinare
+    backup(directory, keep=None, prefix="events-pre-restore")
+    if _is_sqlite():
+        report = _restore_sqlite(path, progress)
+    else:
+        report = _restore_server(path)
+    rotate(KEEP, directory)
+    # lo snapshot contiene i job che erano attivi durante il backup (almeno il job di backup)
+    jobs.recover("interrotto dal ripristino del database")
+    from cache import ref_cache
+    import series
+    ref_cache.invalidate()
+    series.expansions.clear()
+    return report
+
+def format_report(report, action="Backup"):
+    return (f"{action}: {os.path.basename(report.path)} - {report.bytes_db / 1e6:.1f} MB "
+            f"({report.bytes_file / 1e6:.1f} MB su file) in {report.seconds:.2f}s, {throughput(report):.1f} MB/s")
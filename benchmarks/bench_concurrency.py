@@ -0,0 +1,104 @@
+# benchmarks/bench_concurrency.py
+# Throughput letture/scritture concorrenti su SQLite: engine "nudo" (come prima di db.build_engine)
+# contro engine con PRAGMA (WAL, synchronous=NORMAL, mmap, cache, busy_timeout).
+#
+# Uso:
+#   python benchmarks/bench_concurrency.py --readers 8 --writers 2 --seconds 5
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Benchmark letture/scritture concorrenti")
+    p.add_argument("--readers", type=int, default=8)
+    p.add_argument("--writers", type=int, default=2)
+    p.add_argument("--seconds", type=float, default=5.0)
+    p.add_argument("--events", type=int, default=5000)
+    return p.parse_args()
+
+def prepare(url, n_events):
+    from sqlalchemy import create_engine
+    from db import Base
+    from models import Event
+
+    eng = create_engine(url)
+    Base.metadata.create_all(bind=eng)
+    with eng.begin() as conn:
+        start = date(2024, 1, 1)
+        conn.execute(Event.__table__.insert(), [
+            {"title": f"Evento {i}", "date": start + timedelta(days=i % 730), "status": "proposta"}
+            for i in range(n_events)
+        ])
+    eng.dispose()
+
+def run(label, eng, args):
+    from sqlalchemy import func, select
+    from models import Event
+
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def bump(key):
+        with lock:
+            counts[key] += 1
+
+    def reader(n):
+        month = date(2024, 1, 1) + timedelta(days=30 * (n % 24))
+        while not stop.is_set():
+            try:
+                with eng.connect() as conn:
+                    conn.execute(
+                        select(Event.id, Event.title).where(Event.date >= month, Event.date < month + timedelta(days=31))
+                    ).all()
+                    conn.execute(select(func.count(Event.id))).scalar()
+                bump("reads")
+            except Exception:
+                bump("errors")
+
+    def writer(n):
+        i = 0
+        while not stop.is_set():
+            try:
+                with eng.begin() as conn:
+                    conn.execute(Event.__table__.insert(), {"title": f"W{n}-{i}", "date": date(2025, 1, 1), "status": "proposta"})
+                bump("writes")
+            except Exception:
+                bump("errors")
+            i += 1
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    eng.dispose()
+    print(f"{label:<22} letture/s={counts['reads'] / args.seconds:9.1f}  scritture/s={counts['writes'] / args.seconds:8.1f}  "
+          f"errori (database is locked)={counts['errors']}")
+
+def main():
+    args = parse_args()
+    from db import build_engine, load_settings
+
+    print(f"{args.readers} lettori, {args.writers} scrittori, {args.seconds:.0f}s")
+    for label, settings in (
+        ("senza PRAGMA", dict(load_settings(), sqlite_pragmas={})),
+        ("PRAGMA da db.py", load_settings()),
+    ):
+        path = os.path.join(tempfile.mkdtemp(prefix="bench_conc_"), "bench.db")
+        url = f"sqlite:///{path}"
+        prepare(url, args.events)
+        run(label, build_engine(url, settings), args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# benchmarks/bench_event_loaders.py
+# Confronta il vecchio caricamento (4 joinedload) con utils.event_load_options() e con il
+# read model delle liste (utils.list_all_event_rows: select Core + namedtuple).
+#
+# Uso:
+#   python benchmarks/bench_event_loaders.py --events 2000 --artists-per-event 4 --resources-per-event 12
+#
+# Crea un DB SQLite temporaneo, quindi non tocca events.db.
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Benchmark strategie di caricamento eventi")
+    p.add_argument("--events", type=int, default=2000)
+    p.add_argument("--artists-per-event", type=int, default=4)
+    p.add_argument("--resources-per-event", type=int, default=12)
+    p.add_argument("--repeat", type=int, default=5)
+    return p.parse_args()
+
+def build_db(n_events, n_artists, n_resources):
+    from db import Base, engine
+    from models import Event, Artist, Resource, event_artist, event_resource
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(Artist.__table__.insert(), [{"name": f"Artista {i}"} for i in range(n_artists * 5)])
+        conn.execute(Resource.__table__.insert(), [{"name": f"Risorsa {i}", "type": "Service"} for i in range(n_resources * 5)])
+        start = date(2020, 1, 1)
+        conn.execute(Event.__table__.insert(), [
+            {"title": f"Evento {i}", "date": start + timedelta(days=i % 1500), "status": "confermato"}
+            for i in range(n_events)
+        ])
+        conn.execute(event_artist.insert(), [
+            {"event_id": e + 1, "artist_id": (e + k) % (n_artists * 5) + 1}
+            for e in range(n_events) for k in range(n_artists)
+        ])
+        conn.execute(event_resource.insert(), [
+            {"event_id": e + 1, "resource_id": (e + k) % (n_resources * 5) + 1}
+            for e in range(n_events) for k in range(n_resources)
+        ])
+
+class RowCounter:
+    """Registra le SELECT eseguite e le rilancia sul DBAPI per contare le righe restituite."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def __enter__(self):
+        from sqlalchemy import event
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    def rows(self):
+        raw = self.engine.raw_connection()
+        try:
+            cur = raw.cursor()
+            total = 0
+            for statement, parameters in self.statements:
+                cur.execute(statement, parameters)
+                total += len(cur.fetchall())
+            return total
+        finally:
+            raw.close()
+
+def peak_memory(load):
+    """Picco di memoria allocata (MB) mentre il risultato di load() e' ancora referenziato."""
+    tracemalloc.start()
+    try:
+        result = load()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak / 1e6
+
+def run(label, loader_options, repeat):
+    from db import SessionLocal
+
+    def load():
+        from models import Event
+        db = SessionLocal()
+        try:
+            return db.query(Event).options(*loader_options).order_by(Event.date.desc()).all()
+        finally:
+            db.close()
+
+    measure(label, load, repeat)
+
+def measure(label, load, repeat):
+    from db import engine
+
+    with RowCounter(engine) as counter:
+        events = load()
+    memory = peak_memory(load)
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        load()
+        timings.append(time.perf_counter() - t0)
+    timings.sort()
+    print(f"{label:<28} queries={len(counter.statements):<3} rows={counter.rows():<9} "
+          f"events={len(events):<7} best={timings[0] * 1000:8.1f} ms  median={timings[len(timings) // 2] * 1000:8.1f} ms  "
+          f"peak={memory:7.1f} MB")
+
+def main():
+    args = parse_args()
+    tmpdir = tempfile.mkdtemp(prefix="bench_loaders_")
+    os.environ["EVENT_DB_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+
+    from sqlalchemy.orm import joinedload
+    from models import Event
+    import utils
+
+    build_db(args.events, args.artists_per_event, args.resources_per_event)
+    print(f"{args.events} eventi, {args.artists_per_event} artisti e {args.resources_per_event} risorse per evento")
+    legacy = (
+        joinedload(Event.artists),
+        joinedload(Event.format),
+        joinedload(Event.resources),
+        joinedload(Event.promoter),
+    )
+    run("joinedload x4 (precedente)", legacy, args.repeat)
+    run("event_load_options()", utils.event_load_options(), args.repeat)
+    measure("list_all_event_rows()", utils.list_all_event_rows, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+# benchmarks/bench_utils.py
+# Suite di benchmark delle funzioni di accesso ai dati di utils su DB generati di piu' dimensioni.
+#
+# Per ogni dimensione un processo separato (engine, cache e memoria indipendenti) apre un DB
+# SQLite creato con seed_data.generate (riusato tra un'esecuzione e l'altra, stesso seed -> stessi
+# dati) e misura ogni funzione: latenza p50/p95/p99, query SQL per chiamata, picco di memoria.
+# I risultati finiscono in un file JSON; con --baseline il confronto con un'esecuzione precedente
+# fa uscire con codice 1 se una funzione rallenta oltre --threshold o esegue piu' query.
+#
+# Uso:
+#   python benchmarks/bench_utils.py --sizes 1000,100000 --output benchmarks/results/base.json
+#   python benchmarks/bench_utils.py --sizes 1000,100000 --baseline benchmarks/results/base.json
+#   python benchmarks/bench_utils.py --sizes 1000000 --repeat 10     # primo avvio: ~1 min per generare il DB
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from datetime import date, datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_event_loaders import peak_memory  # noqa: E402
+
+DEFAULT_SIZES = "1000,100000"
+SEED = 42
+WARMUP = 3
+# setup(ctx): eseguito prima di ogni chiamata, fuori dalla misura
+# heavy: caricano l'intera tabella, ripetute meno volte; max_events: oltre questa dimensione si saltano
+Case = namedtuple("Case", ["name", "call", "setup", "heavy", "max_events"])
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark funzioni di accesso ai dati (utils)")
+    p.add_argument("--sizes", default=DEFAULT_SIZES, help="numero di eventi per DB, separati da virgola")
+    p.add_argument("--repeat", type=int, default=20, help="chiamate misurate per funzione")
+    p.add_argument("--output", help="file JSON dei risultati (default benchmarks/results/utils-<data>.json)")
+    p.add_argument("--baseline", help="JSON di un'esecuzione precedente con cui confrontare")
+    p.add_argument("--threshold", type=float, default=0.25, help="rallentamento massimo ammesso sulla mediana (0.25 = +25%%)")
+    p.add_argument("--min-delta-ms", type=float, default=1.0, help="sotto questa differenza assoluta non e' regressione (rumore)")
+    p.add_argument("--only", help="esegue solo le funzioni indicate, separate da virgola")
+    p.add_argument("--db-dir", default=os.path.join(tempfile.gettempdir(), "bench_utils"), help="dove tenere i DB generati")
+    p.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    p.add_argument("--worker-output", help=argparse.SUPPRESS)
+    return p.parse_args(argv)
+
+# ---------- casi ----------
+def build_cases():
+    import conflicts
+    import utils
+    from cache import ref_cache
+
+    today = date.today()
+    busy_month = (today.year, 7)
+
+    def cold_cache(ctx):
+        ref_cache.invalidate()
+
+    def create(ctx):
+        artists = ctx["rng"].sample(ctx["artist_ids"], 2)
+        resources = ctx["rng"].sample(ctx["resource_ids"], 2)
+        ev = utils.create_event(
+            "Benchmark", today, location="Bench", artist_ids=artists, resource_ids=resources, allow_conflicts=True,
+        )
+        ctx["created"].append(ev.id)
+
+    def update(ctx):
+        event_id = ctx["created"][ctx["updates"] % len(ctx["created"])]
+        ctx["updates"] += 1
+        utils.update_event(
+            event_id, title=f"Benchmark {ctx['updates']}", status="confermato",
+            artist_ids=ctx["rng"].sample(ctx["artist_ids"], 2), allow_conflicts=True,
+        )
+
+    def delete(ctx):
+        utils.delete_event(ctx["created"].pop())
+
+    def ensure_created(ctx):
+        if not ctx["created"]:
+            create(ctx)
+
+    return [
+        Case("list_events_by_month", lambda ctx: utils.list_events_by_month(*busy_month), None, False, None),
+        Case("list_event_rows_by_month", lambda ctx: utils.list_event_rows_by_month(*busy_month), None, False, None),
+        Case("list_events_by_month[artist]", lambda ctx: utils.list_events_by_month(*busy_month, artist_id=ctx["artist_ids"][0]), None, False, None),
+        Case("list_upcoming_events", lambda ctx: utils.list_upcoming_events(10), None, False, None),
+        Case("list_events_page", lambda ctx: utils.list_events_page(page_size=25), None, False, None),
+        Case("get_event", lambda ctx: utils.get_event(ctx["rng"].choice(ctx["event_ids"])), None, False, None),
+        Case("list_all_event_rows", lambda ctx: utils.list_all_event_rows(), None, True, None),
+        # istanze ORM di tutta la tabella: a 1M eventi servono minuti e gigabyte, si misura fino a 100k
+        Case("list_all_events", lambda ctx: utils.list_all_events(), None, True, 100000),
+        Case("create_event", create, None, False, None),
+        Case("update_event", update, ensure_created, False, None),
+        Case("delete_event", delete, ensure_created, False, None),
+        Case("list_artists", lambda ctx: utils.list_artists(), None, False, None),
+        Case("list_artists[cold]", lambda ctx: utils.list_artists(), cold_cache, False, None),
+        Case("list_formats[cold]", lambda ctx: utils.list_formats(), cold_cache, False, None),
+        Case("list_promoters[cold]", lambda ctx: utils.list_promoters(), cold_cache, False, None),
+        Case("list_resources[cold]", lambda ctx: utils.list_resources(), cold_cache, False, None),
+        Case("free_resource_ids", lambda ctx: utils.free_resource_ids(date(*busy_month, 15)), None, False, None),
+        # tutte le prenotazioni dell'anno: pesante, come i caricamenti di tabella
+        Case("season_conflicts", lambda ctx: conflicts.season_conflicts(date(today.year, 1, 1), date(today.year, 12, 31)), None, True, None),
+    ]
+
+# ---------- misura ----------
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def __enter__(self):
+        from sqlalchemy import event
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    def _record(self, *args):
+        self.count += 1
+
+def percentile(sorted_values, p):
+    """Percentile nearest-rank su valori gia' ordinati."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+def run_case(case, ctx, repeat):
+    from db import engine
+
+    def once():
+        if case.setup:
+            case.setup(ctx)
+        return case.call(ctx)
+
+    for _ in range(WARMUP):  # cache degli statement, pagine del DB, import lazy
+        once()
+    memory = peak_memory(once)
+    timings, queries = [], 0
+    with QueryCounter(engine) as counter:
+        for _ in range(repeat):
+            if case.setup:
+                case.setup(ctx)
+            before = counter.count
+            t0 = time.perf_counter()
+            case.call(ctx)
+            timings.append((time.perf_counter() - t0) * 1000)
+            queries += counter.count - before
+    timings.sort()
+    return {
+        "runs": repeat,
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "max_ms": round(timings[-1], 3),
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "queries": round(queries / repeat, 2),
+        "peak_mb": round(memory, 2),
+    }
+
+def prepare_db(size):
+    """DB generato per la dimensione richiesta; riusato se esiste (le migrazioni vengono comunque applicate)."""
+    from bootstrap import migrate
+    import seed_data
+
+    path = os.environ["EVENT_DB_URL"].split("///", 1)[1]
+    fresh = not os.path.exists(path)
+    migrate()
+    if fresh:
+        t0 = time.perf_counter()
+        seed_data.generate(
+            events=size, artists=max(20, size // 500), promoters=max(10, size // 2000),
+            resources=max(30, size // 1000), seed=SEED,
+        )
+        print(f"  DB da {size} eventi generato in {time.perf_counter() - t0:.1f}s", file=sys.stderr, flush=True)
+
+def worker(args):
+    """Processo figlio: una dimensione, risultati su args.worker_output."""
+    size = args.worker
+    prepare_db(size)
+    from sqlalchemy import select
+    from db import engine
+    from models import Artist, Event, Resource
+
+    with engine.connect() as conn:
+        ctx = {
+            "rng": random.Random(SEED),
+            "event_ids": conn.execute(select(Event.id)).scalars().all(),
+            "artist_ids": conn.execute(select(Artist.id)).scalars().all(),
+            "resource_ids": conn.execute(select(Resource.id)).scalars().all(),
+            "created": [],
+            "updates": 0,
+        }
+    only = set(args.only.split(",")) if args.only else None
+    results = {}
+    for case in build_cases():
+        if only and case.name not in only:
+            continue
+        if case.max_events and size > case.max_events:
+            results[case.name] = {"skipped": f"oltre {case.max_events} eventi"}
+            continue
+        repeat = max(3, args.repeat // 5) if case.heavy else args.repeat
+        results[case.name] = run_case(case, ctx, repeat)
+        r = results[case.name]
+        print(f"  {case.name:<30} p50={r['p50_ms']:9.2f} ms  p95={r['p95_ms']:9.2f} ms  "
+              f"queries={r['queries']:<5} peak={r['peak_mb']:8.2f} MB", file=sys.stderr, flush=True)
+    # eventi creati in piu' (riscaldamento e misura della memoria): il DB resta quello generato
+    import utils
+    for event_id in ctx["created"]:
+        utils.delete_event(event_id)
+    with open(args.worker_output, "w", encoding="utf-8") as f:
+        json.dump(results, f)
+
+# ---------- confronto ----------
+def compare(current, baseline, threshold, min_delta_ms):
+    """Lista di regressioni (testo) rispetto al baseline, per le coppie dimensione/funzione in comune."""
+    problems = []
+    for size, cases in current["results"].items():
+        for name, now in cases.items():
+            before = baseline.get("results", {}).get(size, {}).get(name)
+            if not before or "skipped" in now or "skipped" in before:
+                continue
+            # solo la mediana: p95/p99 con poche ripetizioni sono dominati dal rumore della macchina
+            if now["p50_ms"] > before["p50_ms"] * (1 + threshold) and now["p50_ms"] - before["p50_ms"] > min_delta_ms:
+                problems.append(f"{size} eventi, {name}: p50 {before['p50_ms']:.2f} -> {now['p50_ms']:.2f} ms")
+            if now["queries"] > before["queries"]:
+                problems.append(f"{size} eventi, {name}: query {before['queries']} -> {now['queries']}")
+            if now["peak_mb"] > before["peak_mb"] * (1 + threshold) and now["peak_mb"] - before["peak_mb"] > 1.0:
+                problems.append(f"{size} eventi, {name}: memoria {before['peak_mb']:.1f} -> {now['peak_mb']:.1f} MB")
+    return problems
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.worker is not None:
+        worker(args)
+        return 0
+
+    import sqlalchemy
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    os.makedirs(args.db_dir, exist_ok=True)
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": {},
+    }
+    for size in sizes:
+        print(f"{size} eventi", file=sys.stderr, flush=True)
+        fd, out = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        env = dict(os.environ, EVENT_DB_URL=f"sqlite:///{os.path.join(args.db_dir, f'utils_{size}_{SEED}.db')}")
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", str(size), "--worker-output", out,
+               "--repeat", str(args.repeat), "--db-dir", args.db_dir]
+        if args.only:
+            cmd += ["--only", args.only]
+        try:
+            subprocess.run(cmd, env=env, check=True)
+            with open(out, encoding="utf-8") as f:
+                report["results"][str(size)] = json.load(f)
+        finally:
+            os.unlink(out)
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"utils-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Risultati in {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = compare(report, baseline, args.threshold, args.min_delta_ms)
+        for line in problems:
+            print(f"REGRESSIONE {line}")
+        if problems:
+            return 1
+        print(f"Nessuna regressione rispetto a {args.baseline} (soglia +{args.threshold:.0%}).")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,47 @@
+# bootstrap.py
+# Inizializzazione una tantum per processo: schema (migrazioni Alembic) e dati minimi.
+#
+# app.py la chiama tramite st.cache_resource, quindi gira al primo avvio del server e non
+# a ogni rerun. Da riga di comando: python manage.py migrate / python manage.py seed.
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+from db import engine, SessionLocal
+from models import User
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# revisione che corrisponde allo schema creato dal vecchio Base.metadata.create_all
+BASELINE_REVISION = "0001"
+
+def alembic_config():
+    cfg = Config(os.path.join(ROOT, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    return cfg
+
+def migrate(revision="head"):
+    """Porta lo schema alla revisione indicata. I DB creati con create_all vengono prima marcati come baseline."""
+    cfg = alembic_config()
+    tables = inspect(engine).get_table_names()
+    if "events" in tables and "alembic_version" not in tables:
+        command.stamp(cfg, BASELINE_REVISION)
+    command.upgrade(cfg, revision)
+
+def needs_seed():
+    db = SessionLocal()
+    try:
+        return db.query(User.id).first() is None
+    finally:
+        db.close()
+
+def bootstrap():
+    """Migrazioni + seed solo al primo avvio (nessun utente presente)."""
+    migrate()
+    # i job di un processo precedente non hanno piu' un worker: vanno chiusi come interrotti
+    import jobs
+    jobs.recover()
+    if needs_seed():
+        from seed_data import seed
+        seed()
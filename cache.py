@@ -0,0 +1,87 @@
+# cache.py
+# Cache in-process delle tabelle di riferimento (format, artisti, promoter, risorse).
+#
+# Le tabelle sono piccole e cambiano raramente, ma i form le rileggono a ogni rerun di Streamlit.
+# Ogni tabella ha un numero di versione: le funzioni create_*/update_*/delete_* di utils
+# chiamano invalidate(), che incrementa la versione e scarta il contenuto; il prossimo
+# accesso ricarica la tabella con una sola query.
+#
+# Gli oggetti in cache sono istanze ORM staccate (detached) e condivise tra sessioni Streamlit:
+# vanno trattate come sola lettura. Per associarle a un evento usare l'id (utils lo fa gia').
+import threading
+from collections import namedtuple
+
+from db import SessionLocal
+from models import Artist, Format, Promoter, Resource
+
+# items: lista ordinata; by_id: id -> oggetto; by_name: chiave di visualizzazione -> oggetto;
+# position: id -> posizione in items (indice di default per selectbox/multiselect)
+RefIndex = namedtuple("RefIndex", ["items", "by_id", "by_name", "position", "version"])
+
+def resource_label(r):
+    # i nomi risorsa non sono univoci: la UI li mostra come "Tipo: Nome"
+    return f"{r.type}: {r.name}"
+
+_TABLES = {
+    "formats": (Format, Format.name, lambda f: f.name),
+    "artists": (Artist, Artist.name, lambda a: a.name),
+    "promoters": (Promoter, Promoter.name, lambda p: p.name),
+    "resources": (Resource, Resource.name, resource_label),
+}
+
+class RefCache:
+    def __init__(self, tables):
+        self._tables = tables
+        self._lock = threading.Lock()
+        self._versions = {name: 0 for name in tables}
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            version = self._versions[name]
+        entry = self._load(name, version)
+        with self._lock:
+            # se nel frattempo c'e' stata un'invalidazione il dato caricato e' gia' vecchio: non salvarlo
+            if self._versions[name] == version:
+                self._entries[name] = entry
+        return entry
+
+    def _load(self, name, version):
+        model, order_by, key = self._tables[name]
+        db = SessionLocal()
+        try:
+            items = db.query(model).order_by(order_by).all()
+        finally:
+            db.close()
+        return RefIndex(
+            items=items,
+            by_id={o.id: o for o in items},
+            by_name={key(o): o for o in items},
+            position={o.id: i for i, o in enumerate(items)},
+            version=version,
+        )
+
+    def invalidate(self, name=None):
+        with self._lock:
+            names = [name] if name else list(self._tables)
+            for n in names:
+                self._versions[n] += 1
+                self._entries.pop(n, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "versions": dict(self._versions),
+                "cached": sorted(self._entries),
+            }
+
+ref_cache = RefCache(_TABLES)
@@ -1,27 +1,73 @@
 # components/calendar_widget.py
-# Placeholder: componente calendario semplice. Puoi sostituire con FullCalendar via componente custom.
-import streamlit as st
+# Griglia mese: gli eventi vengono raggruppati per giorno in un solo passaggio e l'intero mese
+# e' disegnato da un unico componente HTML (components/month_grid) con click gestiti lato client.
+# Il numero di widget Streamlit resta 1 qualunque sia il numero di eventi.
+# Un evento su piu' giorni compare in ogni giorno del mese che occupa (dal secondo come continuazione).
+import os
 import calendar
+from collections import defaultdict
 from datetime import date
 
-def render_month(year, month, events, open_callback_key_prefix="open"):
+import spans
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+_month_grid = components.declare_component(
+    "month_grid", path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "month_grid")
+)
+
+WEEKDAYS = ["Lun", "Mar", "Mer", "Gio", "Ven", "Sab", "Dom"]
+STATUS_COLORS = {"proposta": "#f0ad4e", "confermato": "#2ca02c", "cancellato": "#999999"}
+
+def bucket_by_day(events, first, last):
+    """date -> lista eventi per i giorni da first a last, in un solo passaggio sulla lista."""
+    buckets = defaultdict(list)
+    for ev in events:
+        for day in spans.days_in(ev.date, ev.end_date or ev.date, first, last):
+            buckets[day].append(ev)
+    return buckets
+
+def _event_payload(ev, day):
+    # ev: utils.EventRow (nomi artisti e colore del primo artista gia' calcolati in SQL)
+    return {
+        "id": ev.id,
+        "title": ev.title or "",
+        "status": ev.status or "",
+        "artists": ev.artists or "",
+        "color": ev.color or STATUS_COLORS.get(ev.status, "#2b8cbe"),
+        "when": spans.label(ev),
+        "cont": day != ev.date,
+    }
+
+def render_month(year, month, events, key="month_grid"):
+    """
+    events: utils.EventRow del mese (utils.list_event_rows_by_month).
+    Disegna il mese e restituisce l'id dell'evento cliccato in questo rerun (o None).
+    Il valore del componente resta uguale tra un rerun e l'altro: il nonce evita di
+    riaprire lo stesso click due volte.
+    """
+    first = date(year, month, 1)
+    buckets = bucket_by_day(events, first, first.replace(day=calendar.monthrange(year, month)[1]))
     cal = calendar.Calendar(firstweekday=0)
-    month_days = cal.monthdayscalendar(year, month)
-    for week in month_days:
-        cols = st.columns(7)
-        for i, day in enumerate(week):
-            with cols[i]:
-                if day == 0:
-                    st.write("")
-                else:
-                    st.markdown(f"**{day}**")
-                    d = date(year, month, day)
-                    day_events = [e for e in events if e.date == d]
-                    for ev in day_events:
-                        st.markdown(f"- **{ev.title}**  •  _{ev.status}_")
-                        if st.button("Apri", key=f"{open_callback_key_prefix}_{ev.id}"):
-                            st.session_state.open_event_id = ev.id
-                            try:
-                                st.experimental_rerun()
-                            except Exception:
-                                st.experimental_set_query_params(_rerun=str(date.today().isoformat()))
+    weeks = [
+        [{"day": d.day, "iso": d.isoformat()} if d.month == month else None for d in week]
+        for week in cal.monthdatescalendar(year, month)
+    ]
+    payload = {
+        d.isoformat(): [_event_payload(ev, d) for ev in day_events]
+        for d, day_events in buckets.items()
+    }
+    clicked = _month_grid(
+        weeks=weeks,
+        weekdays=WEEKDAYS,
+        events=payload,
+        today=date.today().isoformat(),
+        key=key,
+        default=None,
+    )
+    nonce_key = f"{key}_nonce"
+    if clicked and clicked.get("nonce") != st.session_state.get(nonce_key):
+        st.session_state[nonce_key] = clicked.get("nonce")
+        return clicked.get("event_id")
+    return None
@@ -0,0 +1,55 @@
+# components/event_table.py
+# Elenco eventi come un'unica tabella st.dataframe (virtualizzata lato browser, ordinabile,
+# selezione di una riga) al posto di una riga di widget con bottone per ogni evento.
+# Il numero di widget resta 1 qualunque sia il numero di righe.
+import pandas as pd
+import streamlit as st
+
+COLUMN_ORDER = ["date", "end_date", "title", "artists", "status", "location"]
+COLUMN_CONFIG = {
+    "date": st.column_config.DateColumn("Data", format="DD/MM/YYYY"),
+    "end_date": st.column_config.DateColumn("Fine", format="DD/MM/YYYY"),
+    "title": st.column_config.TextColumn("Titolo", width="large"),
+    "artists": st.column_config.TextColumn("Artisti", width="medium"),
+    "status": st.column_config.TextColumn("Stato", width="small"),
+    "location": st.column_config.TextColumn("Location"),
+}
+
+def event_frame(rows):
+    """DataFrame da utils.EventRow (una colonna per campo, id compreso)."""
+    from utils import EventRow
+    return pd.DataFrame.from_records(rows, columns=EventRow._fields)
+
+def render_event_table(rows, key, height=None):
+    """
+    Disegna la tabella e restituisce l'id dell'evento appena selezionato (o None).
+    La selezione resta attiva tra un rerun e l'altro: si restituisce solo quando cambia,
+    e quando la scheda evento e' stata chiusa (open_event_id vuoto) la selezione viene azzerata,
+    cosi' la stessa riga si puo' riaprire.
+    """
+    last_key = f"{key}_selected"
+    if not st.session_state.get("open_event_id") and st.session_state.get(last_key) is not None:
+        st.session_state.pop(key, None)
+        st.session_state[last_key] = None
+    df = event_frame(rows)
+    state = st.dataframe(
+        df,
+        column_order=COLUMN_ORDER,
+        column_config=COLUMN_CONFIG,
+        hide_index=True,
+        use_container_width=True,
+        height=height,
+        on_select="rerun",
+        selection_mode="single-row",
+        key=key,
+    )
+    # posizioni riferite al DataFrame originale, anche se l'utente ha ordinato la tabella
+    selected = state.selection.rows
+    event_id = df["id"].iloc[selected[0]] if selected else None
+    # id intero di un evento o chiave stringa di un'occorrenza di serie (series.parse_key)
+    if event_id is not None and not isinstance(event_id, str):
+        event_id = int(event_id)
+    if event_id != st.session_state.get(last_key):
+        st.session_state[last_key] = event_id
+        return event_id
+    return None
@@ -0,0 +1,286 @@
+# conflicts.py
+# Doppie prenotazioni: stesso artista o stessa risorsa su due eventi non cancellati che si
+# sovrappongono (giorni e orari, vedi spans.py), oppure risorsa assegnata in un periodo di non
+# disponibilita'.
+#
+# check_booking() controlla una prenotazione candidata (create/update evento, scheda evento),
+# check_bookings() tutte le occorrenze di una serie candidata (series.create_series/update_series),
+# check_new_events() un blocco di eventi nuovi e indipendenti (importer), anche tra loro;
+# season_conflicts() analizza un intervallo di date intero con una query per tipo di conflitto.
+# Le occorrenze delle serie ricorrenti prenotano come gli eventi: si aggiungono con series.bookings(),
+# calcolate in Python per la sola finestra (non sono righe del DB).
+# Le query selezionano le prenotazioni per giorni sovrapposti (indice ix_events_date_end e indici
+# (artist_id, event_id) / (resource_id, event_id) delle tabelle di associazione); gli orari si
+# confrontano poi in Python sulle poche righe trovate (check_booking) o, per season_conflicts, in un
+# solo passaggio sulle prenotazioni ordinate in SQL per (entita', inizio) in secondi (spans.epoch_bounds).
+# Con eventi su piu' giorni e orari season_conflicts legge ogni prenotazione della finestra una volta
+# (non basta piu' contare per giorno sull'indice): caso season_conflicts di benchmarks/bench_utils.py.
+import heapq
+from collections import namedtuple
+
+from sqlalchemy import and_, or_, select
+
+from db import session_scope
+import series
+import spans
+from models import Event, ResourceUnavailability, event_artist, event_resource
+from cache import ref_cache, resource_label
+
+# kind: "artist" | "resource" | "unavailable"; date: primo giorno di sovrapposizione;
+# events: tuple di (event_id, title), event_id e' la chiave stringa per le occorrenze di serie
+Conflict = namedtuple("Conflict", ["kind", "entity_id", "date", "events", "reason"])
+
+class BookingConflict(ValueError):
+    """Sollevata da utils.create_event/update_event e series.create_series/update_series quando la prenotazione crea conflitti."""
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__("; ".join(describe(c) for c in conflicts))
+
+def _active():
+    return or_(Event.status.is_(None), Event.status != "cancellato")
+
+# ---------- prenotazione candidata ----------
+def check_booking(db, day, artist_ids=(), resource_ids=(), exclude_event_id=None, end_date=None, start_time=None, end_time=None):
+    """
+    Conflitti che avrebbe un evento dal giorno day a end_date (default: day), con orari facoltativi,
+    con questi artisti/risorse (exclude_event_id: l'evento stesso).
+    """
+    if not day:
+        return []
+    return check_bookings(db, [(day, end_date or day, start_time, end_time)], artist_ids, resource_ids, exclude_event_id)
+
+def check_bookings(db, candidates, artist_ids=(), resource_ids=(), exclude_event_id=None, exclude_series_id=None):
+    """
+    Conflitti di piu' prenotazioni candidate con gli stessi artisti/risorse (le occorrenze di una serie):
+    candidates e' una lista di (primo giorno, ultimo giorno, start_time, end_time). Una query per tipo
+    sull'intervallo che le contiene tutte. exclude_event_id / exclude_series_id: l'evento o la serie stessi.
+    """
+    found = []
+    windows = [(first, last, spans.interval(first, last, start_time, end_time)) for first, last, start_time, end_time in candidates]
+    if not windows:
+        return found
+    start, end = min(w[0] for w in windows), max(w[1] for w in windows)
+    for kind, table, column, ids in (
+        ("artist", event_artist, "artist_id", artist_ids),
+        ("resource", event_resource, "resource_id", resource_ids),
+    ):
+        ids = list(ids or ())
+        if not ids:
+            continue
+        grouped, first_day = {}, {}
+        for entity_id, booking in _bookings(db, table, column, start, end, ids, exclude_event_id, exclude_series_id):
+            interval = spans.event_interval(booking)
+            overlap = next((max(first, booking.date) for first, _, window in windows if spans.overlaps(window, interval)), None)
+            if overlap is None:
+                continue
+            grouped.setdefault(entity_id, []).append((booking.id, booking.title))
+            first_day[entity_id] = min(first_day.get(entity_id, overlap), overlap)
+        found += [Conflict(kind, entity_id, first_day[entity_id], tuple(evs), None) for entity_id, evs in grouped.items()]
+    if resource_ids:
+        q = (
+            select(
+                ResourceUnavailability.resource_id, ResourceUnavailability.start_date,
+                ResourceUnavailability.end_date, ResourceUnavailability.reason,
+            )
+            .where(
+                ResourceUnavailability.resource_id.in_(list(resource_ids)),
+                ResourceUnavailability.start_date <= end,
+                ResourceUnavailability.end_date >= start,
+            )
+        )
+        for rid, first, last, reason in db.execute(q):
+            days = [max(w_first, first) for w_first, w_last, _ in windows if first <= w_last and last >= w_first]
+            if days:
+                found.append(Conflict("unavailable", rid, min(days), (), reason))
+    return found
+
+def _bookings(db, table, column, start, end, ids, exclude_event_id=None, exclude_series_id=None):
+    """(entity_id, prenotazione) di eventi e occorrenze non cancellati con almeno un giorno in [start, end]."""
+    col = table.c[column]
+    q = (
+        select(col, Event.id, Event.title, Event.date, Event.end_date, Event.start_time, Event.end_time)
+        .join(Event, Event.id == table.c.event_id)
+        .where(col.in_(ids), *spans.overlap_criteria(start, end), _active())
+        .order_by(col, Event.id)
+    )
+    if exclude_event_id is not None:
+        q = q.where(Event.id != exclude_event_id)
+    found = [(row[0], row) for row in db.execute(q)]
+    return found + series.bookings(db, start, end, column, ids, exclude_series_id)
+
+def event_conflicts(event_id):
+    """Conflitti attuali di un evento salvato."""
+    with session_scope() as db:
+        ev = db.get(Event, event_id)
+        if ev is None or ev.status == "cancellato":
+            return []
+        artist_ids = db.execute(select(event_artist.c.artist_id).where(event_artist.c.event_id == event_id)).scalars().all()
+        resource_ids = db.execute(select(event_resource.c.resource_id).where(event_resource.c.event_id == event_id)).scalars().all()
+        return check_booking(
+            db, ev.date, artist_ids, resource_ids, exclude_event_id=event_id,
+            end_date=ev.end_date, start_time=ev.start_time, end_time=ev.end_time,
+        )
+
+def check_new_events(db, rows):
+    """
+    Conflitti di un blocco di eventi nuovi (righe di un import): rows e' una lista di
+    (chiave, valori evento, artist_ids, resource_ids) in ordine. Una query per tipo sull'intervallo
+    del blocco; ogni evento e' confrontato anche con quelli che lo precedono nel blocco e sono senza
+    conflitti (saranno inseriti). Restituisce {chiave: [Conflict, ...]} per le sole righe in conflitto.
+    Le prenotazioni sono indicizzate per (tipo, entita', giorno): ogni riga guarda solo i propri giorni
+    e gli orari si confrontano solo per quelle che li condividono.
+    """
+    rows = [row for row in rows if row[1]["status"] != "cancellato" and (row[2] or row[3])]
+    if not rows:
+        return {}
+    start = min(values["date"] for _, values, _, _ in rows)
+    end = max(values["end_date"] or values["date"] for _, values, _, _ in rows)
+    booked = {}
+
+    def book(kind, entity_id, booking):
+        for day in spans.days_in(booking.date, booking.end_date or booking.date, start, end):
+            booked.setdefault((kind, entity_id, day), []).append(booking)
+
+    for kind, table, column, position in (("artist", event_artist, "artist_id", 2), ("resource", event_resource, "resource_id", 3)):
+        ids = list({entity_id for row in rows for entity_id in row[position]})
+        if ids:
+            for entity_id, booking in _bookings(db, table, column, start, end, ids):
+                book(kind, entity_id, booking)
+    unavailable = {}
+    resource_ids = list({rid for _, _, _, rids in rows for rid in rids})
+    if resource_ids:
+        q = select(
+            ResourceUnavailability.resource_id, ResourceUnavailability.start_date,
+            ResourceUnavailability.end_date, ResourceUnavailability.reason,
+        ).where(
+            ResourceUnavailability.resource_id.in_(resource_ids),
+            ResourceUnavailability.start_date <= end,
+            ResourceUnavailability.end_date >= start,
+        )
+        for rid, first, last, reason in db.execute(q):
+            unavailable.setdefault(rid, []).append((first, last, reason))
+    found = {}
+    for key, values, artist_ids, resource_ids in rows:
+        first, last = values["date"], values["end_date"] or values["date"]
+        window = spans.interval(first, last, values["start_time"], values["end_time"])
+        entities = [("artist", a) for a in sorted(artist_ids)] + [("resource", r) for r in sorted(resource_ids)]
+        hits = []
+        for kind, entity_id in entities:
+            # per identita': una prenotazione su piu' giorni compare in ciascuno
+            events = {}
+            for day in spans.days_in(first, last, start, end):
+                for booking in booked.get((kind, entity_id, day), ()):
+                    if id(booking) not in events and spans.overlaps(window, spans.event_interval(booking)):
+                        events[id(booking)] = (max(first, booking.date), (booking.id, booking.title))
+            if events:
+                hits.append(Conflict(kind, entity_id, min(day for day, _ in events.values()), tuple(ev for _, ev in events.values()), None))
+        for rid in sorted(resource_ids):
+            hits += [
+                Conflict("unavailable", rid, max(first, u_first), (), reason)
+                for u_first, u_last, reason in unavailable.get(rid, ()) if u_first <= last and u_last >= first
+            ]
+        if hits:
+            found[key] = hits
+        else:
+            # evento che verra' inserito: prenota per le righe successive (id non ancora noto)
+            booking = series.Booking(None, values["title"], first, last, values["start_time"], values["end_time"])
+            for kind, entity_id in entities:
+                book(kind, entity_id, booking)
+    return found
+
+# ---------- intera stagione ----------
+def _double_bookings(db, kind, table, column, start, end, occurrences):
+    col = table.c[column]
+    # una lettura delle prenotazioni nella finestra (join dall'indice ix_events_date_end), con inizio e
+    # fine gia' in secondi e ordinata in SQL: in Python restano solo confronti tra interi
+    begin, finish = spans.epoch_bounds(db.get_bind().dialect.name)
+    q = (
+        select(col, begin, finish, Event.id, Event.title)
+        .join(Event, Event.id == table.c.event_id)
+        .where(*spans.overlap_criteria(start, end), _active())
+        .order_by(col, begin, Event.id)
+    )
+    bookings = db.execute(q)
+    if occurrences:
+        # occorrenze delle serie (poche, calcolate in Python) nello stesso ordine delle righe
+        occurrences = sorted((entity_id, *spans.epoch_interval(b), b.id, b.title) for entity_id, b in occurrences)
+        bookings = heapq.merge(bookings, occurrences, key=lambda b: (b[0], b[1]))
+    # un passaggio per (entita', inizio): si tiene la fine piu' lontana del gruppo corrente e ogni
+    # prenotazione che inizia prima si sovrappone al gruppo
+    found, group, group_entity, group_end = [], [], None, None
+
+    def close():
+        if len(group) > 1:
+            # la sovrapposizione comincia con la seconda prenotazione del gruppo
+            first_day = max(spans.epoch_day(group[1][0]), start)
+            found.append(Conflict(kind, group_entity, first_day, tuple(ev for _, ev in group), None))
+
+    for entity_id, begin, finish, event_id, title in bookings:
+        if entity_id != group_entity or begin >= group_end:
+            close()
+            group, group_entity, group_end = [], entity_id, finish
+        group.append((begin, (event_id, title)))
+        group_end = max(group_end, finish)
+    close()
+    return found
+
+def season_conflicts(start, end):
+    """Tutti i conflitti tra eventi che toccano [start, end], ordinati per data."""
+    with session_scope() as db:
+        in_series = series.bookings(db, start, end, "resource_id")
+        found = _double_bookings(db, "artist", event_artist, "artist_id", start, end, series.bookings(db, start, end, "artist_id"))
+        found += _double_bookings(db, "resource", event_resource, "resource_id", start, end, in_series)
+        q = (
+            select(
+                event_resource.c.resource_id, Event.date, ResourceUnavailability.start_date,
+                Event.id, Event.title, ResourceUnavailability.reason,
+            )
+            .join(Event, Event.id == event_resource.c.event_id)
+            .join(
+                ResourceUnavailability,
+                and_(
+                    ResourceUnavailability.resource_id == event_resource.c.resource_id,
+                    ResourceUnavailability.start_date <= Event.end_date,
+                    ResourceUnavailability.end_date >= Event.date,
+                ),
+            )
+            .where(*spans.overlap_criteria(start, end), _active())
+        )
+        found += [
+            Conflict("unavailable", rid, max(day, first, start), ((event_id, title),), reason)
+            for rid, day, first, event_id, title, reason in db.execute(q)
+        ]
+        if in_series:
+            q = select(
+                ResourceUnavailability.resource_id, ResourceUnavailability.start_date,
+                ResourceUnavailability.end_date, ResourceUnavailability.reason,
+            ).where(ResourceUnavailability.start_date <= end, ResourceUnavailability.end_date >= start)
+            unavailable = {}
+            for rid, first, last, reason in db.execute(q):
+                unavailable.setdefault(rid, []).append((first, last, reason))
+            found += [
+                Conflict("unavailable", rid, max(b.date, first, start), ((b.id, b.title),), reason)
+                for rid, b in in_series
+                for first, last, reason in unavailable.get(rid, ())
+                if first <= b.end_date and last >= b.date
+            ]
+    found.sort(key=lambda c: (c.date, c.kind, c.entity_id))
+    return found
+
+# ---------- descrizione ----------
+def describe(conflict):
+    """Testo leggibile; nomi di artisti/risorse dalla cache delle anagrafiche."""
+    day = conflict.date.strftime("%d/%m/%Y")
+    titles = ", ".join(f"'{title}'" for _, title in conflict.events)
+    if conflict.kind == "artist":
+        artist = ref_cache.get("artists").by_id.get(conflict.entity_id)
+        name = artist.name if artist else f"artista #{conflict.entity_id}"
+        return f"{day}: {name} e' prenotato su {titles}"
+    resource = ref_cache.get("resources").by_id.get(conflict.entity_id)
+    name = resource_label(resource) if resource else f"risorsa #{conflict.entity_id}"
+    if conflict.kind == "resource":
+        return f"{day}: {name} e' assegnata a {titles}"
+    reason = f" ({conflict.reason})" if conflict.reason else ""
+    where = f" per {titles}" if titles else ""
+    return f"{day}: {name} non e' disponibile{reason}{where}"
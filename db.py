@@ -1,13 +1,168 @@
 # db.py
 import os
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+# Configurazione da variabili d'ambiente; opzionalmente da un file .env
+# (percorso in EVENT_CONFIG_FILE). Le variabili gia' definite nell'ambiente hanno la precedenza.
+load_dotenv(os.getenv("EVENT_CONFIG_FILE", ".env"))
+
 DB_URL = os.getenv("EVENT_DB_URL", "sqlite:///./events.db")
 
-# For SQLite, need connect_args
-connect_args = {"check_same_thread": False} if DB_URL.startswith("sqlite") else {}
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def load_settings():
+    """
+    Parametri dell'engine letti dall'ambiente.
+    Pool (solo DB server): EVENT_DB_POOL_SIZE, EVENT_DB_MAX_OVERFLOW, EVENT_DB_POOL_RECYCLE,
+    EVENT_DB_POOL_TIMEOUT, EVENT_DB_POOL_PRE_PING.
+    SQLite (PRAGMA applicati a ogni nuova connessione): EVENT_SQLITE_JOURNAL_MODE,
+    EVENT_SQLITE_SYNCHRONOUS, EVENT_SQLITE_MMAP_SIZE, EVENT_SQLITE_CACHE_SIZE, EVENT_SQLITE_BUSY_TIMEOUT.
+    """
+    return {
+        "pool_size": _env_int("EVENT_DB_POOL_SIZE", 5),
+        "max_overflow": _env_int("EVENT_DB_MAX_OVERFLOW", 10),
+        "pool_recycle": _env_int("EVENT_DB_POOL_RECYCLE", 1800),
+        "pool_timeout": _env_int("EVENT_DB_POOL_TIMEOUT", 30),
+        "pool_pre_ping": _env_bool("EVENT_DB_POOL_PRE_PING", True),
+        "sqlite_pragmas": {
+            # ms di attesa sul lock invece di "database is locked" immediato;
+            # va impostato per primo, anche il cambio di journal_mode prende il lock
+            "busy_timeout": _env_int("EVENT_SQLITE_BUSY_TIMEOUT", 5000),
+            # WAL: i lettori non bloccano lo scrittore e viceversa
+            "journal_mode": os.getenv("EVENT_SQLITE_JOURNAL_MODE", "WAL"),
+            # NORMAL in WAL: niente fsync a ogni commit, resta consistente in caso di crash
+            "synchronous": os.getenv("EVENT_SQLITE_SYNCHRONOUS", "NORMAL"),
+            "mmap_size": _env_int("EVENT_SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+            # negativo = KiB (qui 64 MB di page cache per connessione)
+            "cache_size": _env_int("EVENT_SQLITE_CACHE_SIZE", -64000),
+        },
+    }
 
-engine = create_engine(DB_URL, connect_args=connect_args)
+def build_engine(url=DB_URL, settings=None):
+    settings = settings if settings is not None else load_settings()
+    if url.startswith("sqlite"):
+        # For SQLite, need connect_args
+        eng = create_engine(url, connect_args={"check_same_thread": False})
+        pragmas = settings.get("sqlite_pragmas") or {}
+        if pragmas:
+            event.listen(eng, "connect", _sqlite_pragmas_listener(pragmas))
+        return eng
+    return create_engine(
+        url,
+        pool_size=settings["pool_size"],
+        max_overflow=settings["max_overflow"],
+        pool_recycle=settings["pool_recycle"],
+        pool_timeout=settings["pool_timeout"],
+        pool_pre_ping=settings["pool_pre_ping"],
+    )
+
+def _sqlite_pragmas_listener(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                if value is not None and value != "":
+                    cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+    return set_pragmas
+
+engine = build_engine(DB_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+# ---------- unit of work ----------
+# Una pagina (un rerun di Streamlit) o un submit apre una sola sessione con unit_of_work():
+# tutte le funzioni di utils la usano tramite session_scope(), quindi le letture condividono
+# connessione e identity map e le scritture vengono confermate con un unico commit finale.
+# Fuori da una unit of work ogni chiamata apre e chiude la propria sessione, come prima.
+# ContextVar: ogni sessione Streamlit esegue lo script in un proprio thread.
+_current_session = ContextVar("event_unit_of_work", default=None)
+
+@contextmanager
+def unit_of_work():
+    db = _current_session.get()
+    if db is not None:
+        # annidata: riusa quella esterna, che decide commit e chiusura
+        yield db
+        return
+    # expire_on_commit=False: gli oggetti letti nel rerun restano leggibili anche dopo il commit finale
+    db = SessionLocal(expire_on_commit=False)
+    token = _current_session.set(db)
+    try:
+        yield db
+    except Exception:
+        db.rollback()
+        raise
+    except BaseException:
+        # st.rerun()/st.stop() sono BaseException di controllo: il lavoro fatto va confermato
+        db.commit()
+        raise
+    else:
+        db.commit()
+    finally:
+        _current_session.reset(token)
+        db.close()
+
+def _savepoint(db):
+    """SAVEPOINT per una chiamata annidata; None se la unit of work non ha ancora scritto nulla."""
+    if db.get_bind().dialect.name == "sqlite" and not db.connection().connection.driver_connection.in_transaction:
+        # pysqlite apre la transazione solo alla prima scrittura: un SAVEPOINT aperto prima diventerebbe
+        # la transazione esterna e il suo RELEASE farebbe commit. Non c'e' comunque niente da proteggere.
+        return None
+    return db.begin_nested()
+
+@contextmanager
+def session_scope():
+    """Sessione da usare nelle funzioni di accesso ai dati: quella della unit of work attiva o una propria."""
+    db = _current_session.get()
+    if db is not None:
+        # un errore (anche BookingConflict) annulla solo questa chiamata: le scritture precedenti
+        # della unit of work restano e vengono confermate dal commit finale
+        savepoint = _savepoint(db)
+        try:
+            yield db
+        except Exception:
+            if savepoint is None:
+                db.rollback()
+            elif savepoint.is_active:
+                savepoint.rollback()
+            raise
+        else:
+            if savepoint is not None and savepoint.is_active:
+                savepoint.commit()
+        return
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def in_unit_of_work(db):
+    return db is not None and db is _current_session.get()
+
+def commit(db):
+    """Commit se la sessione e' propria; dentro una unit of work solo flush (commit unico alla fine)."""
+    if in_unit_of_work(db):
+        db.flush()
+    else:
+        db.commit()
+
+def on_commit(db, callback):
+    """Esegue callback dopo il commit effettivo (subito se la sessione e' propria e gia' confermata)."""
+    if in_unit_of_work(db):
+        event.listen(db, "after_commit", lambda session: callback(), once=True)
+    else:
+        callback()
@@ -0,0 +1,168 @@
+# exporter.py
+# Export eventi in streaming (CSV, XLSX, NDJSON) per intervallo di date / stato / artista.
+#
+# Le righe arrivano da una SELECT Core con server-side cursor (stream_results + yield_per)
+# e vengono scritte una alla volta: la memoria resta costante qualunque sia il numero di eventi.
+# Le colonne coincidono con quelle di importer, quindi un export si puo' reimportare.
+# Le occorrenze delle serie ricorrenti (id = chiave "s<serie>:<data>") si calcolano per l'intervallo
+# richiesto (senza fine: fino a series.UPCOMING_DAYS giorni da oggi) a blocchi di OCCURRENCE_DAYS giorni
+# e si intercalano per data: anche loro restano in memoria un blocco alla volta.
+import csv
+import heapq
+import json
+from datetime import date, time, timedelta
+
+from sqlalchemy import func, select
+
+from db import engine
+from models import Event, Artist, EventSeries, Format, Promoter, Resource, event_artist, event_resource
+from importer import COLUMNS
+import series
+import spans
+import utils
+
+FORMATS = ("csv", "xlsx", "ndjson")
+EXPORT_COLUMNS = ["id"] + COLUMNS
+DEFAULT_BATCH_SIZE = 1000
+OCCURRENCE_DAYS = 31
+
+def export_query(bind, start=None, end=None, status=None, artist_id=None):
+    """SELECT delle colonne esportate; artisti e risorse aggregati in SQL (separatore ';')."""
+    artists = (
+        select(utils.names_aggregate(bind, Artist.name, ";"))
+        .select_from(event_artist.join(Artist, Artist.id == event_artist.c.artist_id))
+        .where(event_artist.c.event_id == Event.id)
+        .scalar_subquery()
+    )
+    resources = (
+        select(utils.names_aggregate(bind, Resource.type + ": " + Resource.name, ";"))
+        .select_from(event_resource.join(Resource, Resource.id == event_resource.c.resource_id))
+        .where(event_resource.c.event_id == Event.id)
+        .scalar_subquery()
+    )
+    q = (
+        select(
+            Event.id,
+            Event.title,
+            Event.date,
+            Event.end_date,
+            Event.start_time,
+            Event.end_time,
+            Format.name.label("format"),
+            Promoter.name.label("promoter"),
+            Event.location,
+            Event.notes,
+            Event.status,
+            artists.label("artists"),
+            resources.label("resources"),
+        )
+        .outerjoin(Format, Format.id == Event.format_id)
+        .outerjoin(Promoter, Promoter.id == Event.promoter_id)
+        .order_by(Event.date.nulls_first(), Event.id)
+    )
+    # intervallo di date: eventi che lo toccano, anche se iniziati prima
+    if start:
+        q = q.where(*spans.overlap_criteria(start, end))
+    elif end:
+        q = q.where(Event.date <= end)
+    if status:
+        q = q.where(Event.status == status)
+    if artist_id:
+        q = q.where(Event.id.in_(select(event_artist.c.event_id).where(event_artist.c.artist_id == artist_id)))
+    return q
+
+def iter_event_rows(start=None, end=None, status=None, artist_id=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Generatore di dict (chiavi EXPORT_COLUMNS), letti a blocchi di batch_size dal cursore, con le occorrenze."""
+    with engine.connect() as conn:
+        q = export_query(conn, start, end, status, artist_id)
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(q)
+        events = ({col: row[col] for col in EXPORT_COLUMNS} for row in result.mappings())
+        occurrences = occurrence_rows(start, end, status, artist_id)
+        yield from heapq.merge(events, occurrences, key=lambda row: row["date"] or date.min)
+
+def occurrence_rows(start=None, end=None, status=None, artist_id=None):
+    """Generatore delle occorrenze delle serie come righe di export (stesse chiavi), per data."""
+    if start is None:
+        with engine.connect() as conn:
+            start = conn.execute(select(func.min(EventSeries.first_date))).scalar()
+        if start is None:
+            return
+    end = end or max(start, date.today()) + timedelta(days=series.UPCOMING_DAYS)
+    block = start
+    while block <= end:
+        block_end = min(block + timedelta(days=OCCURRENCE_DAYS - 1), end)
+        for o in series.occurrences_between(block, block_end, status=status, artist_id=artist_id):
+            # un'occorrenza su piu' giorni tocca anche il blocco successivo: si esporta dal blocco in cui inizia
+            if o.date < block and block > start:
+                continue
+            yield {
+                "id": o.id, "title": o.title, "date": o.date, "end_date": o.end_date,
+                "start_time": o.start_time, "end_time": o.end_time,
+                "format": o.format.name if o.format else None, "promoter": o.promoter.name if o.promoter else None,
+                "location": o.location, "notes": o.notes, "status": o.status,
+                "artists": ";".join(a.name for a in o.artists) or None,
+                "resources": ";".join(f"{r.type}: {r.name}" for r in o.resources) or None,
+            }
+        block = block_end + timedelta(days=1)
+
+def _cell(value):
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return "" if value is None else value
+
+# ---------- writer ----------
+def write_csv(rows, fileobj):
+    writer = csv.DictWriter(fileobj, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow({k: _cell(v) for k, v in row.items()})
+        count += 1
+    return count
+
+def write_ndjson(rows, fileobj):
+    count = 0
+    for row in rows:
+        fileobj.write(json.dumps({k: (v.isoformat() if isinstance(v, (date, time)) else v) for k, v in row.items()}, ensure_ascii=False))
+        fileobj.write("\n")
+        count += 1
+    return count
+
+def write_xlsx(rows, path):
+    from openpyxl import Workbook
+
+    # write_only: le righe vanno su file temporaneo man mano, non restano in memoria
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("eventi")
+    ws.append(EXPORT_COLUMNS)
+    count = 0
+    for row in rows:
+        ws.append([row[col] if col in ("date", "end_date") else _cell(row[col]) for col in EXPORT_COLUMNS])
+        count += 1
+    wb.save(path)
+    return count
+
+def _with_progress(rows, progress, every=DEFAULT_BATCH_SIZE):
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if count % every == 0:
+            progress(count)
+
+def export_events(path, fmt="csv", progress=None, **filters):
+    """
+    Scrive gli eventi filtrati su path nel formato indicato; restituisce il numero di righe.
+    progress(righe_scritte) viene chiamata ogni DEFAULT_BATCH_SIZE righe.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"formato non supportato: {fmt}")
+    rows = iter_event_rows(**filters)
+    if progress:
+        rows = _with_progress(rows, progress)
+    if fmt == "xlsx":
+        return write_xlsx(rows, path)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            return write_csv(rows, f)
+        return write_ndjson(rows, f)
@@ -0,0 +1,273 @@
+# ics.py
+# Feed iCalendar (RFC 5545) per artista, risorsa, promoter e feed globale.
+#
+# I feed generati sono salvati in calendar_feeds con ETag e data di generazione.
+# utils marca come stale i feed toccati da ogni create/update/delete evento (globale, promoter,
+# artisti e risorse dell'evento prima e dopo la modifica); un feed viene rigenerato solo
+# quando e' stale o non esiste ancora. Un client che fa polling costa quindi una lookup per
+# chiave (e una risposta 304 se l'ETag coincide), non una query sugli eventi.
+# La finestra del feed (da PAST_DAYS giorni fa) si sposta con la data: un feed generato in un altro
+# giorno (built_on) viene rigenerato anche se non e' stale.
+#
+# Una serie ricorrente (series.py) e' una sola VEVENT con la sua RRULE ed EXDATE per le date saltate o
+# staccate in un evento (che compare gia' come evento): i client espandono la regola, anche senza fine.
+# Le scritture di series marcano stale i feed della serie con mark_series_stale().
+import hashlib
+import os
+import re
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+
+from db import session_scope, commit
+from models import (
+    Event, Artist, Promoter, Resource, CalendarFeed, EventSeries, EventSeriesException,
+    event_artist, event_resource, series_artist, series_resource,
+)
+import series
+import spans
+import utils
+
+SCOPES = ("global", "artist", "resource", "promoter")
+# eventi passati inclusi nel feed (i calendari client non hanno bisogno di tutto lo storico)
+PAST_DAYS = int(os.getenv("EVENT_ICS_PAST_DAYS", "90"))
+PRODID = "-//gestione-eventi//Event Manager//IT"
+UID_DOMAIN = os.getenv("EVENT_ICS_UID_DOMAIN", "gestione-eventi")
+ICS_STATUS = {"proposta": "TENTATIVE", "confermato": "CONFIRMED", "cancellato": "CANCELLED"}
+
+Feed = namedtuple("Feed", ["body", "etag", "last_modified"])
+# serie nel feed: artisti per nome e date escluse dalla regola
+FeedSeries = namedtuple("FeedSeries", ["series", "artists", "exdates"])
+
+# ---------- formattazione ICS ----------
+def _escape(value):
+    return (
+        str(value or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+def _fold(line):
+    # righe max 75 ottetti, continuazione con uno spazio iniziale
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line
+    parts = []
+    while data:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(data))
+        # non spezzare un carattere UTF-8 multibyte
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+    return "\r\n ".join(parts)
+
+def _when(ev):
+    # giorni interi come VALUE=DATE (DTEND escluso); con orari, data e ora locali senza fuso
+    if ev.start_time or ev.end_time:
+        begin, finish = spans.event_interval(ev)
+        return [f"DTSTART:{begin:%Y%m%dT%H%M%S}", f"DTEND:{finish:%Y%m%dT%H%M%S}"]
+    end = ev.end_date or ev.date
+    return [f"DTSTART;VALUE=DATE:{ev.date:%Y%m%d}", f"DTEND;VALUE=DATE:{end + timedelta(days=1):%Y%m%d}"]
+
+def _rrule(s):
+    # con gli orari DTSTART e' data-ora e UNTIL deve esserlo anche lui (RFC 5545 3.3.10), senza e' una data
+    rule = s.rrule.strip()
+    if rule.upper().startswith("RRULE:"):
+        rule = rule[len("RRULE:"):]
+    if s.start_time or s.end_time:
+        rule = re.sub(r"(UNTIL=\d{8})(?=;|$)", r"\1T235959", rule, flags=re.IGNORECASE)
+    else:
+        rule = re.sub(r"(UNTIL=\d{8})T\d{6}Z?", r"\1", rule, flags=re.IGNORECASE)
+    return f"RRULE:{rule}"
+
+def _series_when(item):
+    # la prima occorrenza (DTSTART conta sempre come occorrenza, anche se la regola non la genera),
+    # la regola e le date escluse
+    s = item.series
+    day = series.parse_rule(s.rrule, s.first_date).after(datetime.combine(s.first_date, time.min), inc=True).date()
+    first = series.Booking(None, s.title, day, day + timedelta(days=(s.duration_days or 1) - 1), s.start_time, s.end_time)
+    lines = [*_when(first), _rrule(s)]
+    if item.exdates:
+        if s.start_time or s.end_time:
+            days = ",".join(f"{datetime.combine(d, s.start_time or time.min):%Y%m%dT%H%M%S}" for d in item.exdates)
+            lines.append(f"EXDATE:{days}")
+        else:
+            lines.append("EXDATE;VALUE=DATE:" + ",".join(f"{d:%Y%m%d}" for d in item.exdates))
+    return lines
+
+def render_calendar(name, events, stamp, series_items=()):
+    """events: Event con artists caricati; series_items: FeedSeries. Restituisce il testo VCALENDAR."""
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_escape(name)}",
+    ]
+    dtstamp = stamp.strftime("%Y%m%dT%H%M%SZ")
+    for ev in events:
+        artists = ", ".join(a.name for a in ev.artists)
+        description = "\n".join(filter(None, [f"Artisti: {artists}" if artists else "", ev.notes or ""]))
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:event-{ev.id}@{UID_DOMAIN}",
+            f"DTSTAMP:{dtstamp}",
+            *_when(ev),
+            f"SUMMARY:{_escape(ev.title)}",
+            f"STATUS:{ICS_STATUS.get(ev.status, 'TENTATIVE')}",
+        ]
+        if ev.location:
+            lines.append(f"LOCATION:{_escape(ev.location)}")
+        if description:
+            lines.append(f"DESCRIPTION:{_escape(description)}")
+        lines.append("END:VEVENT")
+    for item in series_items:
+        s = item.series
+        description = "\n".join(filter(None, [f"Artisti: {', '.join(item.artists)}" if item.artists else "", s.notes or ""]))
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:series-{s.id}@{UID_DOMAIN}",
+            f"DTSTAMP:{dtstamp}",
+            *_series_when(item),
+            f"SUMMARY:{_escape(s.title)}",
+            f"STATUS:{ICS_STATUS.get(s.status, 'TENTATIVE')}",
+        ]
+        if s.location:
+            lines.append(f"LOCATION:{_escape(s.location)}")
+        if description:
+            lines.append(f"DESCRIPTION:{_escape(description)}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(_fold(line) for line in lines) + "\r\n"
+
+# ---------- query per scope ----------
+def _feed_events(db, scope, entity_id):
+    q = db.query(Event).filter(*spans.overlap_criteria(date.today() - timedelta(days=PAST_DAYS)))
+    if scope == "artist":
+        q = q.filter(Event.id.in_(select(event_artist.c.event_id).where(event_artist.c.artist_id == entity_id)))
+    elif scope == "resource":
+        q = q.filter(Event.id.in_(select(event_resource.c.event_id).where(event_resource.c.resource_id == entity_id)))
+    elif scope == "promoter":
+        q = q.filter(Event.promoter_id == entity_id)
+    return q.options(*utils.event_load_options()).order_by(Event.date, Event.id).all()
+
+def _feed_series(db, scope, entity_id):
+    q = select(EventSeries).where(
+        or_(EventSeries.last_date.is_(None), EventSeries.last_date >= date.today() - timedelta(days=PAST_DAYS))
+    )
+    if scope == "artist":
+        q = q.where(EventSeries.id.in_(select(series_artist.c.series_id).where(series_artist.c.artist_id == entity_id)))
+    elif scope == "resource":
+        q = q.where(EventSeries.id.in_(select(series_resource.c.series_id).where(series_resource.c.resource_id == entity_id)))
+    elif scope == "promoter":
+        q = q.where(EventSeries.promoter_id == entity_id)
+    series_list = db.execute(q.order_by(EventSeries.first_date, EventSeries.id)).scalars().all()
+    ids = [s.id for s in series_list]
+    if not ids:
+        return []
+    artists, exdates = {}, {}
+    q = (
+        select(series_artist.c.series_id, Artist.name)
+        .join(Artist, Artist.id == series_artist.c.artist_id)
+        .where(series_artist.c.series_id.in_(ids))
+        .order_by(Artist.id)
+    )
+    for series_id, name in db.execute(q):
+        artists.setdefault(series_id, []).append(name)
+    q = (
+        select(EventSeriesException.series_id, EventSeriesException.date)
+        .where(EventSeriesException.series_id.in_(ids))
+        .order_by(EventSeriesException.date)
+    )
+    for series_id, day in db.execute(q):
+        exdates.setdefault(series_id, []).append(day)
+    return [FeedSeries(s, artists.get(s.id, []), exdates.get(s.id, [])) for s in series_list]
+
+def _feed_name(db, scope, entity_id):
+    model = {"artist": Artist, "resource": Resource, "promoter": Promoter}.get(scope)
+    if model is None:
+        return "Event Manager"
+    entity = db.get(model, entity_id)
+    return f"Event Manager - {entity.name}" if entity else None
+
+# ---------- cache ----------
+def get_feed(scope, entity_id=0):
+    """
+    Feed per (scope, entity_id) dalla cache, rigenerato se stale o mancante.
+    Restituisce Feed(body, etag, last_modified) o None se l'entita' non esiste.
+    """
+    if scope not in SCOPES:
+        raise ValueError(f"scope non valido: {scope}")
+    entity_id = 0 if scope == "global" else int(entity_id)
+    with session_scope() as db:
+        row = db.query(CalendarFeed).filter_by(scope=scope, entity_id=entity_id).one_or_none()
+        today = date.today()
+        if row is not None and not row.stale and row.built_on == today:
+            return Feed(row.body, row.etag, row.generated_at)
+        name = _feed_name(db, scope, entity_id)
+        if name is None:
+            return None
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        body = render_calendar(name, _feed_events(db, scope, entity_id), now, _feed_series(db, scope, entity_id))
+        # l'ETag dipende solo dagli eventi: DTSTAMP escluso, cosi' un feed rigenerato identico resta 304
+        etag = hashlib.sha1(body.replace(now.strftime("%Y%m%dT%H%M%SZ"), "").encode("utf-8")).hexdigest()
+        if row is None:
+            row = CalendarFeed(scope=scope, entity_id=entity_id, body=body, etag=etag, generated_at=now.replace(tzinfo=None))
+            db.add(row)
+        elif row.etag != etag:
+            row.body, row.etag, row.generated_at = body, etag, now.replace(tzinfo=None)
+        row.stale, row.built_on = False, today
+        feed = Feed(row.body, row.etag, row.generated_at)
+        try:
+            commit(db)
+        except IntegrityError:
+            # un'altra richiesta ha appena creato lo stesso feed: il contenuto generato e' comunque valido
+            db.rollback()
+        return feed
+
+def mark_stale(db, artist_ids=(), resource_ids=(), promoter_ids=()):
+    """Marca come stale il feed globale e quelli delle entita' indicate (una UPDATE)."""
+    keys = [("global", 0)]
+    keys += [("artist", i) for i in artist_ids if i]
+    keys += [("resource", i) for i in resource_ids if i]
+    keys += [("promoter", i) for i in promoter_ids if i]
+    db.execute(
+        update(CalendarFeed)
+        .where(tuple_(CalendarFeed.scope, CalendarFeed.entity_id).in_(keys))
+        .values(stale=True)
+    )
+
+def mark_all_stale(db):
+    """Scritture massive (generatore di dati): tutti i feed vanno rigenerati alla prossima richiesta."""
+    db.execute(update(CalendarFeed).values(stale=True))
+
+def mark_event_stale(db, event_id):
+    """Marca i feed che contengono l'evento (stato corrente in DB: chiamare prima e dopo una modifica)."""
+    artist_ids = db.execute(select(event_artist.c.artist_id).where(event_artist.c.event_id == event_id)).scalars().all()
+    resource_ids = db.execute(select(event_resource.c.resource_id).where(event_resource.c.event_id == event_id)).scalars().all()
+    promoter_id = db.execute(select(Event.promoter_id).where(Event.id == event_id)).scalar()
+    mark_stale(db, artist_ids, resource_ids, [promoter_id])
+
+def mark_series_stale(db, series_id):
+    """Come mark_event_stale, per una serie ricorrente."""
+    artist_ids = db.execute(select(series_artist.c.artist_id).where(series_artist.c.series_id == series_id)).scalars().all()
+    resource_ids = db.execute(select(series_resource.c.resource_id).where(series_resource.c.series_id == series_id)).scalars().all()
+    promoter_id = db.execute(select(EventSeries.promoter_id).where(EventSeries.id == series_id)).scalar()
+    mark_stale(db, artist_ids, resource_ids, [promoter_id])
+
+def mark_entity_stale(db, scope, entity_id):
+    """Modifica/eliminazione di un'anagrafica: cambia il nome del calendario (e, per gli artisti, le descrizioni)."""
+    stmt = update(CalendarFeed).values(stale=True)
+    if scope != "artist":
+        stmt = stmt.where(or_(CalendarFeed.scope == "global", (CalendarFeed.scope == scope) & (CalendarFeed.entity_id == entity_id)))
+    db.execute(stmt)
+
+def feed_path(scope, entity_id=0):
+    return "/ics/global.ics" if scope == "global" else f"/ics/{scope}/{entity_id}.ics"
@@ -0,0 +1,98 @@
+# ics_server.py
+# Server HTTP minimale (solo libreria standard) per i feed iCalendar.
+#
+#   python manage.py ics-serve --port 8502
+#
+# URL: /ics/global.ics, /ics/artist/<id>.ics, /ics/resource/<id>.ics, /ics/promoter/<id>.ics
+# Se EVENT_ICS_TOKEN e' impostata, ogni richiesta deve avere ?token=<valore>.
+# Di default ascolta solo su 127.0.0.1: un indirizzo raggiungibile da fuori richiede il token.
+# Supporta ETag/If-None-Match e Last-Modified/If-Modified-Since: un client aggiornato riceve 304.
+import calendar
+import hmac
+import ipaddress
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import ics
+
+_PATH = re.compile(r"^/ics/(?:(global)|(artist|resource|promoter)/(\d+))\.ics$")
+
+class FeedHandler(BaseHTTPRequestHandler):
+    server_version = "EventManagerICS/1.0"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        token = os.getenv("EVENT_ICS_TOKEN")
+        if token and not hmac.compare_digest(parse_qs(url.query).get("token", [""])[0], token):
+            self.send_error(403)
+            return
+        m = _PATH.match(url.path)
+        if not m:
+            self.send_error(404)
+            return
+        scope = m.group(1) or m.group(2)
+        entity_id = int(m.group(3) or 0)
+        feed = ics.get_feed(scope, entity_id)
+        if feed is None:
+            self.send_error(404)
+            return
+
+        etag = f'"{feed.etag}"'
+        # generated_at e' salvato in UTC senza tzinfo
+        last_modified = formatdate(calendar.timegm(feed.last_modified.timetuple()), usegmt=True)
+        if self._not_modified(etag, feed.last_modified):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self.end_headers()
+            return
+        body = feed.body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/calendar; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.send_header("Cache-Control", "private, max-age=300")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_modified(self, etag, last_modified):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match:
+            return etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).replace(tzinfo=None)
+            except (TypeError, ValueError):
+                return False
+            return last_modified.replace(tzinfo=None, microsecond=0) <= since
+        return False
+
+    def log_message(self, format, *args):
+        if os.getenv("EVENT_ICS_ACCESS_LOG"):
+            super().log_message(format, *args)
+
+def _is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def serve(host="127.0.0.1", port=8502):
+    """ValueError se host non e' locale e EVENT_ICS_TOKEN non e' impostata (feed leggibili da chiunque)."""
+    if not _is_loopback(host) and not os.getenv("EVENT_ICS_TOKEN"):
+        raise ValueError(f"{host or 'tutte le interfacce'}: per servire i feed fuori da localhost imposta EVENT_ICS_TOKEN")
+    httpd = ThreadingHTTPServer((host, port), FeedHandler)
+    print(f"Feed ICS su http://{host}:{port}/ics/global.ics")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
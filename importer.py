@@ -0,0 +1,282 @@
+# importer.py
+# Import massivo di eventi da CSV/XLSX (piani di stagione con migliaia di righe).
+#
+# Il file viene letto a blocchi (pandas per CSV, openpyxl read-only per XLSX), i nomi di
+# format/promoter/artisti/risorse sono risolti con mappe nome -> id costruite una volta sola,
+# e ogni blocco e' scritto in una transazione con INSERT executemany (eventi + associazioni).
+#
+# Colonne riconosciute (intestazione, maiuscole/minuscole indifferenti):
+#   title, date, end_date, start_time, end_time, format, promoter, location, notes, status, artists, resources
+# artists e resources contengono piu' valori separati da ";" (risorse come "Tipo: Nome").
+# end_date, start_time ed end_time sono facoltativi: senza end_date vale la durata del format.
+# Come create_event, una riga che crea una doppia prenotazione (con eventi e serie gia' nel DB o
+# con le righe precedenti dello stesso blocco) non viene inserita ed e' riportata tra gli errori,
+# salvo allow_conflicts; il controllo e' una query per tipo per blocco (conflicts.check_new_events).
+import os
+import time
+from collections import namedtuple
+from datetime import date, datetime, time as time_of_day
+
+from sqlalchemy import insert, select
+
+from db import engine, session_scope
+from models import Event, Artist, Format, Promoter, Resource, event_artist, event_resource
+from cache import resource_label
+import search as search_module
+import conflicts
+import ics
+import spans
+import stats
+
+COLUMNS = ["title", "date", "end_date", "start_time", "end_time", "format", "promoter", "location", "notes", "status", "artists", "resources"]
+STATUSES = ("proposta", "confermato", "cancellato")
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y")
+TIME_FORMATS = ("%H:%M", "%H:%M:%S", "%H.%M")
+DEFAULT_CHUNK_SIZE = 1000
+_LABELS = {"format": "format", "promoter": "promoter", "artist": "artista", "resource": "risorsa"}
+
+ImportReport = namedtuple("ImportReport", ["rows_read", "inserted", "errors", "seconds"])
+
+def rows_per_second(report):
+    return report.rows_read / report.seconds if report.seconds else 0.0
+
+# ---------- lettura a blocchi ----------
+def _normalize_header(name):
+    return str(name or "").strip().lower()
+
+def iter_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Restituisce blocchi di (numero riga, dict con colonne normalizzate) senza caricare tutto il file.
+    Il numero e' quello della riga nel file (intestazione = 1); le righe vuote sono saltate ma contate.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        yield from _iter_xlsx(path, chunk_size)
+    else:
+        yield from _iter_csv(path, chunk_size)
+
+def _iter_csv(path, chunk_size):
+    import pandas as pd
+
+    # skip_blank_lines=False: le righe vuote arrivano (come NaN) e il numero di riga resta esatto
+    reader = pd.read_csv(
+        path, chunksize=chunk_size, dtype=str, keep_default_na=False, sep=None, engine="python", skip_blank_lines=False,
+    )
+    line = 1
+    for frame in reader:
+        frame.columns = [_normalize_header(c) for c in frame.columns]
+        chunk = []
+        for row in frame.fillna("").to_dict("records"):
+            line += 1
+            if any(v for v in row.values()):
+                chunk.append((line, row))
+        if chunk:
+            yield chunk
+
+def _iter_xlsx(path, chunk_size):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [_normalize_header(c) for c in next(rows, [])]
+        chunk = []
+        for line, values in enumerate(rows, 2):
+            if values is None or all(v is None for v in values):
+                continue
+            chunk.append((line, dict(zip(header, values))))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        wb.close()
+
+# ---------- validazione ----------
+def _text(value):
+    if value is None:
+        return ""
+    return str(value).strip()
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = _text(value)
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"data non valida: {text!r}")
+
+def _parse_time(value):
+    if isinstance(value, datetime):
+        return value.time()
+    if isinstance(value, time_of_day):
+        return value
+    text = _text(value)
+    if not text:
+        return None
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).time()
+        except ValueError:
+            continue
+    raise ValueError(f"orario non valido: {text!r}")
+
+def _split(value):
+    return [part.strip() for part in _text(value).split(";") if part.strip()]
+
+def load_name_maps(conn):
+    """Mappe nome -> id per le anagrafiche (e format id -> durata in giorni); una query per tabella."""
+    resources = conn.execute(select(Resource.id, Resource.type, Resource.name)).all()
+    formats = conn.execute(select(Format.id, Format.name, Format.default_duration_days)).all()
+    return {
+        "format": {name: id_ for id_, name, _ in formats},
+        "duration": {id_: days for id_, _, days in formats},
+        "promoter": {name: id_ for id_, name in conn.execute(select(Promoter.id, Promoter.name))},
+        "artist": {name: id_ for id_, name in conn.execute(select(Artist.id, Artist.name))},
+        "resource": {resource_label(r): r.id for r in resources},
+    }
+
+def validate_row(row, maps):
+    """Restituisce (valori evento, artist_ids, resource_ids) o solleva ValueError con tutti i problemi della riga."""
+    problems = []
+    title = _text(row.get("title"))
+    if not title:
+        problems.append("titolo mancante")
+    try:
+        event_date = _parse_date(row.get("date"))
+    except ValueError as e:
+        event_date = None
+        problems.append(str(e))
+    try:
+        end_date = _parse_date(row.get("end_date")) if _text(row.get("end_date")) else None
+    except ValueError as e:
+        end_date = None
+        problems.append(f"fine: {e}")
+    try:
+        start_time, end_time = _parse_time(row.get("start_time")), _parse_time(row.get("end_time"))
+    except ValueError as e:
+        start_time = end_time = None
+        problems.append(str(e))
+    status = _text(row.get("status")).lower() or "proposta"
+    if status not in STATUSES:
+        problems.append(f"stato non valido: {status!r}")
+
+    def lookup(kind, name):
+        if not name:
+            return None
+        found = maps[kind].get(name)
+        if found is None:
+            problems.append(f"{_LABELS[kind]} non trovato: {name!r}")
+        return found
+
+    format_id = lookup("format", _text(row.get("format")))
+    promoter_id = lookup("promoter", _text(row.get("promoter")))
+    artist_ids = {i for i in (lookup("artist", n) for n in _split(row.get("artists"))) if i}
+    resource_ids = {i for i in (lookup("resource", n) for n in _split(row.get("resources"))) if i}
+    if event_date:
+        end_date = end_date or spans.default_end(event_date, maps["duration"].get(format_id), start_time, end_time)
+        try:
+            spans.validate(event_date, end_date, start_time, end_time)
+        except ValueError as e:
+            problems.append(str(e))
+    if problems:
+        raise ValueError("; ".join(problems))
+    values = {
+        "title": title,
+        "date": event_date,
+        "end_date": end_date,
+        "start_time": start_time,
+        "end_time": end_time,
+        "format_id": format_id,
+        "promoter_id": promoter_id,
+        "location": _text(row.get("location")) or None,
+        "notes": _text(row.get("notes")) or None,
+        "status": status,
+    }
+    return values, artist_ids, resource_ids
+
+# ---------- scrittura ----------
+def _insert_chunk(conn, valid):
+    events = Event.__table__
+    # RETURNING con ordine dei parametri garantito: id generati allineati alle righe
+    result = conn.execute(
+        insert(events).returning(events.c.id, sort_by_parameter_order=True),
+        [values for values, _, _ in valid],
+    )
+    ids = [row[0] for row in result]
+    artist_rows = [{"event_id": ev_id, "artist_id": a} for ev_id, (_, artists, _) in zip(ids, valid) for a in artists]
+    resource_rows = [{"event_id": ev_id, "resource_id": r} for ev_id, (_, _, resources) in zip(ids, valid) for r in resources]
+    if artist_rows:
+        conn.execute(event_artist.insert(), artist_rows)
+    if resource_rows:
+        conn.execute(event_resource.insert(), resource_rows)
+    search_module.index_events(conn, ids)
+    ics.mark_stale(
+        conn,
+        artist_ids={a for _, artists, _ in valid for a in artists},
+        resource_ids={r for _, _, resources in valid for r in resources},
+        promoter_ids={values["promoter_id"] for values, _, _ in valid},
+    )
+    stats.apply(conn, added=[
+        stats.Snapshot(values["date"], values["status"], values["promoter_id"], values["format_id"], tuple(artists), values["end_date"])
+        for values, artists, _ in valid
+    ])
+    return ids
+
+def _chunk_conflicts(valid):
+    """(numero riga, messaggio) delle righe valide in conflitto; valid: lista di (riga, valori, artisti, risorse)."""
+    with session_scope() as db:
+        found = conflicts.check_new_events(db, valid)
+    return [
+        (line, "doppia prenotazione: " + "; ".join(conflicts.describe(c) for c in found[line]))
+        for line, _, _, _ in valid if line in found
+    ]
+
+def import_events(path, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False, progress=None, allow_conflicts=False):
+    """
+    Importa gli eventi dal file. Le righe valide di ogni blocco sono scritte in una transazione;
+    le righe non valide o in conflitto (salvo allow_conflicts) sono saltate e riportate in errors
+    come (numero riga, messaggio). progress(rows_read, inserted) viene chiamata dopo ogni blocco.
+    """
+    t0 = time.perf_counter()
+    rows_read = inserted = 0
+    errors = []
+    with engine.connect() as conn:
+        maps = load_name_maps(conn)
+    for chunk in iter_chunks(path, chunk_size):
+        valid, chunk_errors = [], []
+        for line, row in chunk:
+            try:
+                valid.append((line, *validate_row(row, maps)))
+            except ValueError as e:
+                chunk_errors.append((line, str(e)))
+        if valid and not allow_conflicts:
+            conflicting = _chunk_conflicts(valid)
+            skipped = {line for line, _ in conflicting}
+            valid = [row for row in valid if row[0] not in skipped]
+            chunk_errors = sorted(chunk_errors + conflicting)
+        errors += chunk_errors
+        rows_read += len(chunk)
+        if valid and not dry_run:
+            with engine.begin() as conn:
+                inserted += len(_insert_chunk(conn, [row[1:] for row in valid]))
+        if progress:
+            progress(rows_read, inserted)
+    return ImportReport(rows_read, inserted, errors, time.perf_counter() - t0)
+
+def format_report(report, max_errors=20):
+    lines = [
+        f"Righe lette: {report.rows_read}  inserite: {report.inserted}  errori: {len(report.errors)}",
+        f"Tempo: {report.seconds:.2f}s  ({rows_per_second(report):.0f} righe/s)",
+    ]
+    for line, message in report.errors[:max_errors]:
+        lines.append(f"  riga {line}: {message}")
+    if len(report.errors) > max_errors:
+        lines.append(f"  ... altri {len(report.errors) - max_errors} errori")
+    return "\n".join(lines)
@@ -0,0 +1,267 @@
+# jobs.py
+# Job in background per le operazioni lunghe di amministrazione (seed, import, export, ricostruzioni).
+#
+# Ogni job e' una riga della tabella jobs (stato, avanzamento, messaggio, risultato) ed e' eseguito
+# da un ThreadPoolExecutor di processo con al massimo EVENT_JOB_WORKERS job in parallelo; gli altri
+# restano in coda. La pagina Admin legge la tabella per mostrare l'avanzamento, quindi piu' admin
+# possono accodare job senza bloccare le proprie sessioni Streamlit.
+#
+# Una funzione job riceve un JobContext: ctx.progress(frazione, messaggio) aggiorna la riga
+# (al massimo ogni PROGRESS_INTERVAL secondi) e solleva JobCancelled se e' stato chiesto l'annullamento.
+# I job che non chiamano mai ctx.progress si registrano con cancellable=False: si possono annullare
+# solo finche' sono in coda. I passaggi di stato (queued -> running / cancelled) sono UPDATE
+# condizionati sullo stato, quindi un annullamento e l'avvio dello stesso job non si sovrappongono.
+# Gli orari sono salvati in UTC (senza fuso); local_time() li converte per la UI.
+#
+# I file degli export restano su disco per il download: ogni nuovo export elimina quelli dei job
+# conclusi oltre gli ultimi EXPORT_KEEP (la riga del job resta, senza link).
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select, update
+
+from db import SessionLocal
+from models import Job
+
+MAX_WORKERS = int(os.getenv("EVENT_JOB_WORKERS", "2"))
+PROGRESS_INTERVAL = 0.5
+EXPORT_KEEP = int(os.getenv("EVENT_EXPORT_KEEP", "5"))
+ACTIVE = ("queued", "running")
+
+_registry = {}
+_executor = None
+_executor_lock = threading.Lock()
+
+class JobCancelled(Exception):
+    pass
+
+def job(kind, label=None, cancellable=True):
+    """Decoratore: registra fn(ctx, **params) come tipo di job; cancellable=False se fn non chiama ctx.progress."""
+    def register(fn):
+        _registry[kind] = (fn, label or kind, cancellable)
+        return fn
+    return register
+
+def job_label(kind):
+    return _registry[kind][1] if kind in _registry else kind
+
+def can_cancel(row):
+    """Un job in coda si annulla sempre; uno in esecuzione solo se controlla l'annullamento."""
+    return row.status == "queued" or (row.status == "running" and row.kind in _registry and _registry[row.kind][2])
+
+def _now():
+    # UTC senza tzinfo: le colonne DateTime non conservano il fuso
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def local_time(value):
+    """Orario di un job (UTC) nel fuso locale del server."""
+    return value.replace(tzinfo=timezone.utc).astimezone() if value else None
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="job")
+        return _executor
+
+def _update(job_id, **values):
+    with SessionLocal() as db:
+        db.execute(update(Job).where(Job.id == job_id).values(**values))
+        db.commit()
+
+class JobContext:
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._last = 0.0
+
+    def cancelled(self):
+        with SessionLocal() as db:
+            return bool(db.get(Job, self.job_id).cancel_requested)
+
+    def progress(self, fraction=None, message=None, force=False):
+        """fraction in [0, 1] o None se il totale non e' noto."""
+        now = time.monotonic()
+        if not force and now - self._last < PROGRESS_INTERVAL:
+            return
+        self._last = now
+        if self.cancelled():
+            raise JobCancelled()
+        values = {"message": message}
+        if fraction is not None:
+            values["progress"] = max(0.0, min(1.0, float(fraction)))
+        _update(self.job_id, **values)
+
+# ---------- API ----------
+def submit(kind, params=None, user=None):
+    """Accoda un job e restituisce il suo id; l'esecuzione parte appena c'e' un worker libero."""
+    if kind not in _registry:
+        raise ValueError(f"tipo di job sconosciuto: {kind}")
+    with SessionLocal() as db:
+        row = Job(kind=kind, params=json.dumps(params or {}), status="queued", progress=0.0,
+                  created_by=user, created_at=_now())
+        db.add(row)
+        db.commit()
+        job_id = row.id
+    _pool().submit(_run, job_id)
+    return job_id
+
+def cancel(job_id):
+    """Un job in coda non partira'; uno in esecuzione si ferma al prossimo ctx.progress()."""
+    with SessionLocal() as db:
+        # condizionato su queued: se _run lo ha appena avviato non cambia nulla e si passa al caso running
+        done = db.execute(
+            update(Job).where(Job.id == job_id, Job.status == "queued")
+            .values(status="cancelled", cancel_requested=True, finished_at=_now())
+        ).rowcount
+        if not done:
+            cancellable = [kind for kind, (_, _, flag) in _registry.items() if flag]
+            done = db.execute(
+                update(Job).where(Job.id == job_id, Job.status == "running", Job.kind.in_(cancellable))
+                .values(cancel_requested=True)
+            ).rowcount
+        db.commit()
+        return bool(done)
+
+def list_jobs(limit=20):
+    with SessionLocal(expire_on_commit=False) as db:
+        return db.query(Job).order_by(Job.id.desc()).limit(limit).all()
+
+def get_job(job_id):
+    with SessionLocal(expire_on_commit=False) as db:
+        return db.get(Job, job_id)
+
+def result(row):
+    return json.loads(row.result) if row and row.result else None
+
+def active_count(exclude_id=None):
+    """Job in coda o in esecuzione, escluso exclude_id (il job che chiede)."""
+    with SessionLocal() as db:
+        q = db.query(func.count(Job.id)).filter(Job.status.in_(ACTIVE))
+        if exclude_id is not None:
+            q = q.filter(Job.id != exclude_id)
+        return q.scalar()
+
+def purge_exports(keep=EXPORT_KEEP):
+    """Elimina i file degli export conclusi piu' vecchi degli ultimi keep; restituisce quanti ne ha eliminati."""
+    with SessionLocal() as db:
+        old = db.execute(
+            select(Job.params).where(Job.kind == "export", Job.status.not_in(ACTIVE))
+            .order_by(Job.id.desc()).offset(keep)
+        ).scalars().all()
+    removed = 0
+    for params in old:
+        path = json.loads(params or "{}").get("path")
+        if path and os.path.exists(path):
+            os.unlink(path)
+            removed += 1
+    return removed
+
+def recover(reason="interrotto dal riavvio del server"):
+    """
+    All'avvio del processo: i job rimasti in coda/in esecuzione da un processo precedente non ripartono.
+    Anche dopo un ripristino: lo snapshot contiene i job attivi al momento del backup.
+    """
+    with SessionLocal() as db:
+        db.execute(
+            update(Job).where(Job.status.in_(ACTIVE))
+            .values(status="failed", error=reason, finished_at=_now())
+        )
+        db.commit()
+
+def _run(job_id):
+    with SessionLocal() as db:
+        # solo un job ancora in coda parte: un cancel() concorrente vince o perde per intero
+        started = db.execute(
+            update(Job).where(Job.id == job_id, Job.status == "queued").values(status="running", started_at=_now())
+        ).rowcount
+        db.commit()
+        if not started:
+            return
+        row = db.get(Job, job_id)
+        kind, params = row.kind, json.loads(row.params or "{}")
+    fn = _registry[kind][0]
+    ctx = JobContext(job_id)
+    try:
+        value = fn(ctx, **params)
+    except JobCancelled:
+        _update(job_id, status="cancelled", finished_at=_now())
+    except Exception as e:
+        _update(job_id, status="failed", error=f"{e}\n\n{traceback.format_exc()}", finished_at=_now())
+    else:
+        _update(job_id, status="done", progress=1.0, result=json.dumps(value, default=str), finished_at=_now())
+
+# ---------- job disponibili ----------
+@job("seed", "Seed dati di esempio", cancellable=False)
+def _seed_job(ctx):
+    from seed_data import seed
+    from cache import ref_cache
+    seed()
+    ref_cache.invalidate()
+    return {"message": "Seed eseguito"}
+
+@job("import", "Import eventi")
+def _import_job(ctx, path, dry_run=False, delete_after=True, allow_conflicts=False):
+    import importer
+    try:
+        report = importer.import_events(
+            path, dry_run=dry_run, allow_conflicts=allow_conflicts,
+            # il totale righe non e' noto prima di leggere il file: l'avanzamento e' un conteggio
+            progress=lambda read, inserted: ctx.progress(None, f"{read} righe lette, {inserted} inserite"),
+        )
+    finally:
+        if delete_after and os.path.exists(path):
+            os.unlink(path)
+    return {
+        "rows_read": report.rows_read, "inserted": report.inserted, "seconds": report.seconds,
+        "errors": report.errors[:500], "error_count": len(report.errors),
+    }
+
+@job("export", "Export eventi")
+def _export_job(ctx, path, fmt, filename, start=None, end=None, status=None, artist_id=None):
+    import exporter
+    from datetime import date
+    purge_exports()
+    try:
+        count = exporter.export_events(
+            path, fmt,
+            start=date.fromisoformat(start) if start else None,
+            end=date.fromisoformat(end) if end else None,
+            status=status, artist_id=artist_id,
+            progress=lambda n: ctx.progress(None, f"{n} eventi scritti"),
+        )
+    except BaseException:
+        # file parziale (errore o annullamento): non deve restare scaricabile
+        if os.path.exists(path):
+            os.unlink(path)
+        raise
+    return {"path": path, "filename": filename, "count": count}
+
+@job("stats_rebuild", "Ricalcolo statistiche", cancellable=False)
+def _stats_job(ctx):
+    import stats
+    stats.rebuild()
+    return {"message": "Contatori ricalcolati"}
+
+@job("backup", "Backup database")
+def _backup_job(ctx):
+    import backup
+    report = backup.backup(progress=lambda f: ctx.progress(f, "copia in corso"))
+    return {"message": backup.format_report(report), "path": report.path}
+
+# progress solo a copia finita: un annullamento arriverebbe a ripristino gia' fatto
+@job("restore", "Ripristino database", cancellable=False)
+def _restore_job(ctx, path):
+    import backup
+    report = backup.restore(path, progress=lambda f: ctx.progress(f, "ripristino in corso"), job_id=ctx.job_id)
+    return {"message": backup.format_report(report, "Ripristino"), "path": report.path}
+
+@job("search_rebuild", "Ricostruzione indice di ricerca", cancellable=False)
+def _search_job(ctx):
+    import search
+    search.rebuild_index()
+    return {"message": "Indice ricostruito"}
@@ -0,0 +1,202 @@
+# manage.py
+# Comandi di amministrazione da riga di comando.
+#
+#   python manage.py migrate          # applica le migrazioni Alembic
+#   python manage.py seed             # crea i dati di esempio mancanti
+#   python manage.py generate         # dataset sintetico per test di carico (--events 1000000)
+#   python manage.py import FILE      # import massivo eventi da CSV/XLSX
+#   python manage.py export FILE      # export eventi in CSV/XLSX/NDJSON (streaming)
+#   python manage.py ics-serve        # server HTTP dei feed iCalendar
+#   python manage.py conflicts        # doppie prenotazioni artisti/risorse in un periodo
+#   python manage.py stats-rebuild    # ricalcola i contatori della Dashboard
+#   python manage.py backup           # snapshot online del DB (gzip, rotazione)
+#   python manage.py restore FILE     # ripristina uno snapshot
+import argparse
+import os
+import time
+from datetime import date
+
+def cmd_migrate(args):
+    from bootstrap import migrate
+    migrate(args.revision)
+    print(f"Schema aggiornato a {args.revision}.")
+
+def cmd_seed(args):
+    from bootstrap import migrate
+    from seed_data import seed
+    migrate()
+    seed()
+    print("DB seeded.")
+
+def cmd_generate(args):
+    from bootstrap import migrate
+    import seed_data
+    migrate()
+
+    def progress(written, total):
+        print(f"  {written}/{total} eventi", flush=True)
+
+    report = seed_data.generate(
+        events=args.events, artists=args.artists, formats=args.formats, promoters=args.promoters,
+        resources=args.resources, start=_parse_date(args.date_from), end=_parse_date(args.date_to),
+        seed=args.seed, chunk_size=args.chunk_size, progress=progress,
+    )
+    print(seed_data.format_report(report))
+
+def cmd_import(args):
+    import importer
+
+    def progress(rows_read, inserted):
+        print(f"  {rows_read} righe lette, {inserted} inserite", flush=True)
+
+    report = importer.import_events(
+        args.path, chunk_size=args.chunk_size, dry_run=args.dry_run, progress=progress, allow_conflicts=args.allow_conflicts,
+    )
+    print(importer.format_report(report, max_errors=args.max_errors))
+    return 1 if report.errors else 0
+
+def cmd_export(args):
+    import exporter
+    import utils
+
+    fmt = args.format or os.path.splitext(args.path)[1].lstrip(".").lower() or "csv"
+    artist_id = None
+    if args.artist:
+        artist = utils.artist_index().by_name.get(args.artist)
+        if artist is None:
+            print(f"Artista non trovato: {args.artist}")
+            return 1
+        artist_id = artist.id
+    t0 = time.perf_counter()
+    count = exporter.export_events(
+        args.path, fmt,
+        start=_parse_date(args.date_from), end=_parse_date(args.date_to),
+        status=args.status, artist_id=artist_id,
+    )
+    elapsed = time.perf_counter() - t0
+    print(f"{count} eventi esportati in {args.path} ({elapsed:.2f}s)")
+
+def cmd_stats_rebuild(args):
+    import stats
+    t0 = time.perf_counter()
+    stats.rebuild()
+    print(f"Contatori ricalcolati ({time.perf_counter() - t0:.2f}s).")
+
+def cmd_backup(args):
+    import backup
+    directory = args.dir or backup.BACKUP_DIR
+    if args.list:
+        for name, _, size, modified in backup.list_backups(directory):
+            print(f"{modified:%Y-%m-%d %H:%M:%S}  {size / 1e6:9.1f} MB  {name}")
+        return
+    report = backup.backup(directory, keep=backup.KEEP if args.keep is None else args.keep)
+    print(backup.format_report(report))
+
+def cmd_restore(args):
+    import backup
+    if not args.yes:
+        answer = input(f"Ripristinare {args.path}? Il contenuto attuale del DB verra' sostituito [s/N] ")
+        if answer.strip().lower() not in ("s", "si", "y", "yes"):
+            return 1
+    report = backup.restore(args.path, args.dir or backup.BACKUP_DIR)
+    print(backup.format_report(report, "Ripristino"))
+
+def cmd_ics_serve(args):
+    from bootstrap import migrate
+    from ics_server import serve
+    migrate()
+    try:
+        serve(args.host, args.port)
+    except ValueError as e:
+        print(e)
+        return 1
+
+def cmd_conflicts(args):
+    import conflicts
+
+    start = _parse_date(args.date_from) or date(date.today().year, 1, 1)
+    end = _parse_date(args.date_to) or date(start.year, 12, 31)
+    t0 = time.perf_counter()
+    found = conflicts.season_conflicts(start, end)
+    elapsed = time.perf_counter() - t0
+    for c in found:
+        print(conflicts.describe(c))
+    print(f"{len(found)} conflitti dal {start} al {end} ({elapsed * 1000:.1f} ms)")
+    return 1 if found else 0
+
+def _parse_date(value):
+    return date.fromisoformat(value) if value else None
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Event Manager - comandi di amministrazione")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("migrate", help="applica le migrazioni dello schema")
+    p.add_argument("revision", nargs="?", default="head")
+    p.set_defaults(func=cmd_migrate)
+
+    p = sub.add_parser("seed", help="crea utenti e dati di esempio mancanti")
+    p.set_defaults(func=cmd_seed)
+
+    p = sub.add_parser("generate", help="aggiunge un dataset sintetico deterministico (test di carico)")
+    p.add_argument("--events", type=int, default=10000)
+    p.add_argument("--artists", type=int, default=200)
+    p.add_argument("--formats", type=int, default=12)
+    p.add_argument("--promoters", type=int, default=80)
+    p.add_argument("--resources", type=int, default=300)
+    p.add_argument("--from", dest="date_from", help="prima data (default: 1 gennaio di due anni fa)")
+    p.add_argument("--to", dest="date_to", help="ultima data (default: 31 dicembre dell'anno prossimo)")
+    p.add_argument("--seed", type=int, default=42, help="stesso seed, stessi dati")
+    p.add_argument("--chunk-size", type=int, default=50000)
+    p.set_defaults(func=cmd_generate)
+
+    p = sub.add_parser("import", help="importa eventi da CSV/XLSX")
+    p.add_argument("path")
+    p.add_argument("--chunk-size", type=int, default=1000)
+    p.add_argument("--dry-run", action="store_true", help="valida soltanto, senza scrivere")
+    p.add_argument("--max-errors", type=int, default=50, help="errori da mostrare nel riepilogo")
+    p.add_argument("--allow-conflicts", action="store_true", help="importa anche le righe con doppie prenotazioni")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("export", help="esporta eventi in CSV/XLSX/NDJSON")
+    p.add_argument("path")
+    p.add_argument("--format", choices=["csv", "xlsx", "ndjson"], help="default: dall'estensione del file")
+    p.add_argument("--from", dest="date_from", help="data iniziale (YYYY-MM-DD)")
+    p.add_argument("--to", dest="date_to", help="data finale inclusa (YYYY-MM-DD)")
+    p.add_argument("--status", choices=["proposta", "confermato", "cancellato"])
+    p.add_argument("--artist", help="nome artista")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("conflicts", help="elenca le doppie prenotazioni di artisti e risorse")
+    p.add_argument("--from", dest="date_from", help="data iniziale (default: 1 gennaio dell'anno corrente)")
+    p.add_argument("--to", dest="date_to", help="data finale inclusa (default: 31 dicembre)")
+    p.set_defaults(func=cmd_conflicts)
+
+    p = sub.add_parser("stats-rebuild", help="ricalcola da zero i contatori della Dashboard")
+    p.set_defaults(func=cmd_stats_rebuild)
+
+    p = sub.add_parser("backup", help="snapshot online del database con rotazione")
+    p.add_argument("--dir", default=None, help="cartella degli snapshot (default EVENT_BACKUP_DIR)")
+    p.add_argument("--keep", type=int, default=None, help="snapshot da conservare (default EVENT_BACKUP_KEEP)")
+    p.add_argument("--list", action="store_true", help="elenca gli snapshot presenti")
+    p.set_defaults(func=cmd_backup)
+
+    p = sub.add_parser("restore", help="ripristina uno snapshot (prima ne salva uno dello stato attuale)")
+    p.add_argument("path")
+    p.add_argument("--dir", default=None, help="cartella degli snapshot (default EVENT_BACKUP_DIR)")
+    p.add_argument("--yes", action="store_true", help="non chiedere conferma")
+    p.set_defaults(func=cmd_restore)
+
+    p = sub.add_parser("ics-serve", help="serve i feed iCalendar (globale, artista, risorsa, promoter)")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8502)
+    p.set_defaults(func=cmd_ics_serve)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args) or 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
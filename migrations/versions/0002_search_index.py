@@ -0,0 +1,54 @@
+"""search index (FTS5 su SQLite, pg_trgm su PostgreSQL)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 17:20:00.000000
+"""
+from alembic import op
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# DDL dell'indice come a questa revisione (search.create_index), copiato qui perche' la
+# migrazione non cambi quando cambia search.py
+_TRGM_COLUMNS = (("events", "title"), ("events", "location"), ("events", "notes"), ("artists", "name"))
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        # idempotente: i DB creati prima delle migrazioni possono avere gia' events_fts
+        exists = bind.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'events_fts'"
+        ).first()
+        if exists:
+            return
+        op.execute(
+            "CREATE VIRTUAL TABLE events_fts USING fts5("
+            "title, location, notes, artists, tokenize = 'trigram')"
+        )
+        op.execute(
+            "INSERT INTO events_fts (rowid, title, location, notes, artists) "
+            "SELECT e.id, e.title, e.location, e.notes, "
+            "       (SELECT group_concat(a.name, ' ') FROM event_artist ea "
+            "        JOIN artists a ON a.id = ea.artist_id WHERE ea.event_id = e.id) "
+            "FROM events e"
+        )
+    elif bind.dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for table, column in _TRGM_COLUMNS:
+            op.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_{column}_trgm "
+                f"ON {table} USING gin ({column} gin_trgm_ops)"
+            )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        op.execute("DROP TABLE IF EXISTS events_fts")
+    elif bind.dialect.name == "postgresql":
+        for table, column in _TRGM_COLUMNS:
+            op.execute(f"DROP INDEX IF EXISTS ix_{table}_{column}_trgm")
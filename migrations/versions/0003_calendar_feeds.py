@@ -0,0 +1,32 @@
+"""calendar feeds (cache ICS)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 18:40:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('calendar_feeds',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('scope', sa.String(), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.Column('etag', sa.String(), nullable=False),
+    sa.Column('generated_at', sa.DateTime(), nullable=False),
+    sa.Column('stale', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('scope', 'entity_id', name='uq_calendar_feeds_scope_entity')
+    )
+
+
+def downgrade():
+    op.drop_table('calendar_feeds')
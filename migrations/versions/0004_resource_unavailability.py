@@ -0,0 +1,36 @@
+"""resource unavailability intervals
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 19:30:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('resource_unavailability',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('resource_id', sa.Integer(), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('end_date', sa.Date(), nullable=False),
+    sa.Column('reason', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['resource_id'], ['resources.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_resource_unavailability_resource_start', 'resource_unavailability', ['resource_id', 'start_date'], unique=False)
+    op.create_index('ix_resource_unavailability_end_start', 'resource_unavailability', ['end_date', 'start_date', 'resource_id'], unique=False)
+    op.create_index('ix_event_resource_resource_event', 'event_resource', ['resource_id', 'event_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_event_resource_resource_event', table_name='event_resource')
+    op.drop_index('ix_resource_unavailability_end_start', table_name='resource_unavailability')
+    op.drop_index('ix_resource_unavailability_resource_start', table_name='resource_unavailability')
+    op.drop_table('resource_unavailability')
@@ -0,0 +1,21 @@
+"""event_artist reverse index (conflict checks)
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 20:10:00.000000
+"""
+from alembic import op
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_event_artist_artist_event', 'event_artist', ['artist_id', 'event_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_event_artist_artist_event', table_name='event_artist')
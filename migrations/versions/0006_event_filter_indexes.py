@@ -0,0 +1,23 @@
+"""events(date, status) and events(promoter_id, date) indexes
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 20:50:00.000000
+"""
+from alembic import op
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_events_date_status', 'events', ['date', 'status'], unique=False)
+    op.create_index('ix_events_promoter_date', 'events', ['promoter_id', 'date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_events_promoter_date', table_name='events')
+    op.drop_index('ix_events_date_status', table_name='events')
@@ -0,0 +1,61 @@
+"""event stats counters (dashboard)
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 21:30:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+# contatori come li calcolava stats.rebuild a questa revisione (un evento = un giorno), in SQL
+# fisso: la migrazione non deve dipendere dal codice attuale di stats
+# (dimension, entity_id, period, join, condizione aggiuntiva)
+_STATS = (
+    ("month", "0", "{month}", "", ""),
+    ("day", "0", "e.date", "", ""),
+    ("artist", "ea.artist_id", "{month}", "JOIN event_artist ea ON ea.event_id = e.id", ""),
+    ("promoter", "e.promoter_id", "{month}", "", "AND e.promoter_id IS NOT NULL"),
+    ("format", "e.format_id", "{month}", "", "AND e.format_id IS NOT NULL"),
+)
+
+
+def _rebuild_stats():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        month = "CAST(date_trunc('month', e.date) AS DATE)"
+    else:
+        month = "date(e.date, 'start of month')"
+    op.execute("DELETE FROM event_stats")
+    for dimension, entity, period, join, where in _STATS:
+        period = period.format(month=month)
+        op.execute(
+            "INSERT INTO event_stats (dimension, entity_id, period, status, count) "
+            f"SELECT '{dimension}', {entity}, {period}, coalesce(e.status, ''), count(*) "
+            f"FROM events e {join} WHERE e.date IS NOT NULL {where} "
+            "GROUP BY 2, 3, 4"
+        )
+
+
+def upgrade():
+    op.create_table('event_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('dimension', sa.String(), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('period', 'dimension', 'entity_id', 'status', name='uq_event_stats_key')
+    )
+    # contatori per gli eventi gia' presenti
+    _rebuild_stats()
+
+
+def downgrade():
+    op.drop_table('event_stats')
@@ -0,0 +1,74 @@
+"""multi-day events: events.end_date, start_time, end_time
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 09:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+# ricalcolo dei contatori con gli eventi su piu' giorni (la dimensione day conta ogni giorno
+# da date a end_date), in SQL fisso come in 0007: niente import di stats
+# (dimension, entity_id, period, join, condizione aggiuntiva)
+_STATS = (
+    ("month", "0", "{month}", "", ""),
+    ("day", "0", "d.day", "{days}", ""),
+    ("artist", "ea.artist_id", "{month}", "JOIN event_artist ea ON ea.event_id = e.id", ""),
+    ("promoter", "e.promoter_id", "{month}", "", "AND e.promoter_id IS NOT NULL"),
+    ("format", "e.format_id", "{month}", "", "AND e.format_id IS NOT NULL"),
+)
+
+
+def _rebuild_stats():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        month = "CAST(date_trunc('month', e.date) AS DATE)"
+        days = (
+            "CROSS JOIN LATERAL generate_series(e.date, coalesce(e.end_date, e.date), interval '1 day') "
+            "AS g(ts) CROSS JOIN LATERAL (SELECT CAST(g.ts AS DATE) AS day) d"
+        )
+        prefix = ""
+    else:
+        month = "date(e.date, 'start of month')"
+        # un giorno per riga da date a end_date con una CTE ricorsiva
+        prefix = (
+            "WITH RECURSIVE span_days(id, day, last) AS ("
+            "SELECT id, date, coalesce(end_date, date) FROM events WHERE date IS NOT NULL "
+            "UNION ALL SELECT id, date(day, '+1 day'), last FROM span_days WHERE day < last) "
+        )
+        days = "JOIN span_days d ON d.id = e.id"
+    op.execute("DELETE FROM event_stats")
+    for dimension, entity, period, join, where in _STATS:
+        op.execute(
+            (prefix if join == "{days}" else "")
+            + "INSERT INTO event_stats (dimension, entity_id, period, status, count) "
+            f"SELECT '{dimension}', {entity}, {period.format(month=month)}, coalesce(e.status, ''), count(*) "
+            f"FROM events e {join.format(days=days)} WHERE e.date IS NOT NULL {where} "
+            "GROUP BY 2, 3, 4"
+        )
+
+
+def upgrade():
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('end_date', sa.Date(), nullable=True))
+        batch_op.add_column(sa.Column('start_time', sa.Time(), nullable=True))
+        batch_op.add_column(sa.Column('end_time', sa.Time(), nullable=True))
+    # eventi esistenti: un giorno solo
+    op.execute("UPDATE events SET end_date = date")
+    op.create_index('ix_events_date_end', 'events', ['date', 'end_date'], unique=False)
+    # contatori per gli eventi gia' presenti
+    _rebuild_stats()
+
+
+def downgrade():
+    op.drop_index('ix_events_date_end', table_name='events')
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.drop_column('end_time')
+        batch_op.drop_column('start_time')
+        batch_op.drop_column('end_date')
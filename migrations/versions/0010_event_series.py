@@ -0,0 +1,71 @@
+"""recurring event series and exceptions
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 11:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('event_series',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('rrule', sa.String(), nullable=False),
+    sa.Column('first_date', sa.Date(), nullable=False),
+    sa.Column('last_date', sa.Date(), nullable=True),
+    sa.Column('duration_days', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.Time(), nullable=True),
+    sa.Column('end_time', sa.Time(), nullable=True),
+    sa.Column('format_id', sa.Integer(), nullable=True),
+    sa.Column('promoter_id', sa.Integer(), nullable=True),
+    sa.Column('location', sa.String(), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['format_id'], ['formats.id'], ),
+    sa.ForeignKeyConstraint(['promoter_id'], ['promoters.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_event_series_first_last', 'event_series', ['first_date', 'last_date'], unique=False)
+    op.create_table('event_series_exceptions',
+    sa.Column('series_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ),
+    sa.ForeignKeyConstraint(['series_id'], ['event_series.id'], ),
+    sa.PrimaryKeyConstraint('series_id', 'date')
+    )
+    op.create_table('series_artist',
+    sa.Column('series_id', sa.Integer(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artists.id'], ),
+    sa.ForeignKeyConstraint(['series_id'], ['event_series.id'], ),
+    sa.PrimaryKeyConstraint('series_id', 'artist_id')
+    )
+    op.create_index('ix_series_artist_artist_series', 'series_artist', ['artist_id', 'series_id'], unique=False)
+    op.create_table('series_resource',
+    sa.Column('series_id', sa.Integer(), nullable=False),
+    sa.Column('resource_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['resource_id'], ['resources.id'], ),
+    sa.ForeignKeyConstraint(['series_id'], ['event_series.id'], ),
+    sa.PrimaryKeyConstraint('series_id', 'resource_id')
+    )
+    op.create_index('ix_series_resource_resource_series', 'series_resource', ['resource_id', 'series_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_series_resource_resource_series', table_name='series_resource')
+    op.drop_table('series_resource')
+    op.drop_index('ix_series_artist_artist_series', table_name='series_artist')
+    op.drop_table('series_artist')
+    op.drop_table('event_series_exceptions')
+    op.drop_index('ix_event_series_first_last', table_name='event_series')
+    op.drop_table('event_series')
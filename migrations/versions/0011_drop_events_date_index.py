@@ -0,0 +1,22 @@
+"""drop ix_events_date (covered by ix_events_date_status and ix_events_date_end)
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 14:00:00.000000
+"""
+from alembic import op
+
+
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # prefisso degli altri due indici su date: solo una scrittura in piu' per ogni insert/update
+    op.drop_index('ix_events_date', table_name='events')
+
+
+def downgrade():
+    op.create_index('ix_events_date', 'events', ['date'], unique=False)
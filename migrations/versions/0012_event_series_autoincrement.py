@@ -0,0 +1,29 @@
+"""event_series ids never reused (AUTOINCREMENT on SQLite)
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18 16:00:00.000000
+"""
+from alembic import op
+
+
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # le espansioni in cache hanno chiave (id, version): un id riusato dopo un'eliminazione
+    # mostrerebbe le date della serie eliminata. Su PostgreSQL la sequenza non riusa gli id.
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table('event_series', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+        pass
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table('event_series', recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+        pass
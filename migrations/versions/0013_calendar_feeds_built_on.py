@@ -0,0 +1,25 @@
+"""calendar feeds: build date (the feed window moves with the date)
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-19 09:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # feed esistenti senza data: vengono rigenerati alla prossima richiesta
+    with op.batch_alter_table('calendar_feeds', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('built_on', sa.Date(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('calendar_feeds', schema=None) as batch_op:
+        batch_op.drop_column('built_on')
@@ -1,5 +1,5 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Date, Text, Boolean, Table, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, Date, DateTime, Time, Text, Boolean, Table, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from db import Base
 
@@ -8,18 +8,48 @@ event_artist = Table(
     "event_artist", Base.metadata,
     Column("event_id", Integer, ForeignKey("events.id"), primary_key=True),
     Column("artist_id", Integer, ForeignKey("artists.id"), primary_key=True),
+    # verso artista -> eventi (conflitti, feed per artista, filtri)
+    Index("ix_event_artist_artist_event", "artist_id", "event_id"),
 )
 
 event_resource = Table(
     "event_resource", Base.metadata,
     Column("event_id", Integer, ForeignKey("events.id"), primary_key=True),
     Column("resource_id", Integer, ForeignKey("resources.id"), primary_key=True),
+    # la PK (event_id, resource_id) serve "risorse di un evento"; questo indice il verso opposto
+    Index("ix_event_resource_resource_event", "resource_id", "event_id"),
+)
+
+series_artist = Table(
+    "series_artist", Base.metadata,
+    Column("series_id", Integer, ForeignKey("event_series.id"), primary_key=True),
+    Column("artist_id", Integer, ForeignKey("artists.id"), primary_key=True),
+    Index("ix_series_artist_artist_series", "artist_id", "series_id"),
+)
+
+series_resource = Table(
+    "series_resource", Base.metadata,
+    Column("series_id", Integer, ForeignKey("event_series.id"), primary_key=True),
+    Column("resource_id", Integer, ForeignKey("resources.id"), primary_key=True),
+    Index("ix_series_resource_resource_series", "resource_id", "series_id"),
 )
 
 class Event(Base):
     __tablename__ = "events"
+    __table_args__ = (
+        # finestre di date filtrate per stato (calendario, dashboard) senza leggere le righe
+        Index("ix_events_date_status", "date", "status"),
+        Index("ix_events_promoter_date", "promoter_id", "date"),
+        # finestre per sovrapposizione (vedi spans.py): intervallo su date, end_date letto dall'indice;
+        # i due indici che iniziano con date servono anche gli ordinamenti per data (niente indice solo su date)
+        Index("ix_events_date_end", "date", "end_date"),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    date = Column(Date, index=True)
+    date = Column(Date)  # primo giorno
+    # ultimo giorno (incluso); default: evento di un giorno
+    end_date = Column(Date, default=lambda ctx: ctx.get_current_parameters().get("date"))
+    start_time = Column(Time, nullable=True)  # orario di inizio il primo giorno
+    end_time = Column(Time, nullable=True)  # orario di fine l'ultimo giorno
     title = Column(String, index=True)
     format_id = Column(Integer, ForeignKey("formats.id"))
     promoter_id = Column(Integer, ForeignKey("promoters.id"), nullable=True)
@@ -57,9 +87,29 @@ class Resource(Base):
     name = Column(String, index=True)
     type = Column(String, index=True)  # DJ, Vocalist, Ballerina, Service, Tour Manager, Mascotte
     contact = Column(String, nullable=True)
-    availability = Column(Text, nullable=True)
+    availability = Column(Text, nullable=True)  # note libere; i periodi non disponibili sono in resource_unavailability
 
     events = relationship("Event", secondary=event_resource, back_populates="resources")
+    unavailability = relationship(
+        "ResourceUnavailability", back_populates="resource",
+        cascade="all, delete-orphan", order_by="ResourceUnavailability.start_date",
+    )
+
+class ResourceUnavailability(Base):
+    # periodo in cui la risorsa non e' disponibile (ferie, altri ingaggi), estremi inclusi
+    __tablename__ = "resource_unavailability"
+    __table_args__ = (
+        Index("ix_resource_unavailability_resource_start", "resource_id", "start_date"),
+        # "chi e' occupato tra A e B": end_date >= A seleziona i periodi non ancora finiti, indice coprente
+        Index("ix_resource_unavailability_end_start", "end_date", "start_date", "resource_id"),
+    )
+    id = Column(Integer, primary_key=True)
+    resource_id = Column(Integer, ForeignKey("resources.id"), nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    reason = Column(String, nullable=True)
+
+    resource = relationship("Resource", back_populates="unavailability")
 
 class Promoter(Base):
     __tablename__ = "promoters"
@@ -75,3 +125,75 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     role = Column(String, default="viewer")  # admin, manager, viewer
+
+class CalendarFeed(Base):
+    # feed iCalendar generati (cache): rigenerati solo quando stale=True
+    __tablename__ = "calendar_feeds"
+    __table_args__ = (UniqueConstraint("scope", "entity_id", name="uq_calendar_feeds_scope_entity"),)
+    id = Column(Integer, primary_key=True)
+    scope = Column(String, nullable=False)  # global, artist, resource, promoter
+    entity_id = Column(Integer, nullable=False, default=0)  # 0 per il feed globale
+    body = Column(Text, nullable=False)
+    etag = Column(String, nullable=False)
+    generated_at = Column(DateTime, nullable=False)
+    stale = Column(Boolean, nullable=False, default=False)
+    built_on = Column(Date, nullable=True)  # giorno di generazione: la finestra del feed dipende dalla data
+
+class Job(Base):
+    # job in background (jobs.py): stato e avanzamento letti dalla pagina Admin
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    params = Column(Text, nullable=True)  # JSON
+    status = Column(String, nullable=False, default="queued", index=True)  # queued, running, done, failed, cancelled
+    progress = Column(Float, nullable=False, default=0.0)
+    message = Column(String, nullable=True)
+    result = Column(Text, nullable=True)  # JSON
+    error = Column(Text, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    created_by = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class EventStat(Base):
+    # contatori pre-aggregati per la Dashboard, mantenuti da stats.apply / stats.rebuild
+    __tablename__ = "event_stats"
+    # period in testa: la Dashboard legge un anno con un range sull'indice
+    __table_args__ = (UniqueConstraint("period", "dimension", "entity_id", "status", name="uq_event_stats_key"),)
+    id = Column(Integer, primary_key=True)
+    dimension = Column(String, nullable=False)  # month, day, artist, promoter, format
+    entity_id = Column(Integer, nullable=False, default=0)
+    period = Column(Date, nullable=False)  # giorno (day) o primo del mese
+    status = Column(String, nullable=False, default="")
+    count = Column(Integer, nullable=False, default=0)
+
+class EventSeries(Base):
+    # serie ricorrente (series.py): una riga per serie, le occorrenze si calcolano dalla regola
+    __tablename__ = "event_series"
+    # serie che toccano una finestra: first_date <= fine e (last_date nullo o >= inizio)
+    # AUTOINCREMENT: un id non torna dopo un'eliminazione, quindi (id, version) identifica per
+    # sempre un'espansione in cache (series.expansions), anche in altri processi
+    __table_args__ = (Index("ix_event_series_first_last", "first_date", "last_date"), {"sqlite_autoincrement": True})
+    id = Column(Integer, primary_key=True)
+    title = Column(String, nullable=False)
+    rrule = Column(String, nullable=False)  # RRULE RFC 5545 senza DTSTART, es. FREQ=WEEKLY;BYDAY=SA
+    first_date = Column(Date, nullable=False)  # DTSTART
+    last_date = Column(Date, nullable=True)  # ultimo giorno occupato (UNTIL/COUNT); nullo: senza fine
+    duration_days = Column(Integer, nullable=False, default=1)
+    start_time = Column(Time, nullable=True)
+    end_time = Column(Time, nullable=True)
+    format_id = Column(Integer, ForeignKey("formats.id"), nullable=True)
+    promoter_id = Column(Integer, ForeignKey("promoters.id"), nullable=True)
+    location = Column(String, nullable=True)
+    notes = Column(Text, nullable=True)
+    status = Column(String, default="proposta")
+    # incrementata a ogni modifica della serie o delle eccezioni: fa parte della chiave delle espansioni in cache
+    version = Column(Integer, nullable=False, default=1)
+
+class EventSeriesException(Base):
+    # occorrenza saltata (event_id nullo) o staccata in un evento vero (event_id)
+    __tablename__ = "event_series_exceptions"
+    series_id = Column(Integer, ForeignKey("event_series.id"), primary_key=True)
+    date = Column(Date, primary_key=True)  # data originale dell'occorrenza
+    event_id = Column(Integer, ForeignKey("events.id"), nullable=True)
@@ -1,6 +1,8 @@
 # pages/calendar_page.py
 import streamlit as st
 import utils
+import auth as auth_module
+from components.event_table import render_event_table
 from datetime import date
 
 def render(ctx):
@@ -9,6 +11,13 @@ def render(ctx):
     month = st.number_input("Mese", min_value=1, max_value=12, value=st.session_state.get("view_month", date.today().month))
     st.session_state.view_year = year
     st.session_state.view_month = month
-    events = utils.list_events_by_month(year, month)
-    for e in events:
-        st.write(f"{e.date} — {e.title} • {', '.join([a.name for a in e.artists])}")
+    # filtro artista impostato da "Apri calendario artista"
+    artist = utils.artist_index().by_name.get(st.session_state.get("filter_artist"))
+    if artist:
+        st.caption(f"Artista: {artist.name}")
+    events = utils.list_event_rows_by_month(year, month, artist_id=artist.id if artist else None)
+    selected = render_event_table(events, key="calendar_page_table")
+    if selected:
+        st.session_state.open_event_id = selected
+        st.session_state.nav_target = "events"
+        auth_module.safe_rerun()
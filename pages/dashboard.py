@@ -1,15 +1,16 @@
 # pages/dashboard.py
 # (opzionale: se vuoi spostare le funzioni pagina in file separati)
 import streamlit as st
+import spans
 import utils
 import auth as auth_module
 
 def render(ctx):
     st.header("Dashboard")
     st.subheader("Prossimi eventi")
-    events = utils.list_upcoming_events(limit=10)
+    events = utils.list_upcoming_event_rows(limit=10)
     for e in events:
-        st.write(f"**{e.date}** — {e.title} • {', '.join([a.name for a in e.artists])} • _{e.status}_")
+        st.write(f"**{spans.label(e)}** — {e.title} • {e.artists or ''} • _{e.status}_")
     st.markdown("---")
     st.subheader("Quick actions")
     c1, c2, c3 = st.columns(3)
@@ -1,26 +1,46 @@
 # pages/events_page.py
 import streamlit as st
+import series
+import spans
 import utils
+from components.event_table import render_event_table
 import auth as auth_module
 
+PAGE_SIZE = 200
+
 def render(ctx):
     st.header("Eventi")
     if st.session_state.get("show_new_event"):
         st.info("Mostra form di creazione evento (quick create). Vai su 'Eventi' per creare.")
-    events = utils.list_all_events()
-    for e in events:
-        cols = st.columns([4,2,2,1])
-        cols[0].write(f"**{e.title}**")
-        cols[1].write(", ".join([a.name for a in e.artists]))
-        cols[2].write(str(e.date))
-        if cols[3].button("Apri", key=f"open_ev_{e.id}"):
-            st.session_state.open_event_id = e.id
-            auth_module.safe_rerun()
+    # paginazione keyset come app.page_events: una pagina alla volta, il totale dai contatori di stats
+    page = utils.list_event_rows_page(
+        cursor=st.session_state.get("events_page_cursor"),
+        page_size=PAGE_SIZE,
+        backwards=st.session_state.get("events_page_backwards", False),
+    )
+    selected = render_event_table(page.items, key="events_page_table")
+    if selected:
+        st.session_state.open_event_id = selected
+    nav = st.columns([1,3,1])
+    if page.prev_cursor is not None and nav[0].button("◀ Precedenti", key="events_page_prev"):
+        st.session_state.events_page_cursor = page.prev_cursor
+        st.session_state.events_page_backwards = True
+        auth_module.safe_rerun()
+    nav[1].caption(f"{page.total} eventi totali")
+    if page.next_cursor is not None and nav[2].button("Successivi ▶", key="events_page_next"):
+        st.session_state.events_page_cursor = page.next_cursor
+        st.session_state.events_page_backwards = False
+        auth_module.safe_rerun()
     if st.session_state.get("open_event_id"):
-        ev = utils.get_event(st.session_state.open_event_id)
+        # occorrenza di una serie (chiave stringa): get_occurrence ha gli stessi campi di un evento
+        key = st.session_state.open_event_id
+        ev = series.get_occurrence(key) if series.parse_key(key) else utils.get_event(key)
+        if ev is None:
+            st.session_state.open_event_id = None
+            return
         st.markdown("---")
         st.subheader(f"Scheda: {ev.title}")
-        st.write(f"Data: {ev.date}")
+        st.write(f"Data: {spans.label(ev)}")
         st.write(f"Artisti: {', '.join([a.name for a in ev.artists])}")
         if st.button("Chiudi scheda"):
             st.session_state.open_event_id = None
@@ -6,6 +6,10 @@ def render(ctx):
     st.header("Risorse")
     types = ["DJ", "Vocalist", "Ballerina", "Service", "Tour Manager", "Mascotte"]
     sel = st.selectbox("Filtra tipo", ["Tutti"] + types)
-    res = utils.list_resources(None if sel == "Tutti" else sel)
+    free_on = st.date_input("Libere il", value=None)
+    if free_on:
+        res = utils.list_free_resources(free_on, resource_type=None if sel == "Tutti" else sel)
+    else:
+        res = utils.list_resources(None if sel == "Tutti" else sel)
     for r in res:
         st.write(f"**{r.name}** • {r.type} • {r.contact or '-'}")
@@ -0,0 +1,156 @@
+# profiling.py
+# Misure per rerun di Streamlit: query SQL (numero, tempo totale, la piu' lenta), tempo di render
+# della pagina e, su richiesta, un profilo cProfile dell'intero rerun.
+#
+# install(engine) aggancia before/after_cursor_execute all'engine una volta per processo. Le query
+# sono attribuite al rerun corrente tramite una ContextVar (come la unit of work di db.py: ogni
+# sessione Streamlit esegue lo script in un proprio thread); quelle fuori da un rerun (job, CLI)
+# finiscono solo nel log delle query lente.
+# Il log e' un file a rotazione (EVENT_SLOW_QUERY_LOG, EVENT_SLOW_QUERY_LOG_BYTES,
+# EVENT_SLOW_QUERY_LOG_BACKUPS) con le query oltre EVENT_SLOW_QUERY_MS, etichettate con la pagina.
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from sqlalchemy import event
+
+SLOW_QUERY_MS = float(os.getenv("EVENT_SLOW_QUERY_MS", "200"))
+SLOW_QUERY_LOG = os.getenv("EVENT_SLOW_QUERY_LOG", "./logs/slow_queries.log")
+SLOW_QUERY_LOG_BYTES = int(os.getenv("EVENT_SLOW_QUERY_LOG_BYTES", str(5 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv("EVENT_SLOW_QUERY_LOG_BACKUPS", "5"))
+PROFILE_DIR = os.getenv("EVENT_PROFILE_DIR", "./profiles")
+STATEMENT_PREVIEW = 300
+
+_current = ContextVar("event_rerun_stats", default=None)
+_slow_log = None
+
+class RerunStats:
+    """Misure di un rerun; sections: nome -> ms (es. "render")."""
+
+    def __init__(self, page_key):
+        self.page_key = page_key
+        self.started_at = datetime.now()
+        self.total_ms = 0.0
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_statement = None
+        self.sections = {}
+        self.profile_path = None
+
+    def record(self, statement, elapsed_ms):
+        self.queries += 1
+        self.sql_ms += elapsed_ms
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms, self.slowest_statement = elapsed_ms, statement
+
+    def summary(self):
+        return {
+            "ora": self.started_at.strftime("%H:%M:%S"),
+            "pagina": self.page_key,
+            "totale ms": round(self.total_ms, 1),
+            **{f"{name} ms": round(ms, 1) for name, ms in self.sections.items()},
+            "query": self.queries,
+            "SQL ms": round(self.sql_ms, 1),
+            "query piu' lenta ms": round(self.slowest_ms, 1),
+        }
+
+def compact_statement(statement):
+    text = re.sub(r"\s+", " ", statement).strip()
+    return text if len(text) <= STATEMENT_PREVIEW else text[:STATEMENT_PREVIEW] + "..."
+
+# ---------- hook SQLAlchemy ----------
+def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("profiling_start", []).append(time.perf_counter())
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("profiling_start")
+    if not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, elapsed_ms)
+    if _slow_log is not None and elapsed_ms >= SLOW_QUERY_MS:
+        params = "executemany" if executemany else repr(parameters)[:200]
+        _slow_log.warning(
+            "%.1f ms page=%s %s params=%s", elapsed_ms, stats.page_key if stats else "-", compact_statement(statement), params,
+        )
+
+def _build_slow_log():
+    logger = logging.getLogger("event_manager.slow_queries")
+    logger.propagate = False
+    if not logger.handlers:
+        os.makedirs(os.path.dirname(os.path.abspath(SLOW_QUERY_LOG)), exist_ok=True)
+        handler = RotatingFileHandler(
+            SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_BYTES, backupCount=SLOW_QUERY_LOG_BACKUPS, encoding="utf-8",
+        )
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+def install(engine):
+    """Aggancia le misure all'engine (idempotente). EVENT_SLOW_QUERY_MS <= 0 disattiva il log."""
+    global _slow_log
+    if SLOW_QUERY_MS > 0 and _slow_log is None:
+        _slow_log = _build_slow_log()
+    if not event.contains(engine, "before_cursor_execute", _before):
+        event.listen(engine, "before_cursor_execute", _before)
+        event.listen(engine, "after_cursor_execute", _after)
+
+# ---------- rerun ----------
+@contextmanager
+def track_rerun(page_key, profile=False):
+    """
+    Misura il rerun (query e tempo totale) e restituisce RerunStats. Con profile=True il rerun gira
+    sotto cProfile e il profilo viene salvato in PROFILE_DIR (stats.profile_path).
+    """
+    stats = RerunStats(page_key)
+    token = _current.set(stats)
+    profiler = cProfile.Profile() if profile else None
+    t0 = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield stats
+    finally:
+        if profiler:
+            profiler.disable()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            stats.profile_path = os.path.join(PROFILE_DIR, f"rerun-{stats.page_key}-{stats.started_at:%Y%m%d-%H%M%S}.prof")
+            profiler.dump_stats(stats.profile_path)
+        stats.total_ms = (time.perf_counter() - t0) * 1000
+        _current.reset(token)
+
+@contextmanager
+def section(name):
+    """Tempo di una parte del rerun (es. il render della pagina), registrato nel rerun corrente."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current.get()
+        if stats is not None:
+            stats.sections[name] = stats.sections.get(name, 0.0) + (time.perf_counter() - t0) * 1000
+
+def profile_report(path, limit=25):
+    """Le funzioni piu' costose (tempo cumulativo) di un profilo salvato, come testo."""
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).strip_dirs().sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+def read_slow_log(limit=50):
+    """Ultime righe del log delle query lente (solo il file corrente, non quelli ruotati)."""
+    if not os.path.exists(SLOW_QUERY_LOG):
+        return []
+    with open(SLOW_QUERY_LOG, encoding="utf-8") as f:
+        return list(deque(f, maxlen=limit))
@@ -0,0 +1,216 @@
+# search.py
+# Indice di ricerca lato server su titolo, location, note dell'evento e nomi artisti.
+#
+# - SQLite: tabella virtuale FTS5 "events_fts" (tokenizer trigram, quindi anche le
+#   ricerche per sottostringa usano l'indice), rowid = events.id, ranking bm25.
+# - Altri backend (PostgreSQL): indici GIN pg_trgm sulle colonne e ILIKE ordinato per similarity.
+#
+# L'indice e' tenuto allineato da utils (create/update/delete evento, rinomina/eliminazione artista)
+# chiamando index_event/remove_event/reindex_artist dentro la stessa transazione.
+from collections import namedtuple
+
+from sqlalchemy import Integer, and_, bindparam, column, func, or_, select, text
+
+from db import engine, session_scope
+from models import Event, Artist, event_artist
+
+SearchResult = namedtuple("SearchResult", ["items", "total"])
+
+# pesi bm25 per colonna: title, location, notes, artists
+_BM25_WEIGHTS = "10.0, 2.0, 1.0, 5.0"
+# colonne con indice pg_trgm sui backend non SQLite
+_TRGM_COLUMNS = (("events", "title"), ("events", "location"), ("events", "notes"), ("artists", "name"))
+# il tokenizer trigram non indicizza termini piu' corti di 3 caratteri
+_MIN_TRIGRAM = 3
+
+def _is_sqlite(bind):
+    return bind.dialect.name == "sqlite"
+
+# riga indicizzata: colonne testuali dell'evento + nomi artisti concatenati
+_INSERT_ROWS = (
+    "INSERT INTO events_fts (rowid, title, location, notes, artists) "
+    "SELECT e.id, e.title, e.location, e.notes, "
+    "       (SELECT group_concat(a.name, ' ') FROM event_artist ea "
+    "        JOIN artists a ON a.id = ea.artist_id WHERE ea.event_id = e.id) "
+    "FROM events e"
+)
+
+# ---------- DDL ----------
+def ensure_index(bind=engine):
+    """Crea l'indice se manca e, se appena creato, lo popola. Idempotente."""
+    with bind.begin() as conn:
+        create_index(conn)
+
+def create_index(conn):
+    """Come ensure_index ma su una connessione gia' in transazione."""
+    if _is_sqlite(conn):
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'events_fts'")
+        ).first()
+        if exists:
+            return
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE events_fts USING fts5("
+            "title, location, notes, artists, tokenize = 'trigram')"
+        ))
+        _rebuild(conn)
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for table, column in _TRGM_COLUMNS:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_{column}_trgm "
+                f"ON {table} USING gin ({column} gin_trgm_ops)"
+            ))
+
+def rebuild_index(bind=engine):
+    """Ricostruisce da zero l'indice FTS (solo SQLite; su PostgreSQL gli indici sono nativi)."""
+    if not _is_sqlite(bind):
+        return
+    with bind.begin() as conn:
+        conn.execute(text("DELETE FROM events_fts"))
+        _rebuild(conn)
+
+def _rebuild(conn):
+    conn.execute(text(_INSERT_ROWS))
+
+# ---------- sincronizzazione ----------
+def index_event(db, event_id):
+    """(Re)indicizza un evento. Da chiamare prima del commit della sessione che lo modifica."""
+    if not _is_sqlite(db.get_bind()):
+        return
+    db.flush()
+    db.execute(text("DELETE FROM events_fts WHERE rowid = :id"), {"id": event_id})
+    db.execute(text(_INSERT_ROWS + " WHERE e.id = :id"), {"id": event_id})
+
+def index_events(conn, event_ids, batch_size=500):
+    """Indicizza in blocco eventi appena inseriti (import massivo) su una connessione Core."""
+    if not _is_sqlite(conn) or not event_ids:
+        return
+    stmt = text(_INSERT_ROWS + " WHERE e.id IN :ids").bindparams(bindparam("ids", expanding=True))
+    for i in range(0, len(event_ids), batch_size):
+        conn.execute(stmt, {"ids": list(event_ids[i:i + batch_size])})
+
+def index_id_range(conn, first_id, last_id):
+    """Indicizza gli eventi con id in [first_id, last_id] (generatore di dati: id contigui)."""
+    if not _is_sqlite(conn):
+        return
+    conn.execute(text(_INSERT_ROWS + " WHERE e.id BETWEEN :lo AND :hi"), {"lo": first_id, "hi": last_id})
+
+def remove_event(db, event_id):
+    if not _is_sqlite(db.get_bind()):
+        return
+    db.execute(text("DELETE FROM events_fts WHERE rowid = :id"), {"id": event_id})
+
+def reindex_artist(db, artist_id):
+    """Reindicizza gli eventi di un artista (rinomina o eliminazione)."""
+    if not _is_sqlite(db.get_bind()):
+        return
+    db.flush()
+    event_ids = db.execute(
+        select(event_artist.c.event_id).where(event_artist.c.artist_id == artist_id)
+    ).scalars().all()
+    for event_id in event_ids:
+        index_event(db, event_id)
+
+# ---------- query ----------
+def _fts_query(query):
+    # ogni parola diventa una frase quotata (niente sintassi FTS dall'utente), in AND
+    terms = [t.replace('"', '""') for t in query.split()]
+    return " ".join(f'"{t}"' for t in terms)
+
+def _like_pattern(term):
+    # % e _ dell'utente sono caratteri letterali, non jolly (ESCAPE '\\' nelle query)
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+def _sqlite_where(query):
+    """(WHERE su events_fts, parametri, ORDER BY) per la query."""
+    terms = query.split()
+    if all(len(t) >= _MIN_TRIGRAM for t in terms):
+        return "events_fts MATCH :q", {"q": _fts_query(query)}, f"bm25(events_fts, {_BM25_WEIGHTS})"
+    # termini corti: LIKE sulla tabella FTS (scansione dell'indice, comunque senza caricare gli eventi)
+    clauses = []
+    params = {}
+    for i, t in enumerate(terms):
+        params[f"t{i}"] = _like_pattern(t)
+        clauses.append(
+            f"(title LIKE :t{i} ESCAPE '\\' OR location LIKE :t{i} ESCAPE '\\' "
+            f"OR notes LIKE :t{i} ESCAPE '\\' OR artists LIKE :t{i} ESCAPE '\\')"
+        )
+    return " AND ".join(clauses), params, "rowid DESC"
+
+def _search_ids_sqlite(db, query, limit, offset):
+    where, params, order = _sqlite_where(query)
+    total = db.execute(text(f"SELECT count(*) FROM events_fts WHERE {where}"), params).scalar()
+    rows = db.execute(
+        text(f"SELECT rowid FROM events_fts WHERE {where} ORDER BY {order} LIMIT :limit OFFSET :offset"),
+        dict(params, limit=limit, offset=offset),
+    ).all()
+    return [r[0] for r in rows], total
+
+def _term_condition(term):
+    # come il ramo SQLite: il termine puo' stare in una qualsiasi delle colonne indicizzate
+    pattern = _like_pattern(term)
+    artist_match = (
+        select(event_artist.c.event_id)
+        .join(Artist, Artist.id == event_artist.c.artist_id)
+        .where(Artist.name.ilike(pattern, escape="\\"))
+    )
+    return or_(
+        Event.title.ilike(pattern, escape="\\"),
+        Event.location.ilike(pattern, escape="\\"),
+        Event.notes.ilike(pattern, escape="\\"),
+        Event.id.in_(artist_match),
+    )
+
+def _generic_condition(query):
+    # ogni parola deve comparire (AND), come nella ricerca FTS
+    return and_(*(_term_condition(t) for t in query.split()))
+
+def _search_ids_generic(db, query, limit, offset):
+    cond = _generic_condition(query)
+    total = db.execute(select(func.count(Event.id)).where(cond)).scalar()
+    q = select(Event.id).where(cond)
+    if db.get_bind().dialect.name == "postgresql":
+        q = q.order_by(func.similarity(func.coalesce(Event.title, ""), query).desc(), Event.date.desc())
+    else:
+        q = q.order_by(Event.date.desc())
+    ids = db.execute(q.limit(limit).offset(offset)).scalars().all()
+    return ids, total
+
+def match_condition(db, query):
+    """
+    Condizione WHERE sugli eventi che corrispondono a query come in search_events, per filtrare
+    altre query (paginazione keyset delle liste) con la stessa semantica di ricerca.
+    """
+    query = query.strip()
+    if _is_sqlite(db.get_bind()):
+        where, params, _ = _sqlite_where(query)
+        matches = text(f"SELECT rowid FROM events_fts WHERE {where}").bindparams(**params).columns(column("rowid", Integer))
+        return Event.id.in_(matches)
+    return _generic_condition(query)
+
+def search_events(query, limit=25, offset=0, rows=False):
+    """
+    Ricerca eventi per titolo, location, note e nome artista.
+    Restituisce SearchResult(items, total): items sono Event (con relazioni caricate)
+    nell'ordine di rilevanza, total il numero complessivo di risultati.
+    rows=True: items sono utils.EventRow (read model delle liste).
+    """
+    query = (query or "").strip()
+    if not query:
+        return SearchResult([], 0)
+    with session_scope() as db:
+        if _is_sqlite(db.get_bind()):
+            ids, total = _search_ids_sqlite(db, query, limit, offset)
+        else:
+            ids, total = _search_ids_generic(db, query, limit, offset)
+        if not ids:
+            return SearchResult([], total)
+        if rows:
+            from utils import event_rows_by_ids
+            return SearchResult(event_rows_by_ids(ids), total)
+        from utils import event_load_options
+        events = db.query(Event).filter(Event.id.in_(ids)).options(*event_load_options()).all()
+        by_id = {e.id: e for e in events}
+        return SearchResult([by_id[i] for i in ids if i in by_id], total)
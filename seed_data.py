@@ -1,11 +1,31 @@
 # seed_data.py
-from db import engine, Base, SessionLocal
-from models import Artist, Format, Resource, Promoter, User, Event
-from auth import hash_password
+# seed(): utenti e pochi dati di esempio, creati solo se mancano.
+# generate(): dataset sintetico deterministico (stesso seed -> stessi dati) per test di carico
+# e per riprodurre pagine lente: volumi configurabili, date concentrate d'estate e nei fine
+# settimana, popolarita' degli artisti sbilanciata. Scrive con INSERT executemany a blocchi
+# (id assegnati in anticipo, niente RETURNING) e alla fine aggiorna indice di ricerca,
+# contatori della Dashboard e feed ICS. Se gli eventi generati sono almeno quanti quelli gia'
+# presenti, gli indici secondari di events e delle associazioni sono ricreati a fine caricamento invece che
+# aggiornati riga per riga (pensato per un DB di test, non per un DB in uso).
+import random
+import time
+from collections import namedtuple
+from contextlib import contextmanager
 from datetime import date, timedelta
 
+from sqlalchemy import func, insert, select, text
+
+from db import SessionLocal, engine
+from models import Artist, Format, Resource, ResourceUnavailability, Promoter, User, Event, event_artist, event_resource
+import ics
+import search
+import spans
+import stats
+
 def seed():
-    Base.metadata.create_all(bind=engine)
+    # lo schema e' gestito dalle migrazioni (bootstrap.migrate / python manage.py migrate)
+    from auth import hash_password
+
     db = SessionLocal()
     try:
         # Users
@@ -65,9 +85,235 @@ def seed():
                 e1.resources.append(res)
             db.add_all([e1, e2])
             db.commit()
+            # eventi scritti direttamente via ORM: indice di ricerca e contatori vanno ricalcolati
+            search.rebuild_index()
+            stats.rebuild()
     finally:
         db.close()
 
+# ---------- dataset sintetico ----------
+GenerateReport = namedtuple("GenerateReport", ["counts", "seconds"])
+
+CITIES = (
+    ("Milano", 12), ("Roma", 11), ("Bologna", 8), ("Rimini", 8), ("Torino", 6), ("Firenze", 6),
+    ("Napoli", 6), ("Riccione", 5), ("Verona", 4), ("Padova", 4), ("Bari", 4), ("Genova", 3),
+    ("Pescara", 3), ("Lecce", 3), ("Catania", 3), ("Palermo", 3), ("Trento", 2), ("Cagliari", 2),
+)
+TITLE_WORDS = ("Live", "Tour", "Festival", "Party", "Showcase", "Summer Night", "Club Night", "Gala", "Acoustic", "Special")
+RESOURCE_TYPES = (("DJ", 4), ("Vocalist", 3), ("Ballerina", 3), ("Service", 2), ("Tour Manager", 1), ("Mascotte", 1))
+COLORS = ("#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf")
+# stagionalita': picco estivo, dicembre sopra la media; venerdi' e sabato le serate piu' richieste
+MONTH_WEIGHTS = (0.6, 0.6, 0.7, 0.8, 1.0, 1.5, 2.0, 2.0, 1.2, 0.9, 0.8, 1.1)
+WEEKDAY_WEIGHTS = (0.4, 0.4, 0.5, 0.8, 1.6, 2.2, 1.1)
+ARTISTS_PER_EVENT = ((1, 70), (2, 22), (3, 8))
+RESOURCES_PER_EVENT = ((0, 15), (1, 30), (2, 30), (3, 15), (4, 10))
+DURATION_DAYS = ((1, 80), (2, 15), (3, 5))
+# eventi passati quasi tutti confermati, futuri in buona parte ancora proposte
+PAST_STATUS = (("confermato", 85), ("cancellato", 15))
+FUTURE_STATUS = (("proposta", 55), ("confermato", 40), ("cancellato", 5))
+DEFAULT_CHUNK_SIZE = 50000
+EVENT_COLUMNS = ("id", "date", "end_date", "title", "format_id", "promoter_id", "location", "notes", "status")
+
+def _cum(weights):
+    total, out = 0, []
+    for w in weights:
+        total += w
+        out.append(total)
+    return out
+
+def _picker(rng, pairs):
+    values = [v for v, _ in pairs]
+    cum = _cum([w for _, w in pairs])
+    return lambda k=1: rng.choices(values, cum_weights=cum, k=k)
+
+def _next_ids(conn, n, table):
+    first = (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+    return range(first, first + n)
+
+def _bulk_insert(conn, table, columns, rows):
+    """
+    rows: tuple nell'ordine di columns. Su SQLite executemany diretto sul cursore DBAPI (le date
+    vanno gia' passate come testo ISO, lo stesso formato del tipo Date di SQLAlchemy): evita la
+    preparazione dei parametri riga per riga, che a milioni di righe costa piu' della scrittura.
+    Altri DB: INSERT Core.
+    """
+    if not rows:
+        return
+    if conn.dialect.name == "sqlite":
+        sql = f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        conn.exec_driver_sql(sql, rows)
+    else:
+        conn.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+
+def _sync_sequences(conn, tables):
+    # id inseriti espliciti: su PostgreSQL le sequence vanno riallineate
+    if conn.dialect.name != "postgresql":
+        return
+    for table in tables:
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table.name}), 1))"
+        ))
+
+@contextmanager
+def _deferred_indexes(tables, enabled):
+    """Elimina gli indici secondari (non le chiavi primarie) e li ricrea all'uscita, anche in caso di errore."""
+    indexes = [index for table in tables for index in table.indexes] if enabled else []
+    with engine.begin() as conn:
+        for index in indexes:
+            index.drop(conn, checkfirst=True)
+    try:
+        yield
+    finally:
+        with engine.begin() as conn:
+            for index in indexes:
+                index.create(conn, checkfirst=True)
+
+def _reference_rows(rng, counts, conn):
+    """Anagrafiche: restituisce (id artisti, id format con durata, id promoter, id risorse)."""
+    tables = {"artists": Artist.__table__, "formats": Format.__table__, "promoters": Promoter.__table__, "resources": Resource.__table__}
+    ids = {name: _next_ids(conn, counts[name], table) for name, table in tables.items()}
+    durations = _picker(rng, DURATION_DAYS)(counts["formats"])
+    resource_types = _picker(rng, RESOURCE_TYPES)(counts["resources"])
+    conn.execute(insert(tables["artists"]), [
+        {"id": i, "name": f"Artista {i}", "calendar_color": rng.choice(COLORS), "active": rng.random() > 0.05}
+        for i in ids["artists"]
+    ])
+    conn.execute(insert(tables["formats"]), [
+        {"id": i, "name": f"Format {i}", "description": f"Format da {d} giorni" if d > 1 else "Serata", "default_duration_days": d}
+        for i, d in zip(ids["formats"], durations)
+    ])
+    conn.execute(insert(tables["promoters"]), [
+        {"id": i, "name": f"Promoter {i}", "contact": f"promoter{i}@example.com"} for i in ids["promoters"]
+    ])
+    conn.execute(insert(tables["resources"]), [
+        {"id": i, "name": f"{t} {i}", "type": t, "contact": f"risorsa{i}@example.com"}
+        for i, t in zip(ids["resources"], resource_types)
+    ])
+    return ids
+
+def _unavailability_rows(rng, resource_ids, start, days):
+    rows = []
+    for resource_id in resource_ids:
+        for _ in range(rng.choice((0, 0, 1, 2))):
+            first = start + timedelta(days=rng.randrange(days))
+            rows.append({
+                "resource_id": resource_id, "start_date": first,
+                "end_date": first + timedelta(days=rng.randrange(14)), "reason": rng.choice(("ferie", "altro impegno", None)),
+            })
+    return rows
+
+def generate(events=10000, artists=200, formats=12, promoters=80, resources=300,
+             start=None, end=None, seed=42, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Aggiunge al DB un dataset sintetico. Con lo stesso seed e lo stesso DB di partenza produce
+    sempre gli stessi dati. Date tra start e end (default: due anni indietro, uno avanti).
+    progress(eventi_scritti, totale) dopo ogni blocco di chunk_size eventi.
+    """
+    t0 = time.perf_counter()
+    today = date.today()
+    start = start or today.replace(year=today.year - 2, month=1, day=1)
+    end = end or today.replace(year=today.year + 1, month=12, day=31)
+    if end < start:
+        raise ValueError("la data finale precede quella iniziale")
+    rng = random.Random(seed)
+    counts = {"artists": artists, "formats": formats, "promoters": promoters, "resources": resources}
+
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    day_cum = _cum([MONTH_WEIGHTS[d.month - 1] * WEEKDAY_WEIGHTS[d.weekday()] for d in days])
+    # anche oltre end: ultimo giorno degli eventi su piu' giorni che iniziano a fine intervallo
+    span_days = [start + timedelta(days=i) for i in range(len(days) + spans.MAX_EVENT_DAYS)]
+    day_values = [d.isoformat() for d in span_days] if engine.dialect.name == "sqlite" else span_days
+    # giorno (indice in days) di ogni evento, in ordine: id crescenti con la data come in un DB reale,
+    # e gli indici che iniziano con la data vengono scritti in coda invece che in punti casuali
+    event_days = sorted(rng.choices(range(len(days)), cum_weights=day_cum, k=events))
+    first_future = (today - start).days
+    city_names, city_cum = [c for c, _ in CITIES], _cum([w for _, w in CITIES])
+    n_artists = _picker(rng, ARTISTS_PER_EVENT)
+    n_resources = _picker(rng, RESOURCES_PER_EVENT)
+    past_status, future_status = _picker(rng, PAST_STATUS), _picker(rng, FUTURE_STATUS)
+
+    with engine.begin() as conn:
+        ids = _reference_rows(rng, counts, conn)
+        unavailability = _unavailability_rows(rng, ids["resources"], start, len(days))
+        if unavailability:
+            conn.execute(insert(ResourceUnavailability.__table__), unavailability)
+        event_ids = _next_ids(conn, events, Event.__table__)
+        # durata degli eventi = durata del format (default 1 giorno)
+        duration = {i: min(max(d or 1, 1), spans.MAX_EVENT_DAYS) for i, d in conn.execute(select(Format.id, Format.default_duration_days))}
+        existing = conn.execute(select(func.count(Event.id))).scalar()
+    counts["unavailability"] = len(unavailability)
+
+    # popolarita' artisti tipo Zipf: pochi artisti fanno la maggior parte delle date
+    artist_ids = list(ids["artists"])
+    artist_cum = _cum([1.0 / (rank + 1) ** 0.9 for rank in range(len(artist_ids))])
+    promoter_ids = list(ids["promoters"])
+    promoter_cum = _cum([1.0 / (rank + 1) ** 0.7 for rank in range(len(promoter_ids))])
+    format_ids, resource_ids = list(ids["formats"]), list(ids["resources"])
+
+    def _event_chunk(offset):
+        chunk_ids = event_ids[offset:offset + chunk_size]
+        k = len(chunk_ids)
+        # estrazioni casuali fatte per blocco (una chiamata per colonna), non per riga
+        cities = rng.choices(city_names, cum_weights=city_cum, k=k)
+        words = rng.choices(TITLE_WORDS, k=k)
+        formats_k = rng.choices(format_ids, k=k) if format_ids else [None] * k
+        promoters_k = rng.choices(promoter_ids, cum_weights=promoter_cum, k=k) if promoter_ids else [None] * k
+        past, future = past_status(k), future_status(k)
+        artist_counts = n_artists(k) if artist_ids else [0] * k
+        resource_counts = n_resources(k) if resource_ids else [0] * k
+        with_notes = rng.choices((True, False), cum_weights=(20, 100), k=k)
+        picked_artists = iter(rng.choices(artist_ids, cum_weights=artist_cum, k=sum(artist_counts)))
+        picked_resources = iter(rng.choices(resource_ids, k=sum(resource_counts)))
+        event_rows, artist_rows, resource_rows = [], [], []
+        for i, event_id in enumerate(chunk_ids):
+            day, city = event_days[offset + i], cities[i]
+            # set: un artista/risorsa estratto due volte per lo stesso evento conta una volta
+            chosen = {next(picked_artists) for _ in range(artist_counts[i])}
+            lead = f"Artista {min(chosen)} " if chosen else ""
+            event_rows.append((
+                event_id, day_values[day], day_values[day + duration.get(formats_k[i], 1) - 1], f"{lead}{words[i]} {city}", formats_k[i], promoters_k[i], city,
+                f"Nota {event_id}" if with_notes[i] else None,
+                past[i] if day < first_future else future[i],
+            ))
+            artist_rows += [(event_id, a) for a in chosen]
+            resource_rows += [(event_id, r) for r in {next(picked_resources) for _ in range(resource_counts[i])}]
+        return event_rows, artist_rows, resource_rows
+
+    written = links_a = links_r = 0
+    with _deferred_indexes([Event.__table__, event_artist, event_resource], enabled=events >= max(existing, DEFAULT_CHUNK_SIZE)):
+        for offset in range(0, events, chunk_size):
+            event_rows, artist_rows, resource_rows = _event_chunk(offset)
+            with engine.begin() as conn:
+                _bulk_insert(conn, Event.__table__, EVENT_COLUMNS, event_rows)
+                _bulk_insert(conn, event_artist, ("event_id", "artist_id"), artist_rows)
+                _bulk_insert(conn, event_resource, ("event_id", "resource_id"), resource_rows)
+            written += len(event_rows)
+            links_a += len(artist_rows)
+            links_r += len(resource_rows)
+            if progress:
+                progress(written, events)
+    counts.update(events=written, event_artist=links_a, event_resource=links_r)
+
+    # indice, contatori e feed: una passata a fine generazione invece che riga per riga
+    with engine.begin() as conn:
+        _sync_sequences(conn, [Artist.__table__, Format.__table__, Promoter.__table__, Resource.__table__,
+                               ResourceUnavailability.__table__, Event.__table__])
+        if written:
+            search.index_id_range(conn, event_ids[0], event_ids[written - 1])
+        stats.rebuild_on(conn)
+        ics.mark_all_stale(conn)
+    from cache import ref_cache
+    ref_cache.invalidate()
+    return GenerateReport(counts, time.perf_counter() - t0)
+
+def format_report(report):
+    parts = ", ".join(f"{name}={n}" for name, n in report.counts.items())
+    rate = report.counts.get("events", 0) / report.seconds if report.seconds else 0.0
+    return f"Generati: {parts}\nTempo: {report.seconds:.1f}s ({rate:.0f} eventi/s)"
+
 if __name__ == "__main__":
+    from bootstrap import migrate
+    migrate()
     seed()
     print("DB seeded.")
@@ -0,0 +1,498 @@
+# series.py
+# Serie ricorrenti (residenze: ogni sabato nello stesso club per tutta la stagione).
+#
+# Una serie e' una riga di event_series con una regola RRULE (RFC 5545, es. "FREQ=WEEKLY;BYDAY=SA")
+# che parte da first_date, piu' le eccezioni in event_series_exceptions: date saltate oppure
+# staccate in un evento vero (event_id), che da quel momento si modifica come tutti gli altri.
+# Le occorrenze non vengono salvate: occurrences_between() le calcola solo per la finestra richiesta
+# (mese del calendario, prossimi eventi) e tiene le espansioni in una cache LRU in-process con
+# chiave (serie, versione, finestra). Ogni modifica a una serie o alle sue eccezioni incrementa
+# event_series.version, quindi un'espansione vecchia non viene piu' letta (neanche da un altro
+# processo, che legge la versione dal DB) ed esce dalla cache da sola. Lo spazio occupato resta
+# proporzionale al numero di serie, non di occorrenze.
+#
+# Un'occorrenza ha come id la chiave "s<serie>:<data ISO>" (stringa, mai in conflitto con gli id
+# interi degli eventi): la UI la riconosce con parse_key().
+#
+# Le occorrenze prenotano artisti e risorse come gli eventi: conflicts.py e utils.busy_resources_query
+# le leggono con bookings(), create_series/update_series controllano i conflitti delle nuove date
+# (fino a last_date o, per le serie senza fine, UPCOMING_DAYS giorni avanti) e le scritture marcano
+# stale i feed ICS della serie.
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import delete, insert, or_, select, update
+
+from db import commit, on_commit, session_scope, unit_of_work
+from models import EventSeries, EventSeriesException, series_artist, series_resource
+from cache import ref_cache
+import spans
+
+CACHE_SIZE = int(os.getenv("EVENT_SERIES_CACHE_SIZE", "1024"))
+# orizzonte dei "prossimi eventi" per le occorrenze
+UPCOMING_DAYS = int(os.getenv("EVENT_SERIES_UPCOMING_DAYS", "365"))
+# regole finite (UNTIL/COUNT): limite alle occorrenze contate per calcolare last_date
+MAX_OCCURRENCES = int(os.getenv("EVENT_SERIES_MAX_OCCURRENCES", "1000"))
+FREQUENCIES = {"WEEKLY": "settimanale", "MONTHLY": "mensile", "DAILY": "giornaliera"}
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+SERIES_FIELDS = (
+    "title", "rrule", "first_date", "duration_days", "start_time", "end_time",
+    "format_id", "promoter_id", "location", "notes", "status",
+)
+
+# stessi attributi di Event usati da liste e serialize_event; format/promoter/artists/resources
+# sono istanze staccate della cache delle anagrafiche (sola lettura)
+Occurrence = namedtuple("Occurrence", [
+    "id", "series_id", "date", "end_date", "start_time", "end_time", "title", "status", "location", "notes",
+    "format_id", "promoter_id", "format", "promoter", "artists", "resources",
+])
+# prenotazione di un'occorrenza per i controlli di conflitto (attributi letti da spans.event_interval)
+Booking = namedtuple("Booking", ["id", "title", "date", "end_date", "start_time", "end_time"])
+# campi che cambiano le prenotazioni delle occorrenze
+BOOKING_FIELDS = ("rrule", "first_date", "duration_days", "start_time", "end_time", "status")
+
+# ---------- chiavi delle occorrenze ----------
+def occurrence_key(series_id, day):
+    return f"s{series_id}:{day.isoformat()}"
+
+def parse_key(key):
+    """(series_id, data) da una chiave di occorrenza; None se key e' l'id di un evento."""
+    if not isinstance(key, str) or not key.startswith("s") or ":" not in key:
+        return None
+    series_id, day = key[1:].split(":", 1)
+    return int(series_id), datetime.strptime(day, "%Y-%m-%d").date()
+
+# ---------- regole ----------
+def build_rrule(freq, interval=1, weekdays=(), until=None, count=None):
+    """RRULE dai campi del form (until ha la precedenza su count)."""
+    parts = [f"FREQ={freq}"]
+    if interval and interval > 1:
+        parts.append(f"INTERVAL={interval}")
+    if weekdays:
+        parts.append("BYDAY=" + ",".join(weekdays))
+    if until:
+        parts.append(f"UNTIL={until:%Y%m%d}")
+    elif count:
+        parts.append(f"COUNT={count}")
+    return ";".join(parts)
+
+def parse_rule(text, first_date):
+    """Regola dateutil con DTSTART = first_date; ValueError se il testo non e' una RRULE valida."""
+    from dateutil.rrule import rrulestr
+
+    text = (text or "").strip()
+    if text.upper().startswith("RRULE:"):
+        text = text[len("RRULE:"):]
+    if not text or "DTSTART" in text.upper() or "\n" in text:
+        raise ValueError("regola non valida: serve una sola RRULE senza DTSTART (es. FREQ=WEEKLY;BYDAY=SA)")
+    try:
+        return rrulestr(text, dtstart=datetime.combine(first_date, time.min))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"regola non valida: {e}") from None
+
+def _last_day(rule, text, first_date, duration_days):
+    # regola senza UNTIL/COUNT: nessuna fine; altrimenti ultimo giorno occupato dall'ultima occorrenza
+    if rule.after(datetime.combine(first_date, time.min), inc=True) is None:
+        raise ValueError("la regola non produce nessuna data")
+    upper = text.upper()
+    if "UNTIL=" not in upper and "COUNT=" not in upper:
+        return None
+    last = None
+    for n, occurrence in enumerate(rule, 1):
+        if n > MAX_OCCURRENCES:
+            raise ValueError(f"la serie supera {MAX_OCCURRENCES} date: dividila in piu' serie")
+        last = occurrence
+    return last.date() + timedelta(days=duration_days - 1)
+
+def expand(s, start, end, skipped=()):
+    """Date di inizio delle occorrenze della serie s con almeno un giorno in [start, end], escluse le date skipped."""
+    rule = parse_rule(s.rrule, s.first_date)
+    lo = datetime.combine(start - timedelta(days=(s.duration_days or 1) - 1), time.min)
+    hi = datetime.combine(end, time.min)
+    skipped = set(skipped)
+    return tuple(d.date() for d in rule.between(lo, hi, inc=True) if d.date() not in skipped)
+
+# ---------- cache delle espansioni ----------
+class ExpansionCache:
+    """LRU: (series_id, version, inizio, fine) -> tuple delle date di inizio delle occorrenze."""
+
+    def __init__(self, size):
+        self._size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def discard(self, series_id):
+        """Toglie le espansioni di una serie (eliminata)."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == series_id]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "size": self._size}
+
+expansions = ExpansionCache(CACHE_SIZE)
+
+# ---------- lettura ----------
+def series_filters(artist_id=None, resource_id=None, promoter_id=None, status=None):
+    """Come utils.event_filters, sulle serie."""
+    criteria = []
+    if artist_id:
+        criteria.append(EventSeries.id.in_(select(series_artist.c.series_id).where(series_artist.c.artist_id == artist_id)))
+    if resource_id:
+        criteria.append(EventSeries.id.in_(select(series_resource.c.series_id).where(series_resource.c.resource_id == resource_id)))
+    if promoter_id:
+        criteria.append(EventSeries.promoter_id == promoter_id)
+    if status:
+        criteria.append(EventSeries.status == status)
+    return criteria
+
+def _window_criteria(start, end):
+    # indice (first_date, last_date): si leggono solo le serie attive nella finestra
+    return [EventSeries.first_date <= end, or_(EventSeries.last_date.is_(None), EventSeries.last_date >= start)]
+
+def _window_series(db, start, end, filters):
+    q = (
+        select(EventSeries)
+        .where(*_window_criteria(start, end))
+        .where(*series_filters(**filters))
+        .order_by(EventSeries.id)
+    )
+    return db.execute(q).scalars().all()
+
+def _expansions(db, series_list, start, end):
+    """series_id -> date di inizio nella finestra; le eccezioni si leggono solo per le serie non in cache."""
+    found, missing = {}, []
+    for s in series_list:
+        dates = expansions.get((s.id, s.version, start, end))
+        if dates is None:
+            missing.append(s)
+        else:
+            found[s.id] = dates
+    if missing:
+        skipped = {}
+        q = select(EventSeriesException.series_id, EventSeriesException.date).where(
+            EventSeriesException.series_id.in_([s.id for s in missing]),
+            EventSeriesException.date >= start - timedelta(days=spans.MAX_EVENT_DAYS - 1),
+            EventSeriesException.date <= end,
+        )
+        for series_id, day in db.execute(q):
+            skipped.setdefault(series_id, set()).add(day)
+        for s in missing:
+            dates = found[s.id] = expand(s, start, end, skipped.get(s.id, ()))
+            expansions.put((s.id, s.version, start, end), dates)
+    return found
+
+def _links(db, table, column, series_ids):
+    by_series = {}
+    if series_ids:
+        q = select(table.c.series_id, table.c[column]).where(table.c.series_id.in_(series_ids))
+        for series_id, entity_id in db.execute(q):
+            by_series.setdefault(series_id, []).append(entity_id)
+    return by_series
+
+def _occurrences(db, series_list, dates, with_resources=True):
+    active = [s.id for s in series_list if dates.get(s.id)]
+    artists = _links(db, series_artist, "artist_id", active)
+    resources = _links(db, series_resource, "resource_id", active) if with_resources else {}
+    formats, promoters = ref_cache.get("formats").by_id, ref_cache.get("promoters").by_id
+    art_idx, res_idx = ref_cache.get("artists").by_id, ref_cache.get("resources").by_id
+    found = []
+    for s in series_list:
+        s_artists = sorted((art_idx[a] for a in artists.get(s.id, ()) if a in art_idx), key=lambda a: a.id)
+        s_resources = [res_idx[r] for r in resources.get(s.id, ()) if r in res_idx]
+        for day in dates.get(s.id, ()):
+            found.append(Occurrence(
+                occurrence_key(s.id, day), s.id, day, day + timedelta(days=(s.duration_days or 1) - 1),
+                s.start_time, s.end_time, s.title, s.status, s.location, s.notes, s.format_id, s.promoter_id,
+                formats.get(s.format_id), promoters.get(s.promoter_id), s_artists, s_resources,
+            ))
+    found.sort(key=lambda o: (o.date, o.start_time or time.min, o.series_id))
+    return found
+
+def occurrences_between(start, end, limit=None, with_resources=True, **filters):
+    """Occorrenze con almeno un giorno in [start, end], per data; filters come utils.event_filters."""
+    with session_scope() as db:
+        series_list = _window_series(db, start, end, filters)
+        if not series_list:
+            return []
+        found = _occurrences(db, series_list, _expansions(db, series_list, start, end), with_resources)
+    return found[:limit] if limit else found
+
+def occurrence_rows_between(start, end, limit=None, **filters):
+    """Come occurrences_between, ma utils.EventRow (artisti per nome, colore del primo artista)."""
+    from utils import EventRow
+
+    rows = []
+    for o in occurrences_between(start, end, limit, with_resources=False, **filters):
+        rows.append(EventRow(
+            o.id, o.date, o.end_date, o.start_time, o.end_time, o.title, o.status, o.location,
+            ", ".join(a.name for a in o.artists) or None, o.artists[0].calendar_color if o.artists else None,
+        ))
+    return rows
+
+def bookings(db, start, end, column, ids=None, exclude_series_id=None):
+    """
+    Prenotazioni delle occorrenze di serie non cancellate con almeno un giorno in [start, end]:
+    lista di (entity_id, Booking) con column "artist_id" o "resource_id", solo per gli id ids se indicati.
+    """
+    table = series_artist if column == "artist_id" else series_resource
+    linked = select(table.c.series_id)
+    if ids is not None:
+        ids = set(ids)
+        linked = linked.where(table.c[column].in_(ids))
+    q = (
+        select(EventSeries)
+        .where(*_window_criteria(start, end), EventSeries.id.in_(linked))
+        .where(or_(EventSeries.status.is_(None), EventSeries.status != "cancellato"))
+        .order_by(EventSeries.id)
+    )
+    if exclude_series_id is not None:
+        q = q.where(EventSeries.id != exclude_series_id)
+    series_list = db.execute(q).scalars().all()
+    if not series_list:
+        return []
+    dates = _expansions(db, series_list, start, end)
+    links = _links(db, table, column, [s.id for s in series_list if dates.get(s.id)])
+    found = []
+    for s in series_list:
+        entity_ids = [e for e in links.get(s.id, ()) if ids is None or e in ids]
+        for day in dates.get(s.id, ()) if entity_ids else ():
+            booking = Booking(
+                occurrence_key(s.id, day), s.title, day, day + timedelta(days=(s.duration_days or 1) - 1), s.start_time, s.end_time,
+            )
+            found += [(entity_id, booking) for entity_id in entity_ids]
+    return found
+
+def get_occurrence(key):
+    """Occorrenza dalla sua chiave (None se la data non e' generata dalla regola o e' un'eccezione)."""
+    parsed = parse_key(key)
+    if parsed is None:
+        return None
+    series_id, day = parsed
+    with session_scope() as db:
+        s = db.get(EventSeries, series_id)
+        if s is None:
+            return None
+        dates = _expansions(db, [s], day, day)
+        dates = {s.id: tuple(d for d in dates[s.id] if d == day)}
+        found = _occurrences(db, [s], dates)
+    return found[0] if found else None
+
+def get_series(series_id):
+    with session_scope() as db:
+        return db.get(EventSeries, series_id)
+
+def series_artist_ids(series_id):
+    with session_scope() as db:
+        return _links(db, series_artist, "artist_id", [series_id]).get(series_id, [])
+
+def list_exceptions(series_id):
+    """Eccezioni della serie per data: lista di (data, event_id o None)."""
+    with session_scope() as db:
+        q = (
+            select(EventSeriesException.date, EventSeriesException.event_id)
+            .where(EventSeriesException.series_id == series_id)
+            .order_by(EventSeriesException.date)
+        )
+        return db.execute(q).all()
+
+# ---------- scrittura ----------
+def _set_links(db, table, column, series_id, ids):
+    db.execute(delete(table).where(table.c.series_id == series_id))
+    if ids:
+        db.execute(insert(table), [{"series_id": series_id, column: i} for i in set(ids)])
+
+def _bump(db, series_id):
+    db.execute(update(EventSeries).where(EventSeries.id == series_id).values(version=EventSeries.version + 1))
+
+def _check(values):
+    """Valida durata, orari e regola; restituisce last_date."""
+    first = values["first_date"]
+    duration = values["duration_days"] or 1
+    spans.validate(first, first + timedelta(days=duration - 1), values["start_time"], values["end_time"])
+    return _last_day(parse_rule(values["rrule"], first), values["rrule"], first, duration)
+
+def _check_conflicts(db, values, last_date, artist_ids, resource_ids, series_id=None):
+    """
+    conflicts.BookingConflict se le occorrenze della serie (values, eccezioni di series_id) si
+    sovrappongono a eventi o ad altre serie con gli stessi artisti/risorse.
+    """
+    import conflicts
+
+    if values["status"] == "cancellato" or not (artist_ids or resource_ids):
+        return
+    first, duration = values["first_date"], values["duration_days"] or 1
+    end = last_date or max(first, date.today()) + timedelta(days=UPCOMING_DAYS)
+    skipped = ()
+    if series_id is not None:
+        q = select(EventSeriesException.date).where(EventSeriesException.series_id == series_id)
+        skipped = db.execute(q).scalars().all()
+    candidates = [
+        (day, day + timedelta(days=duration - 1), values["start_time"], values["end_time"])
+        for day in expand(EventSeries(**values), first, end, skipped)
+    ]
+    found = conflicts.check_bookings(db, candidates, artist_ids, resource_ids, exclude_series_id=series_id)
+    if found:
+        raise conflicts.BookingConflict(found)
+
+def _mark_feeds(db, series_id):
+    import ics
+
+    ics.mark_series_stale(db, series_id)
+
+def create_series(title, first_date, rrule, format_obj=None, promoter_obj=None, location=None, notes=None,
+                  status="proposta", duration_days=None, start_time=None, end_time=None, artist_ids=None, resource_ids=None,
+                  allow_conflicts=False):
+    """
+    Crea una serie; duration_days di default dal format. ValueError se regola o orari non sono validi,
+    conflicts.BookingConflict se le occorrenze creano doppie prenotazioni (salvo allow_conflicts).
+    """
+    if not duration_days:
+        last = spans.default_end(first_date, getattr(format_obj, "default_duration_days", None), start_time, end_time)
+        duration_days = (last - first_date).days + 1
+    values = {
+        "title": title, "rrule": rrule.strip(), "first_date": first_date,
+        "duration_days": min(duration_days, spans.MAX_EVENT_DAYS),
+        "start_time": start_time, "end_time": end_time,
+        "format_id": format_obj.id if format_obj else None, "promoter_id": promoter_obj.id if promoter_obj else None,
+        "location": location, "notes": notes, "status": status,
+    }
+    last_date = _check(values)
+    with session_scope() as db:
+        if not allow_conflicts:
+            _check_conflicts(db, values, last_date, artist_ids, resource_ids)
+        s = EventSeries(last_date=last_date, version=1, **values)
+        db.add(s)
+        db.flush()
+        _set_links(db, series_artist, "artist_id", s.id, artist_ids)
+        _set_links(db, series_resource, "resource_id", s.id, resource_ids)
+        _mark_feeds(db, s.id)
+        commit(db)
+        db.refresh(s)
+        return s
+
+def update_series(series_id, artist_ids=None, resource_ids=None, allow_conflicts=False, **kwargs):
+    """
+    Aggiorna i campi passati (SERIES_FIELDS); artist_ids/resource_ids None lasciano invariate le associazioni.
+    Le eccezioni restano: gli eventi gia' staccati non cambiano.
+    Se cambiano regola, date, orari, stato, artisti o risorse e ne nasce una doppia prenotazione
+    solleva conflicts.BookingConflict prima di scrivere (salvo allow_conflicts).
+    """
+    unknown = set(kwargs) - set(SERIES_FIELDS)
+    if unknown:
+        raise ValueError(f"campi non validi: {', '.join(sorted(unknown))}")
+    with session_scope() as db:
+        s = db.get(EventSeries, series_id)
+        if s is None:
+            return None
+        values = {k: kwargs.get(k, getattr(s, k)) for k in SERIES_FIELDS}
+        last_date = _check(values)
+        booking_changed = (
+            artist_ids is not None or resource_ids is not None or any(values[k] != getattr(s, k) for k in BOOKING_FIELDS)
+        )
+        if not allow_conflicts and booking_changed:
+            _check_conflicts(
+                db, values, last_date,
+                artist_ids if artist_ids is not None else _links(db, series_artist, "artist_id", [s.id]).get(s.id, []),
+                resource_ids if resource_ids is not None else _links(db, series_resource, "resource_id", [s.id]).get(s.id, []),
+                series_id=s.id,
+            )
+        # feed in cui la serie compariva prima della modifica
+        _mark_feeds(db, s.id)
+        s.last_date = last_date
+        for k, v in kwargs.items():
+            setattr(s, k, v)
+        s.version = (s.version or 0) + 1
+        if artist_ids is not None:
+            _set_links(db, series_artist, "artist_id", s.id, artist_ids)
+        if resource_ids is not None:
+            _set_links(db, series_resource, "resource_id", s.id, resource_ids)
+        db.flush()
+        _mark_feeds(db, s.id)
+        commit(db)
+        db.refresh(s)
+        return s
+
+def delete_series(series_id):
+    """Elimina la serie con le sue eccezioni; gli eventi staccati restano come eventi normali."""
+    with session_scope() as db:
+        _mark_feeds(db, series_id)
+        db.execute(delete(EventSeriesException).where(EventSeriesException.series_id == series_id))
+        db.execute(delete(series_artist).where(series_artist.c.series_id == series_id))
+        db.execute(delete(series_resource).where(series_resource.c.series_id == series_id))
+        db.execute(delete(EventSeries).where(EventSeries.id == series_id))
+        commit(db)
+        on_commit(db, lambda: expansions.discard(series_id))
+
+def skip_occurrence(series_id, day):
+    """Salta la data day (eccezione senza evento)."""
+    with session_scope() as db:
+        if db.get(EventSeriesException, (series_id, day)) is None:
+            db.add(EventSeriesException(series_id=series_id, date=day))
+            _bump(db, series_id)
+            _mark_feeds(db, series_id)
+        commit(db)
+
+def restore_occurrence(series_id, day):
+    """Annulla il salto della data day (le date staccate in un evento restano all'evento)."""
+    with session_scope() as db:
+        result = db.execute(delete(EventSeriesException).where(
+            EventSeriesException.series_id == series_id,
+            EventSeriesException.date == day,
+            EventSeriesException.event_id.is_(None),
+        ))
+        if result.rowcount:
+            _bump(db, series_id)
+            _mark_feeds(db, series_id)
+        commit(db)
+
+def detach_occurrence(series_id, day):
+    """
+    Trasforma l'occorrenza in un evento vero (per modificarla da sola) e la esclude dalla serie,
+    in una sola transazione. Restituisce l'id dell'evento.
+    """
+    import utils
+
+    occ = get_occurrence(occurrence_key(series_id, day))
+    if occ is None:
+        raise ValueError("occorrenza non trovata")
+    with unit_of_work():
+        # stesse prenotazioni dell'occorrenza, gia' visibili in calendario: nessun nuovo conflitto
+        ev = utils.create_event(
+            title=occ.title, date_=occ.date, format_obj=occ.format, promoter_obj=occ.promoter,
+            location=occ.location, notes=occ.notes, status=occ.status or "proposta",
+            artist_ids=[a.id for a in occ.artists], resource_ids=[r.id for r in occ.resources],
+            allow_conflicts=True, end_date=occ.end_date, start_time=occ.start_time, end_time=occ.end_time,
+        )
+        with session_scope() as db:
+            db.add(EventSeriesException(series_id=series_id, date=day, event_id=ev.id))
+            _bump(db, series_id)
+            _mark_feeds(db, series_id)
+            commit(db)
+        return ev.id
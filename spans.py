@@ -0,0 +1,101 @@
+# spans.py
+# Eventi su piu' giorni: un evento occupa i giorni da date a end_date inclusi, con orari facoltativi
+# (start_time il primo giorno, end_time l'ultimo; una serata che finisce alle 2 ha end_date il giorno
+# dopo). Senza orari occupa i giorni interi. Alla creazione end_date si ricava da
+# Format.default_duration_days.
+#
+# Le query per finestra (mese, settimana, giorno) usano overlap_criteria(): oltre a date <= fine e
+# end_date >= inizio, date e' limitata dal basso a inizio - (MAX_EVENT_DAYS - 1). Cosi' la condizione
+# resta un intervallo sull'indice ix_events_date_end (date, end_date), end_date si filtra dalla
+# stessa voce d'indice e nessuna query legge gli eventi passati per trovare quelli ancora in corso.
+# Per questo la durata di un evento e' limitata a MAX_EVENT_DAYS giorni (EVENT_MAX_DAYS).
+import os
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import Integer, String, case, cast, func, type_coerce
+
+from models import Event
+
+MAX_EVENT_DAYS = int(os.getenv("EVENT_MAX_DAYS", "31"))
+_EPOCH = datetime(1970, 1, 1)
+
+def overlap_criteria(start, end=None):
+    """Condizioni WHERE: eventi con almeno un giorno in [start, end] (end None: da start in poi)."""
+    criteria = [Event.date >= start - timedelta(days=MAX_EVENT_DAYS - 1), Event.end_date >= start]
+    if end is not None:
+        criteria.append(Event.date <= end)
+    return criteria
+
+def default_end(start, duration_days=None, start_time=None, end_time=None):
+    """
+    Ultimo giorno di un evento che inizia start e dura duration_days giorni (format), entro MAX_EVENT_DAYS.
+    Con orario di fine non successivo a quello di inizio la serata finisce il giorno dopo (23:00-04:00).
+    """
+    days = min(max(duration_days or 1, 1), MAX_EVENT_DAYS)
+    if start_time and end_time and end_time <= start_time and days < MAX_EVENT_DAYS:
+        days += 1
+    return start + timedelta(days=days - 1)
+
+def validate(start, end, start_time=None, end_time=None):
+    """Solleva ValueError se l'intervallo non e' valido."""
+    if end < start:
+        raise ValueError("la data di fine precede quella di inizio")
+    if (end - start).days >= MAX_EVENT_DAYS:
+        raise ValueError(f"un evento non puo' durare piu' di {MAX_EVENT_DAYS} giorni")
+    if start_time and end_time and end == start and end_time <= start_time:
+        raise ValueError("l'orario di fine precede quello di inizio")
+
+def interval(start, end, start_time=None, end_time=None):
+    """(inizio, fine) come datetime, fine esclusa: senza orari si va dalla mezzanotte del primo giorno a quella dopo l'ultimo."""
+    begin = datetime.combine(start, start_time or time.min)
+    if end_time:
+        return begin, datetime.combine(end, end_time)
+    return begin, datetime.combine(end + timedelta(days=1), time.min)
+
+def event_interval(ev):
+    """interval() di un Event o di una riga con date, end_date, start_time, end_time."""
+    return interval(ev.date, ev.end_date or ev.date, ev.start_time, ev.end_time)
+
+def epoch_bounds(dialect):
+    """
+    Espressioni SQL (inizio, fine) di event_interval in secondi dall'epoca Unix: per ordinare e
+    confrontare molte prenotazioni in SQL senza convertire date e orari riga per riga in Python.
+    """
+    if dialect == "postgresql":
+        # date + time -> timestamp
+        def at(day, t):
+            return cast(func.extract("epoch", day + func.coalesce(t, time(0))), Integer)
+        day_after = cast(func.extract("epoch", Event.end_date + 1), Integer)
+    else:
+        # date e time sono testo ISO, 'YYYY-MM-DD HH:MM:SS' si legge con strftime
+        def at(day, t):
+            return cast(func.strftime("%s", type_coerce(day, String) + " " + type_coerce(func.coalesce(t, "00:00:00"), String)), Integer)
+        day_after = cast(func.strftime("%s", Event.end_date, "+1 day"), Integer)
+    return at(Event.date, Event.start_time), case((Event.end_time.is_(None), day_after), else_=at(Event.end_date, Event.end_time))
+
+def epoch_interval(ev):
+    """event_interval in secondi dall'epoca Unix, come epoch_bounds() (prenotazioni calcolate in Python)."""
+    return tuple((moment - _EPOCH) // timedelta(seconds=1) for moment in event_interval(ev))
+
+def epoch_day(seconds):
+    """Giorno di un istante restituito da epoch_bounds()."""
+    return date(1970, 1, 1) + timedelta(days=seconds // 86400)
+
+def overlaps(a, b):
+    """Due intervalli (inizio, fine) con fine esclusa si sovrappongono."""
+    return a[0] < b[1] and b[0] < a[1]
+
+def days_in(start, end, window_start, window_end):
+    """Giorni dell'evento [start, end] che cadono nella finestra [window_start, window_end]."""
+    day, last = max(start, window_start), min(end, window_end)
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
+
+def label(ev):
+    """Date e orari in forma breve per la UI: '12/07 21:00 - 14/07 02:00'."""
+    first = ev.date.strftime("%d/%m") + (f" {ev.start_time:%H:%M}" if ev.start_time else "")
+    end = ev.end_date or ev.date
+    if end == ev.date:
+        return first + (f"-{ev.end_time:%H:%M}" if ev.end_time else "")
+    return f"{first} - {end:%d/%m}" + (f" {ev.end_time:%H:%M}" if ev.end_time else "")
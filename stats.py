@@ -0,0 +1,206 @@
+# stats.py
+# Contatori pre-aggregati per la Dashboard (tabella event_stats).
+#
+# Una riga per (dimension, entity_id, period, status) con il numero di eventi:
+#   month                      entity_id 0, period = primo giorno del mese
+#   day                        entity_id 0, period = giorno (heatmap annuale); un evento su piu' giorni conta in ciascuno
+#   artist / promoter / format entity_id = id, period = primo giorno del mese
+# utils (create/update/delete evento) e importer applicano le differenze +1/-1 nella stessa
+# transazione della scrittura; rebuild() ricalcola tutto con INSERT ... SELECT ... GROUP BY.
+# La Dashboard legge un anno intero con una sola query su event_stats, mai su events.
+# Le altre dimensioni contano l'evento una volta, nel mese in cui inizia.
+# Le occorrenze delle serie ricorrenti non sono righe di events: year_stats() le aggiunge in lettura
+# con le stesse chiavi di un evento (series.occurrences_between, espansioni in cache).
+# count_events() somma gli stessi contatori per il totale delle pagine di eventi (utils.list_events_page).
+from collections import Counter, namedtuple
+from datetime import date, timedelta
+
+from sqlalchemy import Date, Integer, String, cast, delete, func, insert, literal, select, union_all
+
+from db import engine, session_scope
+from models import Event, EventStat, event_artist
+import series
+import spans
+
+DIMENSIONS = ("month", "day", "artist", "promoter", "format")
+
+# stato di un evento rilevante per i contatori
+# end_date None: evento di un giorno
+Snapshot = namedtuple("Snapshot", ["date", "status", "promoter_id", "format_id", "artist_ids", "end_date"], defaults=(None,))
+# totals: stato -> n; months: (mese, stato) -> n; days/artists/promoters/formats: chiave -> n (esclusi i cancellati)
+YearStats = namedtuple("YearStats", ["totals", "months", "days", "artists", "promoters", "formats"])
+
+def _dialect(db):
+    return db.dialect.name if hasattr(db, "dialect") else db.get_bind().dialect.name
+
+# ---------- aggiornamento incrementale ----------
+def snapshot(db, event_id):
+    """Snapshot dell'evento come e' ora nel DB (None se non esiste)."""
+    row = db.execute(
+        select(Event.date, Event.status, Event.promoter_id, Event.format_id, Event.end_date).where(Event.id == event_id)
+    ).first()
+    if row is None:
+        return None
+    artist_ids = db.execute(select(event_artist.c.artist_id).where(event_artist.c.event_id == event_id)).scalars().all()
+    return Snapshot(row.date, row.status, row.promoter_id, row.format_id, tuple(artist_ids), row.end_date)
+
+def _keys(snap):
+    if snap is None or snap.date is None:
+        return []
+    month = snap.date.replace(day=1)
+    status = snap.status or ""
+    keys = [("month", 0, month, status)]
+    day, last = snap.date, max(snap.end_date or snap.date, snap.date)
+    while day <= last:
+        keys.append(("day", 0, day, status))
+        day += timedelta(days=1)
+    if snap.promoter_id:
+        keys.append(("promoter", snap.promoter_id, month, status))
+    if snap.format_id:
+        keys.append(("format", snap.format_id, month, status))
+    keys += [("artist", a, month, status) for a in snap.artist_ids]
+    return keys
+
+def _upsert(dialect):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    table = EventStat.__table__
+    stmt = dialect_insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.period, table.c.dimension, table.c.entity_id, table.c.status],
+        set_={"count": table.c.count + stmt.excluded.count},
+    )
+
+def apply(db, removed=(), added=()):
+    """
+    Applica ai contatori la differenza tra gli snapshot removed (-1) e added (+1).
+    db: Session o Connection nella transazione della scrittura; una sola executemany.
+    """
+    deltas = Counter()
+    for snap in removed:
+        for key in _keys(snap):
+            deltas[key] -= 1
+    for snap in added:
+        for key in _keys(snap):
+            deltas[key] += 1
+    rows = [
+        {"dimension": dim, "entity_id": entity_id, "period": period, "status": status, "count": n}
+        for (dim, entity_id, period, status), n in deltas.items() if n
+    ]
+    if rows:
+        db.execute(_upsert(_dialect(db)), rows)
+
+def drop_entity(db, dimension, entity_id):
+    """Anagrafica eliminata: i suoi contatori non hanno piu' senso (gli eventi restano negli altri)."""
+    db.execute(delete(EventStat).where(EventStat.dimension == dimension, EventStat.entity_id == entity_id))
+
+# ---------- ricostruzione completa ----------
+def _month_start(dialect, column):
+    if dialect == "postgresql":
+        return cast(func.date_trunc("month", column), Date)
+    return func.date(column, "start of month")
+
+def _day_offsets():
+    # 0 .. MAX_EVENT_DAYS - 1 come tabella derivata: un evento su n giorni si espande in n righe
+    return union_all(*(select(literal(i, Integer).label("k")) for i in range(spans.MAX_EVENT_DAYS))).subquery("offsets")
+
+def _span_days(dialect):
+    """(giorno dell'evento, condizione di join) per l'espansione dei giorni di ogni evento."""
+    offsets = _day_offsets()
+    end = func.coalesce(Event.end_date, Event.date)
+    if dialect == "postgresql":
+        return offsets, Event.date + offsets.c.k, offsets.c.k <= end - Event.date
+    day = func.date(Event.date, "+" + cast(offsets.c.k, String) + " days")
+    return offsets, day, offsets.c.k <= func.julianday(end) - func.julianday(Event.date)
+
+def _rebuild_select(dialect, dimension):
+    status = func.coalesce(Event.status, "")
+    entity = literal(0)
+    period = _month_start(dialect, Event.date)
+    q = select(Event.id).where(Event.date.isnot(None))
+    if dimension == "day":
+        offsets, period, within = _span_days(dialect)
+        q = q.join_from(Event, offsets, within)
+    elif dimension == "artist":
+        entity = event_artist.c.artist_id
+        q = q.join_from(Event, event_artist, event_artist.c.event_id == Event.id)
+    elif dimension == "promoter":
+        entity = Event.promoter_id
+        q = q.where(Event.promoter_id.isnot(None))
+    elif dimension == "format":
+        entity = Event.format_id
+        q = q.where(Event.format_id.isnot(None))
+    return q.with_only_columns(
+        literal(dimension, String), entity, period, status, func.count()
+    ).group_by(entity, period, status)
+
+def rebuild(bind=engine):
+    """Ricalcola tutti i contatori da events (comando: python manage.py stats-rebuild)."""
+    with bind.begin() as conn:
+        rebuild_on(conn)
+
+def rebuild_on(conn):
+    """Come rebuild ma su una connessione gia' in transazione (generatore di dati)."""
+    table = EventStat.__table__
+    conn.execute(delete(table))
+    for dimension in DIMENSIONS:
+        conn.execute(
+            insert(table).from_select(
+                ["dimension", "entity_id", "period", "status", "count"],
+                _rebuild_select(conn.dialect.name, dimension),
+            )
+        )
+
+# ---------- lettura ----------
+def count_events(db, artist_id=None, promoter_id=None, status=None, resource_id=None):
+    """
+    Eventi con data (senza le occorrenze delle serie) dai contatori mensili: qualche centinaio di
+    righe invece di un count(*) su events. None se i filtri non corrispondono a una dimensione.
+    """
+    if resource_id or (artist_id and promoter_id):
+        return None
+    if artist_id:
+        dimension, entity_id = "artist", artist_id
+    elif promoter_id:
+        dimension, entity_id = "promoter", promoter_id
+    else:
+        dimension, entity_id = "month", 0
+    q = select(func.coalesce(func.sum(EventStat.count), 0)).where(
+        EventStat.dimension == dimension, EventStat.entity_id == entity_id,
+    )
+    if status:
+        q = q.where(EventStat.status == status)
+    return db.execute(q).scalar()
+
+def year_stats(year):
+    """Tutti i contatori dell'anno con una query (qualche migliaio di righe al massimo), piu' le occorrenze delle serie."""
+    totals, months, days = Counter(), Counter(), Counter()
+    by_entity = {"artist": Counter(), "promoter": Counter(), "format": Counter()}
+
+    def add(dimension, entity_id, period, status, n):
+        if dimension == "month":
+            totals[status] += n
+            months[(period.month, status)] += n
+        elif status == "cancellato":
+            return
+        elif dimension == "day":
+            days[period] += n
+        else:
+            by_entity[dimension][entity_id] += n
+
+    first, last = date(year, 1, 1), date(year, 12, 31)
+    with session_scope() as db:
+        rows = db.execute(
+            select(EventStat.dimension, EventStat.entity_id, EventStat.period, EventStat.status, EventStat.count)
+            .where(EventStat.period >= first, EventStat.period <= last, EventStat.count != 0)
+        )
+        for row in rows:
+            add(*row)
+    for o in series.occurrences_between(first, last, with_resources=False):
+        snap = Snapshot(o.date, o.status, o.promoter_id, o.format_id, tuple(a.id for a in o.artists), o.end_date)
+        for key in _keys(snap):
+            if first <= key[2] <= last:
+                add(*key, 1)
+    return YearStats(totals, months, days, by_entity["artist"], by_entity["promoter"], by_entity["format"])
@@ -0,0 +1,62 @@
+# tests/conftest.py
+# DB SQLite temporaneo per tutta la sessione di test. EVENT_DB_URL va impostata prima di importare
+# db (l'engine si crea all'import) e il file .env dello sviluppatore non deve entrare in gioco.
+# Le migrazioni portano lo schema a head una volta sola; ogni test parte da tabelle vuote e cache svuotate.
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_TMP = tempfile.mkdtemp(prefix="event-tests-")
+os.environ["EVENT_DB_URL"] = f"sqlite:///{os.path.join(_TMP, 'events.db')}"
+os.environ["EVENT_CONFIG_FILE"] = os.path.join(_TMP, ".env")
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    from bootstrap import migrate
+    from db import engine
+
+    migrate()
+    yield
+    engine.dispose()
+    shutil.rmtree(_TMP, ignore_errors=True)
+
+@pytest.fixture(autouse=True)
+def clean_db(schema):
+    yield
+    from sqlalchemy import delete, text
+    from db import Base, engine
+    from cache import ref_cache
+    import series
+
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(delete(table))
+        conn.execute(text("DELETE FROM events_fts"))
+    ref_cache.invalidate()
+    series.expansions.clear()
+
+@pytest.fixture
+def db():
+    from db import SessionLocal
+
+    session = SessionLocal()
+    yield session
+    session.close()
+
+@pytest.fixture
+def artists():
+    import utils
+
+    return [utils.create_artist(name).id for name in ("Artista A", "Artista B", "Artista C")]
+
+@pytest.fixture
+def resources():
+    import utils
+
+    return [utils.create_resource(name, "sala").id for name in ("Sala 1", "Sala 2")]
@@ -0,0 +1,70 @@
+# tests/test_conflicts.py
+# Doppie prenotazioni su giorni e orari sovrapposti (conflicts.py).
+from datetime import date, time
+
+import pytest
+from sqlalchemy import select
+
+import conflicts
+import utils
+from db import unit_of_work
+from models import Event
+
+def test_overlapping_days_conflict(db, artists):
+    first = utils.create_event("Festival", date(2026, 7, 10), artist_ids=[artists[0]], end_date=date(2026, 7, 12))
+    found = conflicts.check_booking(db, date(2026, 7, 12), artist_ids=[artists[0]])
+    assert [(c.kind, c.entity_id, c.date, c.events) for c in found] == [
+        ("artist", artists[0], date(2026, 7, 12), ((first.id, "Festival"),)),
+    ]
+    with pytest.raises(conflicts.BookingConflict):
+        utils.create_event("Serata", date(2026, 7, 11), artist_ids=[artists[0]], end_date=date(2026, 7, 11))
+
+def test_times_on_the_same_day(artists):
+    utils.create_event("Pomeriggio", date(2026, 7, 10), artist_ids=[artists[0]], end_date=date(2026, 7, 10), start_time=time(15), end_time=time(18))
+    # stesso giorno, orari che non si toccano (la fine e' esclusa)
+    utils.create_event("Sera", date(2026, 7, 10), artist_ids=[artists[0]], end_date=date(2026, 7, 10), start_time=time(18), end_time=time(21))
+    with pytest.raises(conflicts.BookingConflict):
+        utils.create_event("Aperitivo", date(2026, 7, 10), artist_ids=[artists[0]], end_date=date(2026, 7, 10), start_time=time(17), end_time=time(19))
+
+def test_overnight_event_blocks_next_morning_only_until_its_end(artists):
+    utils.create_event("Club", date(2026, 7, 10), artist_ids=[artists[0]], end_date=date(2026, 7, 11), start_time=time(23), end_time=time(4))
+    utils.create_event("Pranzo", date(2026, 7, 11), artist_ids=[artists[0]], end_date=date(2026, 7, 11), start_time=time(12), end_time=time(14))
+    with pytest.raises(conflicts.BookingConflict):
+        utils.create_event("Alba", date(2026, 7, 11), artist_ids=[artists[0]], end_date=date(2026, 7, 11), start_time=time(3), end_time=time(6))
+
+def test_cancelled_and_allowed(artists, resources):
+    ev = utils.create_event("Annullato", date(2026, 7, 10), artist_ids=[artists[0]], end_date=date(2026, 7, 10))
+    utils.update_event(ev.id, status="cancellato")
+    utils.create_event("Al suo posto", date(2026, 7, 10), artist_ids=[artists[0]], end_date=date(2026, 7, 10))
+    forced = utils.create_event(
+        "Forzato", date(2026, 7, 10), artist_ids=[artists[0]], end_date=date(2026, 7, 10), allow_conflicts=True,
+    )
+    assert [c.kind for c in conflicts.event_conflicts(forced.id)] == ["artist"]
+    assert conflicts.event_conflicts(ev.id) == []
+
+def test_unavailable_resource(db, resources):
+    utils.add_resource_unavailability(resources[0], date(2026, 8, 1), date(2026, 8, 5), reason="manutenzione")
+    found = conflicts.check_booking(db, date(2026, 7, 30), resource_ids=resources, end_date=date(2026, 8, 2))
+    assert [(c.kind, c.entity_id, c.date, c.reason) for c in found] == [("unavailable", resources[0], date(2026, 8, 1), "manutenzione")]
+
+def test_season_conflicts(artists, resources):
+    a = utils.create_event("A", date(2026, 3, 1), artist_ids=[artists[0]], resource_ids=[resources[0]], end_date=date(2026, 3, 3))
+    b = utils.create_event("B", date(2026, 3, 3), artist_ids=[artists[0]], end_date=date(2026, 3, 3), allow_conflicts=True)
+    c = utils.create_event("C", date(2026, 3, 2), resource_ids=[resources[0]], end_date=date(2026, 3, 2), allow_conflicts=True)
+    utils.create_event("D", date(2026, 3, 4), artist_ids=[artists[0]], resource_ids=[resources[0]], end_date=date(2026, 3, 4))
+    found = conflicts.season_conflicts(date(2026, 1, 1), date(2026, 12, 31))
+    assert [(f.kind, f.entity_id, f.date, {e for e, _ in f.events}) for f in found] == [
+        ("resource", resources[0], date(2026, 3, 2), {a.id, c.id}),
+        ("artist", artists[0], date(2026, 3, 3), {a.id, b.id}),
+    ]
+    # finestra che non contiene la sovrapposizione
+    assert conflicts.season_conflicts(date(2026, 3, 4), date(2026, 3, 31)) == []
+
+def test_conflict_inside_unit_of_work_keeps_earlier_writes(db, artists):
+    with unit_of_work():
+        kept = utils.create_event("Prima", date(2026, 9, 1), artist_ids=[artists[0]], end_date=date(2026, 9, 1))
+        with pytest.raises(conflicts.BookingConflict):
+            utils.create_event("Doppia", date(2026, 9, 1), artist_ids=[artists[0]], end_date=date(2026, 9, 1))
+        after = utils.create_event("Dopo", date(2026, 9, 2), artist_ids=[artists[0]], end_date=date(2026, 9, 2))
+    assert sorted(db.scalars(select(Event.title)).all()) == ["Dopo", "Prima"]
+    assert {kept.id, after.id} == set(db.scalars(select(Event.id)).all())
@@ -0,0 +1,79 @@
+# tests/test_importer.py
+# Import CSV (importer.py): validazione delle righe, numeri di riga nei blocchi, doppie prenotazioni
+# e andata e ritorno con exporter.
+from datetime import date, time
+
+import pytest
+from sqlalchemy import select
+
+import exporter
+import importer
+import utils
+from db import engine
+from models import Event
+
+def _maps():
+    with engine.connect() as conn:
+        return importer.load_name_maps(conn)
+
+def test_validate_row(artists, resources):
+    utils.create_format("Festival", default_duration_days=3)
+    values, artist_ids, resource_ids = importer.validate_row({
+        "title": " Estate ", "date": "10/07/2026", "format": "Festival", "start_time": "21.30",
+        "artists": "Artista A; Artista B", "resources": "sala: Sala 1", "status": "Confermato",
+    }, _maps())
+    assert (values["title"], values["date"], values["end_date"], values["start_time"], values["status"]) == (
+        "Estate", date(2026, 7, 10), date(2026, 7, 12), time(21, 30), "confermato",
+    )
+    assert (artist_ids, resource_ids) == (set(artists[:2]), {resources[0]})
+    # tutti i problemi della riga in un solo messaggio
+    with pytest.raises(ValueError) as e:
+        importer.validate_row({"date": "2026-13-01", "status": "forse", "artists": "Nessuno"}, _maps())
+    assert str(e.value) == "titolo mancante; data non valida: '2026-13-01'; stato non valido: 'forse'; artista non trovato: 'Nessuno'"
+
+def test_iter_chunks_line_numbers(tmp_path):
+    path = tmp_path / "eventi.csv"
+    path.write_text("Title,Date\nA,2026-01-01\n\nB,2026-01-02\nC,2026-01-03\n,\nD,2026-01-04\n", encoding="utf-8")
+    chunks = list(importer.iter_chunks(str(path), chunk_size=2))
+    # righe vuote saltate ma contate: il numero e' quello del file (intestazione = 1)
+    assert [[(line, row["title"]) for line, row in chunk] for chunk in chunks] == [
+        [(2, "A")], [(4, "B"), (5, "C")], [(7, "D")],
+    ]
+
+def test_conflicts_are_row_errors(tmp_path, artists):
+    utils.create_event("Gia' in calendario", date(2026, 7, 10), artist_ids=[artists[0]], end_date=date(2026, 7, 10))
+    path = tmp_path / "eventi.csv"
+    path.write_text(
+        "title,date,artists\n"
+        "Doppia col DB,2026-07-10,Artista A\n"
+        "Libera,2026-07-11,Artista A\n"
+        "Doppia nel file,2026-07-11,Artista A\n"
+        "Altro artista,2026-07-11,Artista B\n",
+        encoding="utf-8",
+    )
+    report = importer.import_events(str(path))
+    assert report.inserted == 2
+    assert [line for line, _ in report.errors] == [2, 4]
+    assert all(message.startswith("doppia prenotazione: ") for _, message in report.errors)
+    forced = importer.import_events(str(path), allow_conflicts=True)
+    assert (forced.inserted, forced.errors) == (4, [])
+
+def test_csv_round_trip(tmp_path, artists, resources):
+    fmt = utils.create_format("Concerto")
+    promoter = utils.create_promoter("Promo")
+    utils.create_event(
+        "Serata", date(2026, 7, 10), format_obj=fmt, promoter_obj=promoter, location="Piazza", notes="note; varie",
+        artist_ids=artists[:2], resource_ids=[resources[1]], end_date=date(2026, 7, 11), start_time=time(22), end_time=time(3),
+    )
+    utils.create_event("Prova", date(2026, 8, 1), status="confermato", end_date=date(2026, 8, 1))
+    path = str(tmp_path / "eventi.csv")
+    assert exporter.export_events(path, "csv") == 2
+    before = list(exporter.iter_event_rows())
+    with engine.begin() as conn:
+        ids = conn.execute(select(Event.id)).scalars().all()
+    for event_id in ids:
+        utils.delete_event(event_id)
+    report = importer.import_events(path)
+    assert (report.inserted, report.errors) == (2, [])
+    after = list(exporter.iter_event_rows())
+    assert [{k: v for k, v in row.items() if k != "id"} for row in after] == [{k: v for k, v in row.items() if k != "id"} for row in before]
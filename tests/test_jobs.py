@@ -0,0 +1,39 @@
+# tests/test_jobs.py
+# Stati dei job (jobs.py): annullamento e avvio condizionati sullo stato, orari in UTC.
+from datetime import datetime, timedelta, timezone
+
+import jobs
+from models import Job
+
+def _queued(db, kind):
+    row = Job(kind=kind, params="{}", status="queued", progress=0.0, created_at=jobs._now())
+    db.add(row)
+    db.commit()
+    return row.id
+
+def test_cancelled_job_never_starts(db):
+    job_id = _queued(db, "stats_rebuild")
+    assert jobs.cancel(job_id)
+    jobs._run(job_id)
+    row = jobs.get_job(job_id)
+    assert (row.status, row.started_at) == ("cancelled", None)
+    # gia' concluso: un secondo annullamento non cambia nulla
+    assert not jobs.cancel(job_id)
+
+def test_running_job_cancellable_only_if_it_checks(db):
+    running = []
+    for kind in ("stats_rebuild", "export"):
+        job_id = _queued(db, kind)
+        db.execute(Job.__table__.update().where(Job.id == job_id).values(status="running"))
+        db.commit()
+        running.append(jobs.get_job(job_id))
+    stats_job, export_job = running
+    assert not jobs.can_cancel(stats_job) and not jobs.cancel(stats_job.id)
+    assert jobs.can_cancel(export_job) and jobs.cancel(export_job.id)
+    assert jobs.get_job(export_job.id).cancel_requested
+
+def test_times_are_utc(db):
+    job_id = _queued(db, "seed")
+    created = jobs.get_job(job_id).created_at
+    assert created.tzinfo is None
+    assert abs(jobs.local_time(created) - datetime.now(timezone.utc)) < timedelta(minutes=1)
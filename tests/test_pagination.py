@@ -0,0 +1,73 @@
+# tests/test_pagination.py
+# Paginazione keyset di utils.list_events_page / list_event_rows_page: cursori nei due versi.
+from datetime import date
+
+import utils
+from db import session_scope
+from models import Event
+
+def _events():
+    ids = []
+    # date ripetute: a parita' di data l'ordine e' per id
+    for i, day in enumerate([date(2026, 5, 1), date(2026, 5, 1), date(2026, 5, 2), date(2026, 5, 3), date(2026, 5, 3), date(2026, 5, 3), date(2026, 5, 9)]):
+        title = f"Jazz {i}" if i % 2 else f"Rock {i}"
+        ids.append(utils.create_event(title, day, end_date=day).id)
+    with session_scope() as db:
+        # evento storico senza data: fuori dalle pagine
+        db.add(Event(title="Jazz senza data"))
+        db.commit()
+    return ids
+
+def _expected(ids):
+    with session_scope() as db:
+        events = db.query(Event).filter(Event.id.in_(ids)).all()
+        return [ev.id for ev in sorted(events, key=lambda ev: (ev.date, ev.id), reverse=True)]
+
+def test_keyset_forward_and_back():
+    expected = _expected(_events())
+    pages, cursor = [], None
+    while True:
+        page = utils.list_events_page(cursor, page_size=3)
+        assert page.total == len(expected)
+        pages.append([ev.id for ev in page.items])
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert [i for p in pages for i in p] == expected
+    assert [len(p) for p in pages] == [3, 3, 1]
+    # a ritroso dall'ultima pagina si rileggono le stesse pagine
+    back, cursor = [], page.prev_cursor
+    while cursor is not None:
+        page = utils.list_events_page(cursor, page_size=3, backwards=True)
+        back.append([ev.id for ev in page.items])
+        cursor = page.prev_cursor
+    assert back == pages[-2::-1]
+
+def test_keyset_rows_with_search():
+    expected = _expected(_events())
+    jazz = [i for i in expected if i in {ev.id for ev in utils.list_all_events() if ev.title.startswith("Jazz")}]
+    first = utils.list_event_rows_page(page_size=2, search="jazz")
+    assert first.total == len(jazz) == 3
+    second = utils.list_event_rows_page(first.next_cursor, page_size=2, search="jazz")
+    assert [r.id for r in first.items + second.items] == jazz
+    assert second.next_cursor is None
+    assert [r.id for r in utils.list_event_rows_page(second.prev_cursor, page_size=2, backwards=True, search="jazz").items] == jazz[:2]
+
+def test_total_from_counters_matches_count(artists, resources):
+    promoter = utils.create_promoter("Promo")
+    a = utils.create_event("A", date(2026, 5, 1), end_date=date(2026, 5, 1), artist_ids=artists[:2], promoter_obj=promoter)
+    b = utils.create_event("B", date(2026, 6, 1), end_date=date(2026, 6, 3), artist_ids=[artists[0]], resource_ids=[resources[0]])
+    utils.create_event("C", date(2027, 1, 1), end_date=date(2027, 1, 1), status="confermato")
+    utils.update_event(b.id, status="cancellato")
+    utils.delete_event(a.id)
+    cases = [
+        {}, {"status": "cancellato"}, {"status": "proposta"}, {"artist_id": artists[0]},
+        {"artist_id": artists[1]}, {"promoter_id": promoter.id}, {"resource_id": resources[0]},
+    ]
+    for filters in cases:
+        page = utils.list_event_rows_page(page_size=1, **filters)
+        with session_scope() as db:
+            exact = db.query(Event).filter(Event.date.isnot(None), *utils.event_filters(**filters)).count()
+        assert page.total == exact, filters
+    # total gia' noto: le pagine successive non ricontano
+    assert utils.list_events_page(page_size=1, total=42).total == 42
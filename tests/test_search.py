@@ -0,0 +1,57 @@
+# tests/test_search.py
+# Ricerca eventi (search.py) sull'indice FTS5 trigram del DB di test: sottostringhe, termini corti
+# con LIKE, caratteri jolly letterali e indice allineato alle scritture di utils.
+from datetime import date
+
+import search
+import utils
+
+def _ids(query):
+    return [ev.id for ev in search.search_events(query, limit=50).items]
+
+def _event(title, **kwargs):
+    return utils.create_event(title, date(2026, 7, 10), end_date=date(2026, 7, 10), **kwargs).id
+
+def test_trigram_substring_ranked_by_column(artists):
+    in_notes = _event("Serata", notes="dopo il jazzfestival")
+    in_title = _event("Jazzfestival estivo")
+    by_artist = _event("Concerto", artist_ids=[artists[1]])
+    _event("Rock in piazza")
+    # sottostringa dentro una parola; il titolo pesa piu' delle note
+    assert _ids("zzfest") == [in_title, in_notes]
+    assert search.search_events("zzfest").total == 2
+    assert _ids("artista b") == [by_artist]
+    # piu' parole: tutte devono comparire
+    assert _ids("jazzfestival estivo") == [in_title]
+
+def test_short_terms_use_like():
+    dj = _event("DJ set", location="Lido")
+    _event("Concerto", location="Teatro")
+    # "dj" non ha trigrammi: MATCH non troverebbe nulla
+    assert _ids("dj") == [dj]
+    # termine corto insieme a uno lungo: entrambi in AND
+    assert _ids("dj lido") == [dj]
+    assert _ids("dj teatro") == []
+
+def test_wildcards_are_literal():
+    percent = _event("100% Jazz")
+    underscore = _event("Sala_B")
+    _event("Sala B")
+    _event("1000 Jazz")
+    assert _ids("%") == [percent]
+    assert _ids("0%") == [percent]
+    assert _ids("_") == [underscore]
+    assert _ids("la_b") == [underscore]
+
+def test_index_follows_writes(artists):
+    event_id = _event("Anteprima", artist_ids=[artists[0]])
+    assert _ids("anteprima") == [event_id]
+    utils.update_event(event_id, title="Prima nazionale", notes="tutto esaurito")
+    assert _ids("anteprima") == []
+    assert _ids("nazionale") == _ids("esaurito") == [event_id]
+    utils.update_artist(artists[0], name="Orchestra Nuova")
+    assert _ids("orchestra") == [event_id]
+    assert _ids("artista a") == []
+    utils.delete_event(event_id)
+    assert _ids("nazionale") == []
+    assert search.search_events("nazionale").total == 0
@@ -0,0 +1,98 @@
+# tests/test_series.py
+# Serie ricorrenti: espansione con le eccezioni, cache delle espansioni per versione e occorrenze
+# come prenotazioni (conflitti, risorse libere, Dashboard, export).
+from datetime import date, time
+
+import pytest
+
+import conflicts
+import exporter
+import series
+import stats
+import utils
+
+def _saturdays(**kwargs):
+    # sabati di gennaio 2026
+    return series.create_series("Residenza", date(2026, 1, 3), "FREQ=WEEKLY;BYDAY=SA;COUNT=5", duration_days=1, **kwargs)
+
+def _days(start=date(2026, 1, 1), end=date(2026, 1, 31)):
+    return [o.date for o in series.occurrences_between(start, end)]
+
+def test_expansion_skips_exceptions():
+    s = _saturdays()
+    assert s.last_date == date(2026, 1, 31)
+    assert _days() == [date(2026, 1, 3), date(2026, 1, 10), date(2026, 1, 17), date(2026, 1, 24), date(2026, 1, 31)]
+    series.skip_occurrence(s.id, date(2026, 1, 10))
+    event_id = series.detach_occurrence(s.id, date(2026, 1, 17))
+    assert _days() == [date(2026, 1, 3), date(2026, 1, 24), date(2026, 1, 31)]
+    assert [(e.id, e.date) for e in utils.list_events_between(date(2026, 1, 17), date(2026, 1, 17))] == [(event_id, date(2026, 1, 17))]
+    assert series.get_occurrence(series.occurrence_key(s.id, date(2026, 1, 10))) is None
+    series.restore_occurrence(s.id, date(2026, 1, 10))
+    # la data staccata resta all'evento
+    assert _days() == [date(2026, 1, 3), date(2026, 1, 10), date(2026, 1, 24), date(2026, 1, 31)]
+
+def test_cached_expansions_follow_the_version():
+    s = _saturdays()
+    _days()
+    before = series.expansions.stats()
+    _days()
+    after = series.expansions.stats()
+    assert (after["hits"], after["misses"]) == (before["hits"] + 1, before["misses"])
+    # ogni modifica incrementa la versione: l'espansione vecchia non si legge piu'
+    series.skip_occurrence(s.id, date(2026, 1, 3))
+    assert date(2026, 1, 3) not in _days()
+    assert series.expansions.stats()["misses"] == after["misses"] + 1
+    series.update_series(s.id, rrule="FREQ=WEEKLY;BYDAY=SA;COUNT=2")
+    assert _days() == [date(2026, 1, 10)]
+
+def test_expansion_cache_is_lru():
+    cache = series.ExpansionCache(2)
+    cache.put("a", (1,))
+    cache.put("b", (2,))
+    assert cache.get("a") == (1,)
+    cache.put("c", (3,))
+    assert cache.get("b") is None
+    assert cache.get("a") == (1,) and cache.get("c") == (3,)
+
+def test_occurrences_are_bookings(artists, resources):
+    s = _saturdays(artist_ids=[artists[0]], resource_ids=[resources[0]], start_time=time(21), end_time=time(23))
+    key = series.occurrence_key(s.id, date(2026, 1, 10))
+    with pytest.raises(conflicts.BookingConflict) as e:
+        utils.create_event("Doppio", date(2026, 1, 10), artist_ids=[artists[0]], end_date=date(2026, 1, 10))
+    assert e.value.conflicts[0].events == ((key, "Residenza"),)
+    # stesso giorno, orari diversi: nessun conflitto
+    utils.create_event("Pomeriggio", date(2026, 1, 10), artist_ids=[artists[0]], end_date=date(2026, 1, 10), start_time=time(15), end_time=time(18))
+    forced = utils.create_event(
+        "Forzato", date(2026, 1, 17), resource_ids=[resources[0]], end_date=date(2026, 1, 17), allow_conflicts=True,
+    )
+    found = conflicts.season_conflicts(date(2026, 1, 1), date(2026, 1, 31))
+    assert [(c.kind, {i for i, _ in c.events}) for c in found] == [
+        ("resource", {forced.id, series.occurrence_key(s.id, date(2026, 1, 17))}),
+    ]
+    assert resources[0] not in utils.free_resource_ids(date(2026, 1, 24))
+    assert resources[0] in utils.free_resource_ids(date(2026, 1, 25))
+    year = stats.year_stats(2026)
+    assert year.artists[artists[0]] == 5 + 1
+    rows = list(exporter.iter_event_rows(date(2026, 1, 1), date(2026, 1, 31)))
+    assert [row["id"] for row in rows if row["date"] == date(2026, 1, 10)][-1] == key
+
+def test_series_writes_check_conflicts(artists):
+    utils.create_event("Concerto", date(2026, 1, 24), artist_ids=[artists[1]], end_date=date(2026, 1, 24))
+    with pytest.raises(conflicts.BookingConflict):
+        _saturdays(artist_ids=[artists[1]])
+    s = _saturdays(artist_ids=[artists[0]])
+    with pytest.raises(conflicts.BookingConflict):
+        series.update_series(s.id, artist_ids=[artists[1]])
+    # skip della data in conflitto: la stessa modifica passa
+    series.skip_occurrence(s.id, date(2026, 1, 24))
+    series.update_series(s.id, artist_ids=[artists[1]])
+    assert series.series_artist_ids(s.id) == [artists[1]]
+
+def test_new_series_after_delete_does_not_reuse_cached_dates():
+    mondays = series.create_series("Lunedi", date(2026, 1, 5), "FREQ=WEEKLY;BYDAY=MO;COUNT=4", duration_days=1)
+    assert _days() == [date(2026, 1, 5), date(2026, 1, 12), date(2026, 1, 19), date(2026, 1, 26)]
+    series.delete_series(mondays.id)
+    assert not any(key[0] == mondays.id for key in series.expansions._entries)
+    saturdays = _saturdays()
+    assert saturdays.id != mondays.id
+    assert _days() == [date(2026, 1, 3), date(2026, 1, 10), date(2026, 1, 17), date(2026, 1, 24), date(2026, 1, 31)]
@@ -0,0 +1,46 @@
+# tests/test_stats.py
+# Contatori incrementali della Dashboard (stats.apply da utils) uguali a un ricalcolo completo.
+from datetime import date, time
+
+from sqlalchemy import select
+
+import stats
+import utils
+from db import engine
+from models import EventStat
+
+def _counters():
+    q = select(EventStat.dimension, EventStat.entity_id, EventStat.period, EventStat.status, EventStat.count).where(EventStat.count != 0)
+    with engine.connect() as conn:
+        return sorted(tuple(row) for row in conn.execute(q))
+
+def test_incremental_counters_match_rebuild(artists):
+    club = utils.create_format("Club", default_duration_days=1)
+    festival = utils.create_format("Festival", default_duration_days=3)
+    promoter = utils.create_promoter("Promo")
+    a = utils.create_event("A", date(2026, 1, 30), format_obj=festival, promoter_obj=promoter, artist_ids=artists[:2])
+    b = utils.create_event("B", date(2026, 2, 14), format_obj=club, artist_ids=[artists[2]], start_time=time(23), end_time=time(4))
+    c = utils.create_event("C", date(2026, 3, 1), status="confermato", artist_ids=[artists[0]])
+    utils.create_event("D", date(2026, 3, 1), promoter_obj=promoter, artist_ids=[artists[1]], allow_conflicts=True)
+
+    utils.update_event(a.id, date=date(2026, 2, 27), status="confermato", artist_ids=[artists[1], artists[2]], allow_conflicts=True)
+    utils.update_event(b.id, status="cancellato", promoter_id=promoter.id)
+    utils.update_event(c.id, end_date=date(2026, 3, 4), format_id=club.id, allow_conflicts=True)
+    utils.delete_event(c.id)
+    incremental = _counters()
+    assert incremental
+
+    stats.rebuild()
+    assert _counters() == incremental
+
+def test_year_stats(artists):
+    utils.create_event("Capodanno", date(2026, 12, 31), artist_ids=[artists[0]], end_date=date(2027, 1, 1))
+    utils.create_event("Annullato", date(2026, 6, 1), artist_ids=[artists[1]], status="cancellato")
+    year = stats.year_stats(2026)
+    assert year.totals == {"proposta": 1, "cancellato": 1}
+    assert dict(year.days) == {date(2026, 12, 31): 1}
+    assert dict(year.artists) == {artists[0]: 1}
+    # il giorno dopo conta nella heatmap dell'anno seguente, l'evento no
+    next_year = stats.year_stats(2027)
+    assert dict(next_year.days) == {date(2027, 1, 1): 1}
+    assert sum(next_year.totals.values()) == 0
@@ -1,10 +1,20 @@
 # utils.py
 # Aggiornato per evitare DetachedInstanceError: eager load delle relazioni e helper di serializzazione
+# Le funzioni usano db.session_scope(): dentro una db.unit_of_work() condividono la sessione della pagina.
 
-from db import SessionLocal
-from models import Event, Artist, Format, Resource, Promoter, User
-from datetime import date, datetime, timedelta
-from sqlalchemy.orm import joinedload
+from db import Base, commit, in_unit_of_work, on_commit, session_scope
+import search as search_module
+import ics
+import conflicts
+import series
+import spans
+import stats
+from cache import ref_cache, resource_label  # noqa: F401 (usato da app come utils.resource_label)
+from models import Event, Artist, Format, Resource, ResourceUnavailability, Promoter, EventSeriesException, event_artist, event_resource, series_artist, series_resource
+from collections import namedtuple
+from datetime import date, timedelta
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import joinedload, selectinload
 
 # ---------- helper: serializzazione evento ----------
 def serialize_event(ev):
@@ -16,6 +26,9 @@ def serialize_event(ev):
         "id": ev.id,
         "title": ev.title,
         "date": ev.date.isoformat() if ev.date else None,
+        "end_date": ev.end_date.isoformat() if ev.end_date else None,
+        "start_time": ev.start_time.strftime("%H:%M") if ev.start_time else None,
+        "end_time": ev.end_time.strftime("%H:%M") if ev.end_time else None,
         "format": {"id": ev.format.id, "name": ev.format.name} if getattr(ev, "format", None) else None,
         "promoter": {"id": ev.promoter.id, "name": ev.promoter.name} if getattr(ev, "promoter", None) else None,
         "location": ev.location,
@@ -25,334 +38,665 @@ def serialize_event(ev):
         "resources": [{"id": r.id, "name": r.name, "type": r.type} for r in getattr(ev, "resources", [])],
     }
 
+# ---------- helper: aggregazione nomi in SQL ----------
+def names_aggregate(bind, column, separator=", "):
+    """Concatena i valori di column per gruppo (group_concat su SQLite, string_agg su PostgreSQL)."""
+    if bind.dialect.name == "postgresql":
+        return func.string_agg(column, separator)
+    return func.group_concat(column, separator)
+
 # ---------- EVENTS (con eager loading) ----------
-def list_events_by_month(year, month, serialize=False):
-    db = SessionLocal()
-    try:
-        start = date(year, month, 1)
-        if month == 12:
-            end = date(year + 1, 1, 1)
-        else:
-            end = date(year, month + 1, 1)
+def event_load_options():
+    """
+    Strategia di caricamento unica per gli eventi.
+    format/promoter sono many-to-one: il JOIN aggiunge colonne, non righe.
+    artists/resources sono many-to-many: due joinedload insieme producono
+    artisti x risorse righe per evento, quindi si caricano con una SELECT ... IN
+    separata per collezione (una query in piu' ciascuna, righe lineari).
+    """
+    return (
+        joinedload(Event.format),
+        joinedload(Event.promoter),
+        selectinload(Event.artists),
+        selectinload(Event.resources),
+    )
+
+def _reload_event(db, event_id):
+    # populate_existing: l'istanza e' gia' nella identity map, forza il caricamento delle relazioni
+    return (
+        db.query(Event)
+        .filter(Event.id == event_id)
+        .options(*event_load_options())
+        .populate_existing()
+        .one()
+    )
+
+def _attach(db, obj):
+    # format/artisti/promoter/risorse arrivano dalla cache (istanze detached condivise):
+    # nella sessione si usa la copia locale, cosi' la cache non viene mai agganciata/espirata
+    if obj is None:
+        return None
+    return db.get(type(obj), obj.id)
+
+def event_filters(artist_id=None, resource_id=None, promoter_id=None, status=None):
+    """
+    Condizioni WHERE per i filtri comuni delle query su finestre di eventi.
+    Artista/risorsa passano da una sottoquery IN sugli indici inversi (artist_id, event_id) /
+    (resource_id, event_id): gli eventi dell'entita' si leggono per prefisso, senza scandire l'associazione.
+    """
+    criteria = []
+    if artist_id:
+        criteria.append(Event.id.in_(select(event_artist.c.event_id).where(event_artist.c.artist_id == artist_id)))
+    if resource_id:
+        criteria.append(Event.id.in_(select(event_resource.c.event_id).where(event_resource.c.resource_id == resource_id)))
+    if promoter_id:
+        criteria.append(Event.promoter_id == promoter_id)
+    if status:
+        criteria.append(Event.status == status)
+    return criteria
+
+def month_window(year, month):
+    """Primo e ultimo giorno del mese."""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end - timedelta(days=1)
+
+def list_events_by_month(year, month, serialize=False, **filters):
+    """
+    Eventi con almeno un giorno nel mese (anche quelli iniziati il mese prima), per data di inizio,
+    comprese le occorrenze delle serie ricorrenti (series.Occurrence, id = chiave stringa);
+    filters: artist_id, resource_id, promoter_id, status (vedi event_filters).
+    """
+    return list_events_between(*month_window(year, month), serialize=serialize, **filters)
+
+def list_events_between(start, end, serialize=False, **filters):
+    """Eventi e occorrenze delle serie che si sovrappongono ai giorni [start, end] (vista mese, settimana o giorno)."""
+    with session_scope() as db:
         q = (
             db.query(Event)
-            .filter(Event.date >= start, Event.date < end)
-            .options(
-                joinedload(Event.artists),
-                joinedload(Event.format),
-                joinedload(Event.resources),
-                joinedload(Event.promoter),
-            )
+            .filter(*spans.overlap_criteria(start, end), *event_filters(**filters))
+            .options(*event_load_options())
             .order_by(Event.date)
         )
-        results = q.all()
+        results = _merge(q.all(), series.occurrences_between(start, end, **filters))
         if serialize:
             return [serialize_event(ev) for ev in results]
         return results
-    finally:
-        db.close()
 
-def list_all_events(serialize=False):
-    db = SessionLocal()
-    try:
+def _merge(events, occurrences, limit=None):
+    # entrambe le liste sono gia' per data: a parita' di data prima gli eventi
+    if not occurrences:
+        return events[:limit] if limit else events
+    merged = sorted(events + occurrences, key=lambda ev: ev.date)
+    return merged[:limit] if limit else merged
+
+def list_all_events(serialize=False, **filters):
+    with session_scope() as db:
         q = (
             db.query(Event)
-            .options(
-                joinedload(Event.artists),
-                joinedload(Event.format),
-                joinedload(Event.resources),
-                joinedload(Event.promoter),
-            )
+            .filter(*event_filters(**filters))
+            .options(*event_load_options())
             .order_by(Event.date.desc())
         )
         results = q.all()
         if serialize:
             return [serialize_event(ev) for ev in results]
         return results
-    finally:
-        db.close()
 
-def list_upcoming_events(limit=10, serialize=False):
-    db = SessionLocal()
-    try:
+# ---------- EVENTS: paginazione keyset ----------
+# Il cursore e' la coppia (date, id) dell'ultimo/primo evento della pagina:
+# la query parte sempre da un indice che inizia con events.date (ix_events_date_end),
+# quindi il costo resta costante anche con molte stagioni in tabella.
+# Gli eventi senza data (solo dati storici: create_event e l'import la richiedono) non hanno
+# una posizione nell'ordinamento e restano fuori dalle pagine.
+# Il totale non e' un count(*) a ogni pagina: senza ricerca viene dai contatori di stats, con la
+# ricerca si conta alla prima pagina e il chiamante ripassa total per le successive.
+EventPage = namedtuple("EventPage", ["items", "next_cursor", "prev_cursor", "total"])
+
+def _event_key(ev):
+    return (ev.date.isoformat(), ev.id)
+
+def _page_criteria(db, search, filters):
+    criteria = [Event.date.isnot(None), *event_filters(**filters)]
+    if search and search.strip():
+        # stesse corrispondenze della ricerca della pagina Eventi (indice FTS / pg_trgm)
+        criteria.append(search_module.match_condition(db, search))
+    return criteria
+
+def _page_total(db, criteria, search, filters):
+    if not (search and search.strip()):
+        total = stats.count_events(db, **filters)
+        if total is not None:
+            return total
+    return db.execute(select(func.count(Event.id)).where(*criteria)).scalar()
+
+def list_events_page(cursor=None, page_size=25, backwards=False, search=None, serialize=False, total=None, **filters):
+    """
+    Pagina di eventi ordinati per (date, id) decrescente, come list_all_events.
+    cursor: tupla (date ISO, id) restituita da una pagina precedente (next_cursor/prev_cursor).
+    backwards=True legge la pagina precedente al cursore.
+    search: solo gli eventi trovati da search.search_events con lo stesso testo (in ordine di data).
+    filters: artist_id, resource_id, promoter_id, status (vedi event_filters).
+    total: totale gia' letto da una pagina precedente con gli stessi filtri (non si riconta).
+    Restituisce EventPage(items, next_cursor, prev_cursor, total).
+    """
+    with session_scope() as db:
+        criteria = _page_criteria(db, search, filters)
+        if total is None:
+            total = _page_total(db, criteria, search, filters)
+        q = _keyset_window(db.query(Event).filter(*criteria), cursor, backwards).options(*event_load_options())
+        # una riga in piu' per sapere se esiste un'altra pagina nella stessa direzione
+        results, next_cursor, prev_cursor = _keyset_page(q.limit(page_size + 1).all(), page_size, cursor, backwards)
+        items = [serialize_event(ev) for ev in results] if serialize else results
+        return EventPage(items, next_cursor, prev_cursor, total)
+
+def _keyset_window(q, cursor, backwards):
+    """Condizione sul cursore e ordinamento (date, id); vale per Query ORM e select() Core."""
+    if cursor:
+        c_date, c_id = date.fromisoformat(cursor[0]), cursor[1]
+        if backwards:
+            q = q.filter(or_(Event.date > c_date, and_(Event.date == c_date, Event.id > c_id)))
+        else:
+            q = q.filter(or_(Event.date < c_date, and_(Event.date == c_date, Event.id < c_id)))
+    if backwards:
+        return q.order_by(Event.date.asc(), Event.id.asc())
+    return q.order_by(Event.date.desc(), Event.id.desc())
+
+def _keyset_page(results, page_size, cursor, backwards):
+    """Da page_size + 1 risultati: (pagina in ordine decrescente, next_cursor, prev_cursor)."""
+    has_more = len(results) > page_size
+    results = results[:page_size]
+    if backwards:
+        results.reverse()
+    next_cursor = prev_cursor = None
+    if results:
+        if backwards:
+            prev_cursor = _event_key(results[0]) if has_more else None
+            next_cursor = _event_key(results[-1])
+        else:
+            next_cursor = _event_key(results[-1]) if has_more else None
+            prev_cursor = _event_key(results[0]) if cursor else None
+    return results, next_cursor, prev_cursor
+
+def list_upcoming_events(limit=10, serialize=False, **filters):
+    """Prossimi eventi, compresi quelli gia' iniziati e non ancora finiti e le occorrenze delle serie."""
+    with session_scope() as db:
         today = date.today()
         q = (
             db.query(Event)
-            .filter(Event.date >= today)
-            .options(
-                joinedload(Event.artists),
-                joinedload(Event.format),
-                joinedload(Event.resources),
-                joinedload(Event.promoter),
-            )
+            .filter(*spans.overlap_criteria(today), *event_filters(**filters))
+            .options(*event_load_options())
             .order_by(Event.date)
             .limit(limit)
         )
-        results = q.all()
+        upcoming = series.occurrences_between(today, today + timedelta(days=series.UPCOMING_DAYS), limit, **filters)
+        results = _merge(q.all(), upcoming, limit)
         if serialize:
             return [serialize_event(ev) for ev in results]
         return results
-    finally:
-        db.close()
 
 def get_event(event_id, serialize=False):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         ev = (
             db.query(Event)
             .filter(Event.id == event_id)
-            .options(
-                joinedload(Event.artists),
-                joinedload(Event.format),
-                joinedload(Event.resources),
-                joinedload(Event.promoter),
-            )
+            .options(*event_load_options())
             .first()
         )
         if serialize and ev:
             return serialize_event(ev)
         return ev
-    finally:
-        db.close()
 
-def create_event(title, date_, format_obj=None, promoter_obj=None, location=None, notes=None, status="proposta", artist_objs=None, resource_objs=None):
-    db = SessionLocal()
-    try:
-        ev = Event(date=date_, title=title, format=format_obj, promoter=promoter_obj, location=location, notes=notes, status=status)
+# ---------- EVENTS: read model per le liste ----------
+# Le viste elenco (Eventi, Calendario, Dashboard) mostrano solo poche colonne: qui si legge
+# con una select() Core di quelle colonne, nomi artisti aggregati in SQL, e ogni riga e' una
+# namedtuple (niente istanza ORM, identity map, relazioni ne' note/bio/descrizioni caricate).
+EventRow = namedtuple("EventRow", ["id", "date", "end_date", "start_time", "end_time", "title", "status", "location", "artists", "color"])
+
+def event_rows_query(bind, *criteria):
+    """select() delle colonne di EventRow; artists = nomi separati da ', ', color = colore del primo artista."""
+    artists = (
+        select(names_aggregate(bind, Artist.name, ", "))
+        .select_from(event_artist.join(Artist, Artist.id == event_artist.c.artist_id))
+        .where(event_artist.c.event_id == Event.id)
+        .scalar_subquery()
+    )
+    color = (
+        select(Artist.calendar_color)
+        .select_from(event_artist.join(Artist, Artist.id == event_artist.c.artist_id))
+        .where(event_artist.c.event_id == Event.id)
+        .order_by(Artist.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    return select(
+        Event.id, Event.date, Event.end_date, Event.start_time, Event.end_time, Event.title, Event.status, Event.location,
+        artists.label("artists"), color.label("color"),
+    ).where(*criteria)
+
+def _fetch_rows(db, q):
+    return [EventRow._make(r) for r in db.execute(q)]
+
+def list_event_rows_by_month(year, month, **filters):
+    """Come list_events_by_month, ma EventRow."""
+    return list_event_rows_between(*month_window(year, month), **filters)
+
+def list_event_rows_between(start, end, **filters):
+    """Come list_events_between, ma EventRow."""
+    with session_scope() as db:
+        q = event_rows_query(db.get_bind(), *spans.overlap_criteria(start, end), *event_filters(**filters))
+        rows = _fetch_rows(db, q.order_by(Event.date, Event.id))
+    return _merge(rows, series.occurrence_rows_between(start, end, **filters))
+
+def list_all_event_rows(**filters):
+    """Come list_all_events (data decrescente), ma EventRow."""
+    with session_scope() as db:
+        q = event_rows_query(db.get_bind(), *event_filters(**filters))
+        return _fetch_rows(db, q.order_by(Event.date.desc(), Event.id.desc()))
+
+def list_upcoming_event_rows(limit=10, **filters):
+    """Come list_upcoming_events, ma EventRow."""
+    today = date.today()
+    with session_scope() as db:
+        q = event_rows_query(db.get_bind(), *spans.overlap_criteria(today), *event_filters(**filters))
+        rows = _fetch_rows(db, q.order_by(Event.date, Event.id).limit(limit))
+    upcoming = series.occurrence_rows_between(today, today + timedelta(days=series.UPCOMING_DAYS), limit, **filters)
+    return _merge(rows, upcoming, limit)
+
+def list_event_rows_page(cursor=None, page_size=25, backwards=False, search=None, total=None, **filters):
+    """Come list_events_page (stesso cursore e total), ma gli item sono EventRow."""
+    with session_scope() as db:
+        criteria = _page_criteria(db, search, filters)
+        if total is None:
+            total = _page_total(db, criteria, search, filters)
+        q = _keyset_window(event_rows_query(db.get_bind(), *criteria), cursor, backwards)
+        results, next_cursor, prev_cursor = _keyset_page(_fetch_rows(db, q.limit(page_size + 1)), page_size, cursor, backwards)
+        return EventPage(results, next_cursor, prev_cursor, total)
+
+def event_rows_by_ids(ids):
+    """EventRow per gli id dati, nello stesso ordine (risultati di ricerca)."""
+    if not ids:
+        return []
+    with session_scope() as db:
+        by_id = {r.id: r for r in _fetch_rows(db, event_rows_query(db.get_bind(), Event.id.in_(list(ids))))}
+        return [by_id[i] for i in ids if i in by_id]
+
+def create_event(title, date_, format_obj=None, promoter_obj=None, location=None, notes=None, status="proposta", artist_objs=None, resource_objs=None, artist_ids=None, resource_ids=None, allow_conflicts=False, end_date=None, start_time=None, end_time=None):
+    """
+    Crea l'evento dal giorno date_ a end_date (default: durata del format), con orari facoltativi.
+    Se artisti/risorse sono gia' prenotati in quel periodo solleva conflicts.BookingConflict (salvo allow_conflicts).
+    """
+    end_date = end_date or spans.default_end(date_, getattr(format_obj, "default_duration_days", None), start_time, end_time)
+    spans.validate(date_, end_date, start_time, end_time)
+    with session_scope() as db:
+        if not allow_conflicts and status != "cancellato":
+            found = conflicts.check_booking(
+                db, date_,
+                set(artist_ids or ()) | {a.id for a in artist_objs or ()},
+                set(resource_ids or ()) | {r.id for r in resource_objs or ()},
+                end_date=end_date, start_time=start_time, end_time=end_time,
+            )
+            if found:
+                raise conflicts.BookingConflict(found)
+        ev = Event(
+            date=date_, end_date=end_date, start_time=start_time, end_time=end_time, title=title,
+            format=_attach(db, format_obj), promoter=_attach(db, promoter_obj), location=location, notes=notes, status=status,
+        )
         if artist_objs:
             for a in artist_objs:
-                ev.artists.append(a)
+                ev.artists.append(_attach(db, a))
         if resource_objs:
             for r in resource_objs:
-                ev.resources.append(r)
+                ev.resources.append(_attach(db, r))
         db.add(ev)
-        db.commit()
-        db.refresh(ev)
-        # carica relazioni per sicurezza
-        ev = db.query(Event).options(joinedload(Event.artists), joinedload(Event.format), joinedload(Event.resources), joinedload(Event.promoter)).get(ev.id)
+        db.flush()
+        if artist_ids:
+            _sync_association(db, event_artist, "artist_id", ev.id, artist_ids)
+        if resource_ids:
+            _sync_association(db, event_resource, "resource_id", ev.id, resource_ids)
+        if artist_ids or resource_ids:
+            db.expire(ev, ["artists", "resources"])
+        search_module.index_event(db, ev.id)
+        ics.mark_event_stale(db, ev.id)
+        stats.apply(db, added=[stats.snapshot(db, ev.id)])
+        commit(db)
+        if not in_unit_of_work(db):
+            # sessione propria: dopo il commit l'istanza e' scaduta, si ricarica con le relazioni
+            ev = _reload_event(db, ev.id)
         return ev
-    finally:
-        db.close()
 
-def update_event(event_id, **kwargs):
-    db = SessionLocal()
-    try:
+def _sync_association(db, table, column, event_id, ids):
+    """
+    Allinea le righe di associazione di un evento all'insieme ids con il minimo di scritture:
+    una DELETE ... IN per le righe rimosse e una INSERT executemany per quelle aggiunte.
+    Restituisce (aggiunti, rimossi).
+    """
+    col = table.c[column]
+    current = set(db.execute(select(col).where(table.c.event_id == event_id)).scalars())
+    wanted = set(ids)
+    added, removed = wanted - current, current - wanted
+    if removed:
+        db.execute(table.delete().where(table.c.event_id == event_id, col.in_(removed)))
+    if added:
+        db.execute(table.insert(), [{"event_id": event_id, column: i} for i in added])
+    return added, removed
+
+def update_event(event_id, artist_ids=None, resource_ids=None, allow_conflicts=False, **kwargs):
+    """
+    Aggiorna i campi passati in kwargs (format/promoter anche come oggetti ORM).
+    artist_ids/resource_ids: insiemi di id da assegnare; None lascia invariata l'associazione.
+    Per compatibilita' sono accettate anche liste di oggetti in artists=/resources=.
+    Tutto avviene in una transazione; le associazioni cambiano solo per differenza.
+    Se cambia date senza end_date l'evento si sposta mantenendo la durata.
+    Se cambiano date/orari, stato, artisti o risorse e ne nasce una doppia prenotazione solleva
+    conflicts.BookingConflict prima di scrivere (salvo allow_conflicts).
+    """
+    if "artists" in kwargs:
+        artist_ids = [a.id for a in kwargs.pop("artists")]
+    if "resources" in kwargs:
+        resource_ids = [r.id for r in kwargs.pop("resources")]
+    with session_scope() as db:
         ev = db.query(Event).get(event_id)
         if not ev:
             return None
+        span_keys = ("date", "end_date", "start_time", "end_time")
+        booking_changed = artist_ids is not None or resource_ids is not None or "status" in kwargs or any(k in kwargs for k in span_keys)
+        if "date" in kwargs and "end_date" not in kwargs and ev.date and kwargs["date"]:
+            kwargs["end_date"] = kwargs["date"] + ((ev.end_date or ev.date) - ev.date)
+        span = {k: kwargs.get(k, getattr(ev, k)) for k in span_keys}
+        if span["date"]:
+            if not span["end_date"]:
+                span["end_date"] = kwargs["end_date"] = span["date"]
+            spans.validate(span["date"], span["end_date"], span["start_time"], span["end_time"])
+        if not allow_conflicts and booking_changed and kwargs.get("status", ev.status) != "cancellato":
+            found = conflicts.check_booking(
+                db,
+                span["date"],
+                artist_ids if artist_ids is not None else db.execute(select(event_artist.c.artist_id).where(event_artist.c.event_id == ev.id)).scalars().all(),
+                resource_ids if resource_ids is not None else db.execute(select(event_resource.c.resource_id).where(event_resource.c.event_id == ev.id)).scalars().all(),
+                exclude_event_id=ev.id,
+                end_date=span["end_date"], start_time=span["start_time"], end_time=span["end_time"],
+            )
+            if found:
+                raise conflicts.BookingConflict(found)
+        # feed ICS in cui l'evento compariva prima della modifica
+        ics.mark_event_stale(db, ev.id)
+        before = stats.snapshot(db, ev.id)
         for k, v in kwargs.items():
             # supporta passaggio di oggetti ORM per format/promoter
+            if isinstance(v, Base):
+                v = _attach(db, v)
             setattr(ev, k, v)
         db.add(ev)
-        db.commit()
-        db.refresh(ev)
-        # ricarica con relazioni
-        ev = db.query(Event).options(joinedload(Event.artists), joinedload(Event.format), joinedload(Event.resources), joinedload(Event.promoter)).get(ev.id)
+        db.flush()
+        if artist_ids is not None:
+            _sync_association(db, event_artist, "artist_id", ev.id, artist_ids)
+        if resource_ids is not None:
+            _sync_association(db, event_resource, "resource_id", ev.id, resource_ids)
+        # le collezioni in identity map non sanno delle scritture Core; *_id possono aver cambiato format/promoter
+        db.expire(ev, ["artists", "resources", "format", "promoter"])
+        search_module.index_event(db, ev.id)
+        ics.mark_event_stale(db, ev.id)
+        stats.apply(db, removed=[before], added=[stats.snapshot(db, ev.id)])
+        commit(db)
+        if not in_unit_of_work(db):
+            # sessione propria: dopo il commit l'istanza e' scaduta, si ricarica con le relazioni
+            ev = _reload_event(db, ev.id)
         return ev
-    finally:
-        db.close()
 
 def delete_event(event_id):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         ev = db.query(Event).get(event_id)
         if ev:
+            # evento staccato da una serie: la data resta esclusa dalla serie (eccezione senza evento)
+            db.execute(update(EventSeriesException).where(EventSeriesException.event_id == ev.id).values(event_id=None))
+            search_module.remove_event(db, ev.id)
+            ics.mark_event_stale(db, ev.id)
+            stats.apply(db, removed=[stats.snapshot(db, ev.id)])
             db.delete(ev)
-            db.commit()
-    finally:
-        db.close()
+            commit(db)
 
 # ---------- ARTISTS ----------
 def create_artist(name, bio=None, calendar_color="#2b8cbe", active=True):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         a = Artist(name=name, bio=bio, calendar_color=calendar_color, active=active)
         db.add(a)
-        db.commit()
+        commit(db)
+        on_commit(db, lambda: ref_cache.invalidate("artists"))
         db.refresh(a)
         return a
-    finally:
-        db.close()
 
 def list_artists():
-    db = SessionLocal()
-    try:
-        return db.query(Artist).order_by(Artist.name).all()
-    finally:
-        db.close()
+    return list(ref_cache.get("artists").items)
+
+def artist_index():
+    """RefIndex (items, by_id, by_name) dalla cache delle tabelle di riferimento."""
+    return ref_cache.get("artists")
 
 def get_artist(artist_id):
-    db = SessionLocal()
-    try:
-        return db.query(Artist).get(artist_id)
-    finally:
-        db.close()
+    return ref_cache.get("artists").by_id.get(artist_id)
 
 def update_artist(artist_id, **kwargs):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         a = db.query(Artist).get(artist_id)
         for k, v in kwargs.items():
             setattr(a, k, v)
         db.add(a)
-        db.commit()
+        if "name" in kwargs:
+            search_module.reindex_artist(db, artist_id)
+        ics.mark_entity_stale(db, "artist", artist_id)
+        commit(db)
+        on_commit(db, lambda: ref_cache.invalidate("artists"))
         db.refresh(a)
         return a
-    finally:
-        db.close()
 
 def delete_artist(artist_id):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         a = db.query(Artist).get(artist_id)
+        event_ids = [e.id for e in a.events]
         db.delete(a)
-        db.commit()
-    finally:
-        db.close()
+        db.flush()
+        for event_id in event_ids:
+            search_module.index_event(db, event_id)
+        db.execute(series_artist.delete().where(series_artist.c.artist_id == artist_id))
+        ics.mark_entity_stale(db, "artist", artist_id)
+        stats.drop_entity(db, "artist", artist_id)
+        commit(db)
+        on_commit(db, lambda: ref_cache.invalidate("artists"))
 
 # ---------- FORMATS ----------
 def create_format(name, description=None, default_duration_days=1):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         f = Format(name=name, description=description, default_duration_days=default_duration_days)
         db.add(f)
-        db.commit()
+        commit(db)
+        on_commit(db, lambda: ref_cache.invalidate("formats"))
         db.refresh(f)
         return f
-    finally:
-        db.close()
 
 def list_formats():
-    db = SessionLocal()
-    try:
-        return db.query(Format).order_by(Format.name).all()
-    finally:
-        db.close()
+    return list(ref_cache.get("formats").items)
+
+def format_index():
+    """RefIndex (items, by_id, by_name) dalla cache delle tabelle di riferimento."""
+    return ref_cache.get("formats")
 
 def get_format(format_id):
-    db = SessionLocal()
-    try:
-        return db.query(Format).get(format_id)
-    finally:
-        db.close()
+    return ref_cache.get("formats").by_id.get(format_id)
 
 def update_format(format_id, **kwargs):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         f = db.query(Format).get(format_id)
         for k, v in kwargs.items():
             setattr(f, k, v)
         db.add(f)
-        db.commit()
+        commit(db)
+        on_commit(db, lambda: ref_cache.invalidate("formats"))
         db.refresh(f)
         return f
-    finally:
-        db.close()
 
 def delete_format(format_id):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         f = db.query(Format).get(format_id)
         db.delete(f)
-        db.commit()
-    finally:
-        db.close()
+        stats.drop_entity(db, "format", format_id)
+        commit(db)
+        on_commit(db, lambda: ref_cache.invalidate("formats"))
 
 # ---------- PROMOTERS ----------
 def create_promoter(name, contact=None):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         p = Promoter(name=name, contact=contact)
         db.add(p)
-        db.commit()
+        commit(db)
+        on_commit(db, lambda: ref_cache.invalidate("promoters"))
         db.refresh(p)
         return p
-    finally:
-        db.close()
 
 def list_promoters():
-    db = SessionLocal()
-    try:
-        return db.query(Promoter).order_by(Promoter.name).all()
-    finally:
-        db.close()
+    return list(ref_cache.get("promoters").items)
+
+def promoter_index():
+    """RefIndex (items, by_id, by_name) dalla cache delle tabelle di riferimento."""
+    return ref_cache.get("promoters")
 
 def get_promoter(promoter_id):
-    db = SessionLocal()
-    try:
-        return db.query(Promoter).get(promoter_id)
-    finally:
-        db.close()
+    return ref_cache.get("promoters").by_id.get(promoter_id)
 
 def update_promoter(promoter_id, **kwargs):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         p = db.query(Promoter).get(promoter_id)
         for k, v in kwargs.items():
             setattr(p, k, v)
         db.add(p)
-        db.commit()
+        ics.mark_entity_stale(db, "promoter", promoter_id)
+        commit(db)
+        on_commit(db, lambda: ref_cache.invalidate("promoters"))
         db.refresh(p)
         return p
-    finally:
-        db.close()
 
 def delete_promoter(promoter_id):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         p = db.query(Promoter).get(promoter_id)
         db.delete(p)
-        db.commit()
-    finally:
-        db.close()
+        ics.mark_entity_stale(db, "promoter", promoter_id)
+        stats.drop_entity(db, "promoter", promoter_id)
+        commit(db)
+        on_commit(db, lambda: ref_cache.invalidate("promoters"))
 
 # ---------- RESOURCES ----------
 def create_resource(name, type, contact=None, availability=None):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         r = Resource(name=name, type=type, contact=contact, availability=availability)
         db.add(r)
-        db.commit()
+        commit(db)
+        on_commit(db, lambda: ref_cache.invalidate("resources"))
         db.refresh(r)
         return r
-    finally:
-        db.close()
 
 def list_resources(resource_type=None):
-    db = SessionLocal()
-    try:
-        q = db.query(Resource)
-        if resource_type:
-            q = q.filter(Resource.type == resource_type)
-        return q.order_by(Resource.name).all()
-    finally:
-        db.close()
+    items = ref_cache.get("resources").items
+    if resource_type:
+        return [r for r in items if r.type == resource_type]
+    return list(items)
+
+def resource_index():
+    """RefIndex (items, by_id, by_name) dalla cache; by_name usa l'etichetta "Tipo: Nome"."""
+    return ref_cache.get("resources")
 
 def get_resource(resource_id):
-    db = SessionLocal()
-    try:
-        return db.query(Resource).get(resource_id)
-    finally:
-        db.close()
+    return ref_cache.get("resources").by_id.get(resource_id)
 
 def update_resource(resource_id, **kwargs):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         r = db.query(Resource).get(resource_id)
         for k, v in kwargs.items():
             setattr(r, k, v)
         db.add(r)
-        db.commit()
+        ics.mark_entity_stale(db, "resource", resource_id)
+        commit(db)
+        on_commit(db, lambda: ref_cache.invalidate("resources"))
         db.refresh(r)
         return r
-    finally:
-        db.close()
 
 def delete_resource(resource_id):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         r = db.query(Resource).get(resource_id)
         db.delete(r)
-        db.commit()
-    finally:
-        db.close()
+        db.execute(series_resource.delete().where(series_resource.c.resource_id == resource_id))
+        ics.mark_entity_stale(db, "resource", resource_id)
+        commit(db)
+        on_commit(db, lambda: ref_cache.invalidate("resources"))
+
+# ---------- DISPONIBILITA' RISORSE ----------
+def busy_resources_query(start, end, exclude_event_id=None):
+    """
+    SELECT degli id risorsa occupati in [start, end]: periodi di non disponibilita' che si
+    sovrappongono all'intervallo piu' prenotazioni su eventi non cancellati.
+    Entrambi i rami usano un indice (resource_unavailability.end_date, events(date, end_date) + PK event_resource).
+    Le risorse delle occorrenze di serie nell'intervallo (calcolate in Python) entrano come lista di id.
+    """
+    unavailable = select(ResourceUnavailability.resource_id).where(
+        ResourceUnavailability.end_date >= start,
+        ResourceUnavailability.start_date <= end,
+    )
+    booked = (
+        select(event_resource.c.resource_id)
+        .join(Event, Event.id == event_resource.c.event_id)
+        .where(*spans.overlap_criteria(start, end))
+        .where(or_(Event.status.is_(None), Event.status != "cancellato"))
+    )
+    if exclude_event_id is not None:
+        booked = booked.where(Event.id != exclude_event_id)
+    with session_scope() as db:
+        in_series = {resource_id for resource_id, _ in series.bookings(db, start, end, "resource_id")}
+    if in_series:
+        return unavailable.union(booked, select(Resource.id).where(Resource.id.in_(in_series)))
+    return unavailable.union(booked)
+
+def free_resource_ids(start, end=None, resource_type=None, exclude_event_id=None):
+    """
+    Id delle risorse libere dal giorno start al giorno end incluso (default: solo start), in una query.
+    exclude_event_id ignora le prenotazioni di quell'evento (scheda evento in modifica).
+    """
+    end = end or start
+    with session_scope() as db:
+        q = select(Resource.id).where(Resource.id.notin_(busy_resources_query(start, end, exclude_event_id)))
+        if resource_type:
+            q = q.where(Resource.type == resource_type)
+        return set(db.execute(q).scalars())
+
+def list_free_resources(start, end=None, resource_type=None, exclude_event_id=None):
+    free = free_resource_ids(start, end, resource_type, exclude_event_id)
+    return [r for r in list_resources(resource_type) if r.id in free]
+
+def unavailability_by_resource(resource_ids, from_date=None):
+    """resource_id -> periodi di non disponibilita' (ordinati per inizio), una query per tutte le risorse."""
+    by_resource = {rid: [] for rid in resource_ids}
+    if not by_resource:
+        return by_resource
+    with session_scope() as db:
+        q = db.query(ResourceUnavailability).filter(ResourceUnavailability.resource_id.in_(list(by_resource)))
+        if from_date:
+            q = q.filter(ResourceUnavailability.end_date >= from_date)
+        for u in q.order_by(ResourceUnavailability.resource_id, ResourceUnavailability.start_date):
+            by_resource[u.resource_id].append(u)
+    return by_resource
+
+def add_resource_unavailability(resource_id, start_date, end_date=None, reason=None):
+    end_date = end_date or start_date
+    if end_date < start_date:
+        raise ValueError("la data di fine precede quella di inizio")
+    with session_scope() as db:
+        u = ResourceUnavailability(resource_id=resource_id, start_date=start_date, end_date=end_date, reason=reason)
+        db.add(u)
+        commit(db)
+        db.refresh(u)
+        return u
+
+def delete_resource_unavailability(unavailability_id):
+    with session_scope() as db:
+        u = db.get(ResourceUnavailability, unavailability_id)
+        if u:
+            db.delete(u)
+            commit(db)